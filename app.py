@@ -20,6 +20,7 @@ import tasks
 
 # 自作モジュール（最小限の読み込み）
 from utils.file_manager import FileManager
+from models.data_fetcher import AutoDataFetcher
 
 # Flask設定
 app = Flask(__name__, static_folder='static', template_folder='templates')
@@ -43,6 +44,9 @@ os.makedirs('./templates', exist_ok=True)
 # グローバル変数（最小限）
 file_manager = None
 
+# データキャッシュをメモリマップした読み取り専用の抽選履歴（キャッシュが更新された時だけ開き直す）
+cached_draws = {'signature': None, 'draws': None}
+
 def ultra_light_init():
     """🔥 超軽量初期化 - 1秒以内で完了"""
     global file_manager
@@ -83,6 +87,21 @@ def optimize_memory():
     except Exception as e:
         logger.error(f"メモリ最適化エラー: {e}")
 
+def load_cached_draws():
+    """データキャッシュの抽選履歴を取得（.npy をメモリマップするだけでパース・DataFrame作成なし）"""
+    if not file_manager or not file_manager.data_cached():
+        return None
+    
+    signature = file_manager.draw_cache_signature()
+    if signature is None or cached_draws['signature'] != signature:
+        fetcher = AutoDataFetcher()
+        fetcher.set_cache_manager(file_manager)
+        if not fetcher.load_cached_draws():
+            return None
+        cached_draws['draws'] = fetcher.get_draws()
+        cached_draws['signature'] = file_manager.draw_cache_signature()
+    return cached_draws['draws']
+
 def create_success_response(data, message="Success"):
     """統一成功レスポンス"""
     response = {
@@ -546,13 +565,36 @@ def train_async():
         logger.error(f"非同期学習API開始エラー: {e}")
         return create_error_response(f"学習タスクの開始に失敗しました: {str(e)}", 500)
 
+# 🔥 非同期API: ハイパーパラメータ探索
+@app.route('/api/hyperparameter_search', methods=['POST'])
+def hyperparameter_search_async():
+    """非同期ハイパーパラメータ探索（中断時は再実行で続きから）"""
+    try:
+        request_data = request.get_json() or {}
+        
+        task = tasks.hyperparameter_search_task.delay(request_data)
+        
+        return create_success_response({
+            'task_id': task.id,
+            'status': 'started',
+            'message': 'ハイパーパラメータ探索を開始しました',
+            'estimated_time': '3-5分（未完了分は再実行で継続）',
+            'options': request_data
+        }, "探索タスクを開始しました")
+        
+    except Exception as e:
+        logger.error(f"非同期探索API開始エラー: {e}")
+        return create_error_response(f"探索タスクの開始に失敗しました: {str(e)}", 500)
+
 # 🔥 非同期API: 時系列検証
 @app.route('/api/validation', methods=['POST'])
 def validation_async():
     """非同期時系列検証"""
     try:
-        # 非同期タスクを開始
-        task = tasks.validation_task.delay()
+        request_data = request.get_json(silent=True) or {}
+        
+        # 非同期タスクを開始（中断された検証は同じ条件の再実行で続きから）
+        task = tasks.validation_task.delay(request_data)
         
         return create_success_response({
             'task_id': task.id,
@@ -565,6 +607,84 @@ def validation_async():
         logger.error(f"非同期検証API開始エラー: {e}")
         return create_error_response(f"検証タスクの開始に失敗しました: {str(e)}", 500)
 
+# 🔥 非同期API: 全回ウォークフォワード・バックテスト
+@app.route('/api/backtest', methods=['POST'])
+def backtest_async():
+    """非同期ウォークフォワード・バックテスト（履歴の全回を評価）"""
+    try:
+        request_data = request.get_json(silent=True) or {}
+        
+        task = tasks.backtest_task.delay(request_data)
+        
+        return create_success_response({
+            'task_id': task.id,
+            'status': 'started',
+            'message': 'ウォークフォワード・バックテストを開始しました',
+            'estimated_time': '3-5分（時間予算内で評価できた回までを集計）',
+            'options': request_data
+        }, "バックテストタスクを開始しました")
+        
+    except Exception as e:
+        logger.error(f"非同期バックテストAPI開始エラー: {e}")
+        return create_error_response(f"バックテストタスクの開始に失敗しました: {str(e)}", 500)
+
+# 🔥 非同期API: アンサンブル設定スイープ
+@app.route('/api/ensemble_sweep', methods=['POST'])
+def ensemble_sweep_async():
+    """非同期アンサンブル設定スイープ（直近のバックテストの確率キャッシュを使用）"""
+    try:
+        request_data = request.get_json(silent=True) or {}
+        
+        task = tasks.ensemble_sweep_task.delay(request_data)
+        
+        return create_success_response({
+            'task_id': task.id,
+            'status': 'started',
+            'message': 'アンサンブル設定スイープを開始しました',
+            'estimated_time': '数秒〜1分',
+            'options': request_data
+        }, "スイープタスクを開始しました")
+        
+    except Exception as e:
+        logger.error(f"非同期スイープAPI開始エラー: {e}")
+        return create_error_response(f"スイープタスクの開始に失敗しました: {str(e)}", 500)
+
+# 📦 モデルバージョン一覧API（同期処理可能）
+@app.route('/api/models', methods=['GET'])
+def list_model_versions():
+    """レジストリのモデルバージョン一覧と公開中バージョンを取得"""
+    try:
+        if not file_manager:
+            return create_error_response("システムが初期化されていません", 500)
+        
+        return create_success_response({
+            'current_version': file_manager.current_model_version(),
+            'versions': file_manager.model_registry.list_versions()
+        }, "モデルバージョン一覧を取得しました")
+        
+    except Exception as e:
+        logger.error(f"モデルバージョン一覧エラー: {e}")
+        return create_error_response(f"モデルバージョン一覧の取得に失敗しました: {str(e)}", 500)
+
+# 📦 モデルロールバックAPI（ポインタ切り替えのみ）
+@app.route('/api/models/rollback', methods=['POST'])
+def rollback_model():
+    """公開中モデルを指定バージョン（省略時は1つ前）へ戻す"""
+    try:
+        if not file_manager:
+            return create_error_response("システムが初期化されていません", 500)
+        
+        request_data = request.get_json(silent=True) or {}
+        pointer = file_manager.model_registry.rollback(request_data.get('version_id'))
+        
+        return create_success_response(pointer, "モデルをロールバックしました（ワーカーは次のリクエストで切り替え）")
+        
+    except ValueError as e:
+        return create_error_response(str(e), 400)
+    except Exception as e:
+        logger.error(f"モデルロールバックエラー: {e}")
+        return create_error_response(f"モデルのロールバックに失敗しました: {str(e)}", 500)
+
 # 🔥 タスク状態確認API
 @app.route('/api/task/<task_id>', methods=['GET'])
 def get_task_status_api(task_id):
@@ -615,10 +735,19 @@ def get_status():
         if file_manager:
             files_status = {
                 "model_exists": file_manager.model_exists(),
+                "model_version": file_manager.current_model_version(),
                 "history_exists": file_manager.history_exists(),
                 "data_cached": file_manager.data_cached()
             }
         
+        # 抽選履歴の使用メモリ（列ごとのバイト数）
+        data_memory = None
+        try:
+            draws = load_cached_draws()
+            data_memory = draws.memory_usage() if draws is not None else None
+        except Exception as e:
+            logger.warning(f"抽選履歴の読み込みに失敗: {e}")
+        
         # Celery状態
         celery_status = {}
         try:
@@ -641,6 +770,7 @@ def get_status():
             "async_mode": True,
             "files": files_status,
             "memory": memory_info,
+            "data_memory": data_memory,
             "celery": celery_status,
             "timestamp": datetime.now().isoformat()
         }
@@ -663,43 +793,20 @@ def get_recent_results():
         if not file_manager.data_cached():
             return create_error_response("データがキャッシュされていません。初期化を実行してください", 404)
         
-        # キャッシュからデータを読み込み（軽量処理）
-        cached_data = file_manager.load_data_cache()
-        if cached_data is None or len(cached_data) == 0:
+        # キャッシュの抽選履歴（更新がなければ読み込み済みの配列を再利用）
+        draws = load_cached_draws()
+        if draws is None or len(draws) == 0:
             return create_error_response("キャッシュデータが無効です", 500)
         
         count = int(request.args.get('count', 5))
         count = min(max(count, 1), 20)  # 1-20の範囲に制限
         
-        # 最新のcount件を取得（軽量処理）
-        recent_data = cached_data.nlargest(count, '開催回')
-        
-        results = []
-        for _, row in recent_data.iterrows():
-            try:
-                round_num = int(row['開催回'])
-                main_numbers = []
-                
-                # メイン数字を取得
-                main_cols = ['第1数字', '第2数字', '第3数字', '第4数字', '第5数字', '第6数字', '第7数字']
-                for col in main_cols:
-                    if col in row.index and not pd.isna(row[col]):
-                        main_numbers.append(int(row[col]))
-                
-                if len(main_numbers) == 7:
-                    results.append({
-                        'round': round_num,
-                        'date': row.get('日付', ''),
-                        'main_numbers': sorted(main_numbers),
-                        'bonus_numbers': []  # ボーナス数字は省略（軽量化）
-                    })
-            except:
-                continue
+        results = draws.recent_results(count)
         
         response_data = {
-            'results': sorted(results, key=lambda x: x['round'], reverse=True),
+            'results': results,
             'count': len(results),
-            'latest_round': int(cached_data['開催回'].max()) if len(cached_data) > 0 else 0
+            'latest_round': int(draws.rounds.max())
         }
         
         return create_success_response(response_data, f"最近{len(results)}回の結果を取得しました")
@@ -765,7 +872,10 @@ def download_file(filename):
         if not file_manager:
             return create_error_response("システムが初期化されていません", 500)
         
-        file_path = file_manager.get_file_path(filename)
+        if filename == 'model.pkl':
+            file_path = file_manager.current_model_path()
+        else:
+            file_path = file_manager.get_file_path(filename)
         
         if not os.path.exists(file_path):
             return create_error_response(f"ファイルが見つかりません: {filename}", 404)
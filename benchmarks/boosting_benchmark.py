@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+ブースティングバックエンド比較ベンチマーク
+'gradient_boost' の学習時間・メモリ・一致数精度を従来モデルと比較
+
+使い方:
+    python benchmarks/boosting_benchmark.py                 # 最新データを自動取得
+    python benchmarks/boosting_benchmark.py --csv miniloto.csv --test-draws 100
+"""
+
+import os
+import sys
+import time
+import pickle
+import argparse
+import tracemalloc
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.prediction_system import AutoFetchEnsembleMiniLoto
+from models.model_factory import BOOSTING_BACKENDS, create_boosting_model
+
+
+def load_data(system, csv_path=None):
+    """ベンチマーク用データを読み込み"""
+    if csv_path:
+        return pd.read_csv(csv_path)
+
+    if not system.data_fetcher.fetch_latest_data():
+        raise RuntimeError("ミニロトデータ取得に失敗しました")
+    return system.data_fetcher.latest_data
+
+
+def matched_numbers(model, X_test, actual_sets):
+    """各抽選の確率上位5数字と当選数字の一致数を計算"""
+    proba = model.predict_proba(X_test)
+    top5 = model.classes_[np.argsort(proba, axis=1)[:, -5:]]
+    return np.array([len(set(pred) & actual) for pred, actual in zip(top5.tolist(), actual_sets)])
+
+
+def run_backend(backend, X_train, y_train, X_test, actual_sets):
+    """1バックエンド分の学習・評価を実行"""
+    model = create_boosting_model(backend)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    matches = matched_numbers(model, X_test, actual_sets)
+
+    return {
+        'backend': backend,
+        'fit_seconds': fit_seconds,
+        'peak_memory_mb': peak_bytes / 1024 / 1024,
+        'model_size_mb': len(pickle.dumps(model)) / 1024 / 1024,
+        'iterations': getattr(model, 'n_iter_', getattr(model, 'n_estimators_', None)),
+        'avg_matches': float(np.mean(matches)),
+        'sets_3_plus': int(np.sum(matches >= 3))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='gradient_boost バックエンド比較')
+    parser.add_argument('--csv', help='ミニロトCSVのパス（省略時は自動取得）')
+    parser.add_argument('--test-draws', type=int, default=50, help='評価に使う直近の抽選回数')
+    parser.add_argument('--backends', nargs='+', default=list(BOOSTING_BACKENDS), choices=BOOSTING_BACKENDS)
+    args = parser.parse_args()
+
+    system = AutoFetchEnsembleMiniLoto()
+    data = load_data(system, args.csv)
+
+    # 本番と同じ特徴量（1抽選 = 5サンプル、時系列順）
+    X, y = system.create_advanced_features(data, system.data_fetcher.main_columns)
+    if X is None or len(X) == 0:
+        raise RuntimeError("特徴量を作成できませんでした")
+
+    X = StandardScaler().fit_transform(X)
+    split = len(X) - args.test_draws * 5
+    if split <= 0:
+        raise RuntimeError(f"データ不足: {len(X) // 5}回分")
+
+    X_train, y_train = X[:split], y[:split]
+    X_test = X[split::5]
+    actual_sets = [set(y[i:i + 5].tolist()) for i in range(split, len(y), 5)]
+
+    print(f"学習: {split // 5}回分 ({split}サンプル) / 評価: {len(actual_sets)}回分")
+    print(f"{'backend':<10}{'fit[s]':>10}{'peak[MB]':>10}{'size[MB]':>10}{'iters':>8}{'avg一致':>10}{'3個以上':>8}")
+
+    for backend in args.backends:
+        result = run_backend(backend, X_train, y_train, X_test, actual_sets)
+        print(f"{result['backend']:<10}{result['fit_seconds']:>10.2f}{result['peak_memory_mb']:>10.1f}"
+              f"{result['model_size_mb']:>10.2f}{str(result['iterations']):>8}"
+              f"{result['avg_matches']:>10.3f}{result['sets_3_plus']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,7 @@ Celery設定 - 非同期タスク処理（修正版）
 
 import os
 from celery import Celery
+from celery.schedules import crontab
 
 # dotenvの安全なimport
 try:
@@ -13,6 +14,20 @@ except ImportError:
     # dotenvが利用できない場合はスキップ
     pass
 
+def make_beat_schedule():
+    """抽選日程に合わせた定期実行（抽選結果の公開見込み時刻に取得→照合・差分学習・予測を起動）"""
+    try:
+        from models.draw_calendar import DrawCalendar
+    except ImportError:
+        return {}
+    
+    return {
+        'post-draw-refresh': {
+            'task': 'tasks.post_draw_refresh_task',
+            'schedule': crontab(**DrawCalendar().refresh_crontab()),
+        },
+    }
+
 # Celeryアプリの作成
 def make_celery(app_name=__name__):
     # Redis URLの取得（Render.com環境変数対応）
@@ -57,11 +72,21 @@ def make_celery(app_name=__name__):
         # タスクルート設定
         task_routes={
             'tasks.train_model_task': {'queue': 'training'},
+            'tasks.hyperparameter_search_task': {'queue': 'training'},
+            'tasks.post_draw_refresh_task': {'queue': 'training'},
             'tasks.predict_task': {'queue': 'prediction'},
             'tasks.validation_task': {'queue': 'validation'},
+            'tasks.validation_point_task': {'queue': 'validation'},
+            'tasks.validation_expanding_task': {'queue': 'validation'},
+            'tasks.validation_reduce_task': {'queue': 'validation'},
+            'tasks.backtest_task': {'queue': 'validation'},
+            'tasks.ensemble_sweep_task': {'queue': 'validation'},
             'tasks.progressive_learning_stage_task': {'queue': 'learning'},
         },
         
+        # 定期実行設定（timezone='Asia/Tokyo' の時刻で評価）
+        beat_schedule=make_beat_schedule(),
+        
         # タイムアウト設定
         task_soft_time_limit=300,  # 5分のソフトタイムアウト
         task_time_limit=600,       # 10分のハードタイムアウト
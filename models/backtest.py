@@ -0,0 +1,259 @@
+"""
+ウォークフォワード・バックテスト - ミニロト対応版
+履歴の全回を順にテスト点とし、直前までのデータで逐次更新したモデルの20セット予測を評価
+"""
+
+import os
+import json
+import time
+import logging
+import numpy as np
+from collections import Counter
+from datetime import datetime
+
+from .draw_matching import MATCH_BINS, match_counts, match_histogram, to_bitmasks
+from .ensemble_sweep import distribution_vector, save_probability_cache
+from .features import NUMBER_MAX, PICK_COUNT, valid_draw_mask, compute_draw_features, build_next_draw_dataset
+from .incremental_training import IncrementalEnsemble
+from .random_baseline import RandomBaselineSimulator
+from .validation import MIN_TRAIN_SAMPLES
+
+logger = logging.getLogger(__name__)
+
+PREDICTION_COUNT = 20
+
+
+def probabilities_path_for(results_path):
+    """結果ファイルに対応する確率キャッシュ（アンサンブル設定スイープ用）のパス"""
+    return os.path.splitext(results_path)[0] + '_probabilities.npz'
+
+
+def read_backtest_results(path):
+    """
+    結果ファイル（JSON Lines）を配列にまとめて読み込み（書き込み途中の最終行は無視）
+    戻り値: ヘッダー情報と test_round / train_size / match_counts (N, 20) / predicted_masks (N, 20) / actual_masks の配列
+    """
+    header = {}
+    records = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f):
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    continue
+                if line_no == 0 and 'test_round' not in item:
+                    header = item
+                else:
+                    records.append(item)
+    except OSError:
+        return None
+
+    return {
+        'header': header,
+        'test_round': np.array([r['test_round'] for r in records], dtype=np.int64),
+        'train_size': np.array([r['train_size'] for r in records], dtype=np.int64),
+        'match_counts': np.array([r['match_counts'] for r in records], dtype=np.uint8).reshape(-1, PREDICTION_COUNT),
+        'predicted_masks': np.array([r['predicted_masks'] for r in records], dtype=np.uint32).reshape(-1, PREDICTION_COUNT),
+        'actual_masks': np.array([r['actual_mask'] for r in records], dtype=np.uint32)
+    }
+
+
+class WalkForwardBacktest:
+    """
+    全回ウォークフォワード・バックテスト
+    - 特徴量・学習データは全履歴で1回だけ作成し、各テスト点では先頭からの切り出し（コピーなし）
+    - モデルは IncrementalEnsemble で追加分だけ学習（update_every 回ごとに更新）
+    - 一致判定はビットマスク＋popcount、結果は1回ごとに JSON Lines へ追記
+    """
+
+    def __init__(self, validator, results_path, update_every=1):
+        self.validator = validator
+        self.results_path = results_path
+        self.update_every = max(1, int(update_every))
+
+        # 各回・各モデルの確率分布（アンサンブル設定スイープ用）
+        self.probabilities_path = probabilities_path_for(results_path)
+
+        os.makedirs(os.path.dirname(results_path), exist_ok=True)
+
+    def _first_test_index(self, draw_index, initial_size):
+        """学習サンプルが MIN_TRAIN_SAMPLES 以上になる最初のテスト位置"""
+        if len(draw_index) < MIN_TRAIN_SAMPLES:
+            return None
+        # テスト位置 t の学習データは draw_index < t - 1 の行
+        earliest = int(draw_index[MIN_TRAIN_SAMPLES - 1]) + 2
+        return max(earliest, int(initial_size or 0))
+
+    def run(self, data, main_cols, round_col, initial_size=None, budget=None, progress_callback=None):
+        """
+        全回バックテストを実行
+        initial_size: 最初のテスト位置（省略時は学習サンプルが揃う最初の回から）
+        progress_callback: (完了数, 総数) を受け取る関数
+        """
+        draws = self.validator.as_draws(data, main_cols, round_col)
+        if draws is None:
+            logger.error("本数字カラムが不足しています")
+            return None
+
+        numbers = draws.numbers
+        rounds = draws.rounds
+        total_rounds = len(draws)
+
+        # 全履歴で1回だけ計算（各テスト点では先頭からの切り出し）
+        features = compute_draw_features(numbers)
+        X_all, y_all, draw_index = build_next_draw_dataset(numbers, features)
+        valid = valid_draw_mask(numbers)
+        actual_masks = to_bitmasks(numbers)
+
+        # 有効な抽選の数字別出現回数（累積）: cum_freq[t] は第0〜t-1回の合計
+        onehot = np.zeros((total_rounds, NUMBER_MAX + 1), dtype=np.int64)
+        valid_rows = np.flatnonzero(valid)
+        np.add.at(onehot, (np.repeat(valid_rows, PICK_COUNT), numbers[valid_rows].reshape(-1).astype(np.intp)), 1)
+        cum_freq = np.vstack([np.zeros((1, NUMBER_MAX + 1), dtype=np.int64), np.cumsum(onehot, axis=0)])
+
+        start_idx = self._first_test_index(draw_index, initial_size)
+        if start_idx is None or start_idx >= total_rounds:
+            logger.warning("バックテストに必要な学習データが不足しています")
+            return None
+
+        test_indices = np.arange(start_idx, total_rounds)
+        update_steps = int(np.ceil(len(test_indices) / self.update_every))
+        ensemble = IncrementalEnsemble(self.validator.validation_models, update_steps)
+
+        logger.info(f"=== ウォークフォワード・バックテスト開始: {len(test_indices)}回（第{rounds[start_idx]}回〜・"
+                    f"更新間隔{self.update_every}回・忠実度: {self.validator.fidelity}） ===")
+
+        # 結果ファイルは実行ごとに作り直す（モデルは逐次更新のため途中からの再開はしない）
+        header = {
+            'fidelity': self.validator.fidelity,
+            'update_every': self.update_every,
+            'first_round': int(rounds[start_idx]),
+            'started_at': datetime.now().isoformat()
+        }
+
+        counts_rows = []
+        tested_rounds = []
+        tested_masks = []
+        probability_rows = []
+        frequent_masks = []
+        predicted_rows = []
+        model_names = list(self.validator.validation_models)
+        point_seconds = []
+        model_data = None
+        started = time.monotonic()
+
+        with open(self.results_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(header, ensure_ascii=False) + '\n')
+
+            for k, test_idx in enumerate(test_indices):
+                if self.validator.budget_exhausted(budget, point_seconds, 'walk_forward_backtest'):
+                    break
+
+                point_start = time.monotonic()
+
+                # 学習データ: テスト回の前回までの特徴量 → その次の回の数字（先頭からの切り出し）
+                if model_data is None or k % self.update_every == 0:
+                    n_samples = int(np.searchsorted(draw_index, test_idx - 1))
+                    ensemble.update(X_all[:n_samples], y_all[:n_samples])
+                    freq = cum_freq[test_idx]
+                    model_data = ensemble.model_data(Counter({n: int(freq[n]) for n in range(1, NUMBER_MAX + 1) if freq[n]}))
+
+                if not valid[test_idx] or not model_data['models']:
+                    point_seconds.append(time.monotonic() - point_start)
+                    continue
+
+                rng = np.random.default_rng([self.validator.random_state, 2, int(test_idx)])
+                distributions = self.validator.model_distributions(model_data)
+                predicted_sets = self.validator.generate_validation_predictions(
+                    model_data, model_data['freq_counter'], PREDICTION_COUNT, rng=rng,
+                    distributions=distributions
+                )
+                if len(predicted_sets) != PREDICTION_COUNT:
+                    point_seconds.append(time.monotonic() - point_start)
+                    continue
+
+                predicted_masks = to_bitmasks(predicted_sets)
+                counts = match_counts(predicted_masks, actual_masks[test_idx])
+
+                record = {
+                    'test_round': int(rounds[test_idx]),
+                    'train_size': int(test_idx),
+                    'match_counts': counts.tolist(),
+                    'predicted_masks': predicted_masks.tolist(),
+                    'actual_mask': int(actual_masks[test_idx])
+                }
+                f.write(json.dumps(record) + '\n')
+                f.flush()
+
+                counts_rows.append(counts)
+                tested_rounds.append(int(rounds[test_idx]))
+                tested_masks.append(actual_masks[test_idx])
+                predicted_rows.append(predicted_masks)
+                probability_rows.append(np.stack([
+                    distribution_vector(distributions[name]) if name in distributions
+                    else np.zeros(NUMBER_MAX, dtype=np.float32)
+                    for name in model_names
+                ]))
+                frequent_masks.append(to_bitmasks([n for n, _ in model_data['freq_counter'].most_common(8)]))
+                point_seconds.append(time.monotonic() - point_start)
+
+                if progress_callback and (k + 1) % 50 == 0:
+                    progress_callback(k + 1, len(test_indices))
+
+                if (k + 1) % 100 == 0:
+                    done = np.stack(counts_rows)
+                    logger.info(f"  進捗: {k + 1}/{len(test_indices)}回 | 平均一致: {done.mean():.3f}")
+
+        completed = len(point_seconds) == len(test_indices)
+        if probability_rows:
+            save_probability_cache(
+                self.probabilities_path, np.stack(probability_rows), model_names, tested_rounds,
+                tested_masks, frequent_masks, np.stack(predicted_rows), self.validator.fidelity
+            )
+        counts_matrix = np.stack(counts_rows) if counts_rows else np.empty((0, PREDICTION_COUNT), dtype=np.uint8)
+        summary = self.summarize(counts_matrix)
+        summary.update({
+            'completed': completed,
+            'fidelity': self.validator.fidelity,
+            'update_every': self.update_every,
+            'planned_points': len(test_indices),
+            'first_round': tested_rounds[0] if tested_rounds else None,
+            'last_round': tested_rounds[-1] if tested_rounds else None,
+            'model_refits': len(ensemble.refits),
+            'random_baseline': RandomBaselineSimulator(random_state=self.validator.random_state).compare(
+                counts_matrix, np.array(tested_masks, dtype=np.uint32)
+            ),
+            'seconds': round(time.monotonic() - started, 2),
+            'results_path': self.results_path,
+            'probabilities_path': self.probabilities_path if probability_rows else None
+        })
+
+        logger.info(f"ウォークフォワード・バックテスト{'完了' if completed else '中断'}: "
+                    f"{summary['total_points']}回 | 平均一致: {summary['avg_matches']:.3f}")
+        return summary
+
+    @staticmethod
+    def summarize(counts):
+        """一致数配列 (N, 20) から全体の統計を計算"""
+        if len(counts) == 0:
+            return {'total_points': 0, 'avg_matches': 0.0, 'match_histogram': [0] * MATCH_BINS}
+
+        counts = np.asarray(counts)
+        histogram = match_histogram(counts)
+        per_point = counts.mean(axis=1)
+        total_sets = counts.size
+
+        return {
+            'total_points': int(len(counts)),
+            'total_sets': int(total_sets),
+            'avg_matches': float(counts.mean()),
+            'std_point_avg_matches': float(per_point.std()),
+            'max_matches': int(counts.max()),
+            'match_histogram': histogram.tolist(),
+            'sets_3_plus': int(histogram[3:].sum()),
+            'sets_4_plus': int(histogram[4:].sum()),
+            'sets_5_plus': int(histogram[5:].sum()),
+            'rate_3_plus': float(histogram[3:].sum() / total_sets),
+            'points_with_3_plus': int((counts.max(axis=1) >= 3).sum())
+        }
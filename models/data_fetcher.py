@@ -2,15 +2,137 @@
 自動データ取得クラス - ミニロト対応版
 """
 
+import os
+import re
+import csv
+import time
+import hashlib
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import numpy as np
 import pandas as pd
 import io
 import traceback
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
+
+from .draw_calendar import DrawCalendar
+from .draw_dataset import DrawDataset
+from .draw_integrity import ISSUE_LABELS, DrawIntegrityChecker
 
 logger = logging.getLogger(__name__)
 
+# 取得結果を再利用する期間（秒）: この間は取得元へ問い合わせない
+DEFAULT_FETCH_TTL = 600
+
+# 他プロセスの取得完了を待つ最大時間（秒）
+FETCH_LOCK_TIMEOUT = 120
+
+# 1回の取得（条件付き取得のやり直しを含む全リクエスト）の期限（秒）
+# ロックの待ち時間より短くし、待っている他プロセスが諦めて同時に取得しないようにする
+DEFAULT_FETCH_DEADLINE = 90
+FETCH_LOCK_MARGIN = 15
+
+# 追記分だけを Range で取得する際に重ねて取得し、前回の末尾と一致するか確認するバイト数
+TAIL_OVERLAP_BYTES = 256
+
+# エンコーディング候補（判定は本文先頭の一部だけで行う）
+ENCODING_CANDIDATES = ('utf-8', 'shift-jis', 'cp932', 'iso-8859-1')
+ENCODING_SAMPLE_BYTES = 8192
+
+
+def detect_encoding(content, preferred=None):
+    """本文先頭（ヘッダー行を含む）の一部だけをデコードしてエンコーディングを判定"""
+    sample = content[:ENCODING_SAMPLE_BYTES]
+    if len(content) > len(sample):
+        # 途中で切れた多バイト文字で誤判定しないよう最後の改行までに揃える
+        cut = sample.rfind(b'\n')
+        if cut > 0:
+            sample = sample[:cut]
+    
+    candidates = ([preferred] if preferred else []) + [e for e in ENCODING_CANDIDATES if e != preferred]
+    for encoding in candidates:
+        try:
+            sample.decode(encoding)
+            return encoding
+        except (UnicodeDecodeError, LookupError):
+            continue
+    return None
+
+
+# HTTP取得: 接続・読み込みタイムアウト（秒）と再試行（指数バックオフ 0, 1, 2秒…、回数で上限）
+# 読み込みタイムアウトは再試行しない（遅い取得元に何度も待たされないように）
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 20
+DEFAULT_FETCH_RETRIES = 3
+RETRY_BACKOFF_FACTOR = 0.5
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_http_session = None
+_http_session_pid = None
+
+
+def get_http_session():
+    """
+    取得元への共有セッション（接続を再利用・一時的な失敗は再試行）
+    プロセスごとに1つ作成（fork後の子プロセスでは作り直す）
+    """
+    global _http_session, _http_session_pid
+    if _http_session is None or _http_session_pid != os.getpid():
+        retries = get_fetch_retries()
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=retries,
+            backoff_factor=RETRY_BACKOFF_FACTOR,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            # Retry-After は上限なく待たされるため使わない（待ち時間はバックオフで上限を決める）
+            respect_retry_after_header=False,
+            raise_on_status=False
+        )
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=retry)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _http_session = session
+        _http_session_pid = os.getpid()
+    return _http_session
+
+
+def get_fetch_retries():
+    """再試行回数（環境変数 DATA_FETCH_RETRIES）"""
+    return max(0, int(os.environ.get('DATA_FETCH_RETRIES', DEFAULT_FETCH_RETRIES)))
+
+
+def retry_backoff_total(retries):
+    """再試行のバックオフ待ちの合計（秒、urllib3 は2回目の再試行から factor * 2^(n-1) 待つ）"""
+    return sum(RETRY_BACKOFF_FACTOR * 2 ** (n - 1) for n in range(2, retries + 1))
+
+
+def get_fetch_deadline():
+    """1回の取得の期限（環境変数 DATA_FETCH_DEADLINE、ロックの待ち時間より短く制限）"""
+    deadline = float(os.environ.get('DATA_FETCH_DEADLINE', DEFAULT_FETCH_DEADLINE))
+    return max(1.0, min(deadline, FETCH_LOCK_TIMEOUT - FETCH_LOCK_MARGIN))
+
+
+def get_fetch_timeout():
+    """(接続, 読み込み) タイムアウト（環境変数 DATA_FETCH_CONNECT_TIMEOUT / DATA_FETCH_READ_TIMEOUT）"""
+    return (
+        float(os.environ.get('DATA_FETCH_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT)),
+        float(os.environ.get('DATA_FETCH_READ_TIMEOUT', DEFAULT_READ_TIMEOUT))
+    )
+
+
+def get_fetch_ttl(ttl=None):
+    """取得結果の再利用期間（環境変数 DATA_FETCH_TTL、0で毎回問い合わせ）"""
+    if ttl is None:
+        ttl = os.environ.get('DATA_FETCH_TTL', DEFAULT_FETCH_TTL)
+    return max(0, int(ttl))
+
+
 class AutoDataFetcher:
     """ミニロトデータ自動取得クラス"""
     
@@ -25,55 +147,421 @@ class AutoDataFetcher:
         self.latest_data = None
         self.latest_round = 0
         
+        # 取り込み時に1回だけ作るコンパクトな読み取り専用配列（予測・検証・APIで共有）
+        self.draws = None
+        
+        # 整合性チェックの判定結果（追記分だけを検査、丸ごと読み直した場合は破棄）
+        self.integrity = DrawIntegrityChecker()
+        
         # データキャッシュ用
         self.cache_manager = None
         
+        # 条件付き取得（ETag / Last-Modified）と直近の取得結果
+        self.fetch_state = None
+        self.last_fetch_status = None
+        
+        # TTL内の取得結果は全プロセスで共有（data_version は読み込み済みデータの取得時刻）
+        self.fetch_ttl = get_fetch_ttl()
+        self.data_version = None
+        
+        # 抽選日程: 直近の抽選まで取り込み済みなら次回抽選まで問い合わせない
+        self.calendar = DrawCalendar()
+        
+        # 取得中の期限（time.monotonic 基準、取得中以外はNone）
+        self.fetch_deadline = None
+        
+        # HTTP取得の計測値（リクエスト数・再試行・レイテンシ）
+        self.http_metrics = {
+            'requests': 0,
+            'retries': 0,
+            'errors': 0,
+            'total_latency_ms': 0.0,
+            'last_latency_ms': None,
+            'last_status': None,
+            'last_bytes': None
+        }
+        
+        # 直近のパースで使えたエンコーディングと全カラム名（取得元ごとに記憶し、追記分のパースにも使用）
+        self.csv_encoding = None
+        self.csv_header = None
+        
     def set_cache_manager(self, file_manager):
         """ファイル管理器を設定"""
         self.cache_manager = file_manager
         
-    def fetch_latest_data(self):
-        """最新のミニロトデータを自動取得"""
+    def _load_fetch_state(self):
+        """保存済みの取得状態（ETag・Last-Modified・確認時刻）を読み込み（他プロセスの更新も反映）"""
+        if self.cache_manager:
+            self.fetch_state = self.cache_manager.load_fetch_state(self.csv_url)
+        elif self.fetch_state is None:
+            self.fetch_state = {}
+        return self.fetch_state
+    
+    def _store_fetch_state(self, state):
+        """取得状態を保存（キャッシュ管理がなければメモリのみ）"""
+        self.fetch_state = state
+        if self.cache_manager:
+            self.cache_manager.save_fetch_state(self.csv_url, state)
+    
+    def _has_reusable_data(self):
+        """条件付きリクエストで再利用できるデータがあるか"""
+        return self.latest_data is not None or (self.cache_manager is not None and self.cache_manager.data_cached())
+    
+    def _conditional_headers(self, state):
+        """再利用できるデータがある場合のみ条件付きリクエストのヘッダーを付与"""
+        if not self._has_reusable_data():
+            return {}
+        
+        headers = {}
+        if state.get('etag'):
+            headers['If-None-Match'] = state['etag']
+        if state.get('last_modified'):
+            headers['If-Modified-Since'] = state['last_modified']
+        return headers
+    
+    def _state_age(self, state):
+        """取得元へ最後に確認してからの経過秒数（不明ならNone）"""
         try:
-            logger.info("=== ミニロト自動データ取得開始 ===")
-            logger.info(f"URL: {self.csv_url}")
+            return (datetime.now() - datetime.fromisoformat(state['checked_at'])).total_seconds()
+        except (KeyError, TypeError, ValueError):
+            return None
+    
+    def _reuse_state_data(self, state):
+        """取得状態と同じ版のデータを再利用（メモリ上になければキャッシュから、再パースなし）"""
+        if self.latest_data is not None and self.data_version == state.get('fetched_at'):
+            return 'memory'
+        if self._load_from_cache():
+            self.data_version = state.get('fetched_at')
+            return 'cache'
+        return None
+    
+    def _reuse_fresh(self):
+        """TTL内、または直近の抽選まで（他プロセスを含め）取得済みならそのデータを再利用"""
+        if self.fetch_ttl <= 0:
+            return False
+        
+        state = self._load_fetch_state()
+        age = self._state_age(state)
+        if age is None:
+            return False
+        current = self.calendar.is_current(state.get('latest_date'))
+        if age > self.fetch_ttl and not current:
+            return False
+        
+        source = self._reuse_state_data(state)
+        if source is None:
+            return False
+        
+        self.last_fetch_status = f'fresh_{source}'
+        if age > self.fetch_ttl:
+            logger.info(f"次回抽選まで取得済みデータを再利用（第{self.latest_round}回まで・"
+                        f"有効期限 {self.calendar.valid_until():%Y-%m-%d %H:%M}）")
+        else:
+            logger.info(f"取得済みデータを再利用（{int(age)}秒前に確認・TTL {self.fetch_ttl}秒・第{self.latest_round}回まで）")
+        return True
+    
+    def latest_draw_date(self):
+        """取り込み済みの最新の抽選日（不明ならNone）"""
+        draws = self.get_draws()
+        if draws is None or draws.dates is None or len(draws) == 0:
+            return None
+        dates = draws.dates[~np.isnat(draws.dates)]
+        if len(dates) == 0:
+            return None
+        return dates.max().astype('datetime64[D]').item()
+    
+    def data_is_current(self):
+        """直近の抽選結果まで取り込み済みか（抽選日程で判定）"""
+        return self.calendar.is_current(self.latest_draw_date())
+    
+    def valid_until(self):
+        """取り込み済みデータの有効期限（直近の抽選まで取り込み済みなら次回抽選の結果公開まで、それ以外はTTLまで）"""
+        state = self.fetch_state or {}
+        if self.calendar.is_current(state.get('latest_date') or self.latest_draw_date()):
+            return self.calendar.valid_until()
+        age = self._state_age(state)
+        if age is None:
+            return None
+        return self.calendar.now() + timedelta(seconds=max(0.0, self.fetch_ttl - age))
+    
+    def _request_timeout(self):
+        """
+        期限の残りに収まる (接続, 読み込み) タイムアウト（期限切れならNone）
+        再試行を含む全試行とバックオフ待ちの合計が残り時間を超えないよう、設定値を同じ比率で縮める
+        """
+        connect, read = get_fetch_timeout()
+        if self.fetch_deadline is None:
+            return connect, read
+        
+        retries = get_fetch_retries()
+        budget = self.fetch_deadline - time.monotonic() - retry_backoff_total(retries)
+        if budget <= 0:
+            return None
+        scale = min(1.0, budget / ((retries + 1) * (connect + read)))
+        return connect * scale, read * scale
+    
+    def _http_get(self, headers=None):
+        """共有セッションで取得し、レイテンシ・再試行回数を記録（取得の期限を超えたら Timeout）"""
+        timeout = self._request_timeout()
+        if timeout is None:
+            raise requests.exceptions.Timeout("データ取得の期限を超えました")
+        
+        start = time.monotonic()
+        metrics = self.http_metrics
+        metrics['requests'] += 1
+        try:
+            response = get_http_session().get(self.csv_url, headers=headers or {}, timeout=timeout)
+        except requests.exceptions.RequestException:
+            metrics['errors'] += 1
+            metrics['last_status'] = None
+            raise
+        finally:
+            latency = (time.monotonic() - start) * 1000
+            metrics['total_latency_ms'] += latency
+            metrics['last_latency_ms'] = round(latency, 1)
+        
+        retry_state = getattr(response.raw, 'retries', None)
+        if retry_state is not None:
+            metrics['retries'] += len(retry_state.history)
+        metrics['last_status'] = response.status_code
+        metrics['last_bytes'] = len(response.content)
+        logger.info(f"HTTP {response.status_code}: {metrics['last_bytes']} bytes / {metrics['last_latency_ms']}ms")
+        return response
+    
+    def http_stats(self):
+        """HTTP取得の計測値（平均レイテンシを含む）"""
+        metrics = dict(self.http_metrics)
+        metrics['avg_latency_ms'] = round(metrics['total_latency_ms'] / metrics['requests'], 1) if metrics['requests'] else None
+        metrics['total_latency_ms'] = round(metrics['total_latency_ms'], 1)
+        return metrics
+    
+    def fetch_freshness(self):
+        """直近の取得結果の鮮度（タスク結果・ステータス表示用）"""
+        state = self.fetch_state or {}
+        age = self._state_age(state)
+        valid_until = self.valid_until()
+        return {
+            'status': self.last_fetch_status,
+            'latest_round': int(self.latest_round or 0),
+            'fetched_at': state.get('fetched_at'),
+            'checked_at': state.get('checked_at'),
+            'age_seconds': None if age is None else round(age, 1),
+            'ttl_seconds': self.fetch_ttl,
+            'latest_date': state.get('latest_date'),
+            'valid_until': None if valid_until is None else valid_until.isoformat(),
+            'http': self.http_stats()
+        }
+    
+    def fetch_latest_data(self, force=False):
+        """
+        最新のミニロトデータを自動取得
+        - TTL内に取得済みなら取得元へ問い合わせずに再利用（force=True で無視）
+        - 取得元へのアクセスはプロセス間ロックで1つに絞り、待っていた他の呼び出しはその結果を共有
+        """
+        if not force and self._reuse_fresh():
+            return True
+        
+        if not self.cache_manager:
+            return self._fetch_from_source()
+        
+        with self.cache_manager.fetch_lock(FETCH_LOCK_TIMEOUT):
+            # ロック待ちの間に他プロセスが取得を終えていればその結果を使う
+            if not force and self._reuse_fresh():
+                return True
+            return self._fetch_from_source()
+    
+    def _range_headers(self, state, headers):
+        """前回取り込んだ長さ以降（末尾の重なり分を含む）だけを要求するヘッダー"""
+        prev_length = int(state.get('content_length') or 0)
+        if not headers or not state.get('tail_sha1') or prev_length < TAIL_OVERLAP_BYTES:
+            return headers
+        return {**headers, 'Range': f'bytes={prev_length - TAIL_OVERLAP_BYTES}-'}
+    
+    @staticmethod
+    def _content_fingerprint(content):
+        """取り込んだ本文の長さ・全体ハッシュ・末尾ハッシュ（次回の追記判定用）"""
+        return {
+            'content_length': len(content),
+            'content_sha1': hashlib.sha1(content).hexdigest(),
+            'tail_sha1': hashlib.sha1(content[-TAIL_OVERLAP_BYTES:]).hexdigest()
+        }
+    
+    def _partial_tail(self, response, state):
+        """206応答から新しい末尾を取り出す（重なり部分が前回の末尾と一致しなければNone）"""
+        prev_length = int(state.get('content_length') or 0)
+        match = re.match(r'bytes (\d+)-\d+/(\d+|\*)', response.headers.get('Content-Range', ''))
+        if not match or int(match.group(1)) != prev_length - TAIL_OVERLAP_BYTES:
+            return None
+        
+        overlap = response.content[:TAIL_OVERLAP_BYTES]
+        if hashlib.sha1(overlap).hexdigest() != state.get('tail_sha1'):
+            return None
+        return response.content[TAIL_OVERLAP_BYTES:]
+    
+    def _appended_tail(self, content, state):
+        """全体の本文のうち前回取り込んだ部分が変わっていなければ、その後ろの追記分（変わっていればNone）"""
+        prev_length = int(state.get('content_length') or 0)
+        if not state.get('content_sha1') or prev_length == 0 or len(content) < prev_length:
+            return None
+        if hashlib.sha1(content[:prev_length]).hexdigest() != state['content_sha1']:
+            return None
+        return content[prev_length:]
+    
+    def _append_rows(self, tail, state):
+        """追記された行だけをパースして既存データの後ろに追加（できなければFalse）"""
+        if self._reuse_state_data(state) is None:
+            return False
+        
+        body = tail.lstrip(b'\r\n')
+        if not body.strip():
+            return True
+        
+        header = state.get('header') or self.csv_header
+        if not header:
+            return False
+        
+        try:
+            new_rows = self._read_csv_bytes(body, state.get('encoding') or self.csv_encoding or 'utf-8', header, names=header)
+        except Exception as e:
+            logger.info(f"追記分のパースに失敗したため全体を読み直します: {e}")
+            return False
+        
+        # カラム構成が既存データと違えば（ヘッダーの不一致など）追記せず全体を読み直す
+        required = [self.round_column] + self.main_columns
+        if any(col not in new_rows.columns for col in required) or set(new_rows.columns) != set(self.latest_data.columns):
+            logger.info(f"追記分のカラムが既存データと一致しないため全体を読み直します: {list(new_rows.columns)}")
+            return False
+        
+        # 追記分は既存の最新回より後の回だけで構成されているはず
+        new_rounds = pd.to_numeric(new_rows[self.round_column], errors='coerce')
+        if new_rounds.isna().any() or (new_rounds <= self.latest_round).any():
+            return False
+        
+        self.latest_data = pd.concat([self.latest_data, new_rows], ignore_index=True)
+        logger.info(f"追記分のみ取り込み: {len(new_rows)}件（{len(tail)} bytes）")
+        return True
+    
+    def _build_draws(self):
+        """取り込んだデータからコンパクトな配列データセットを作成"""
+        self.draws = DrawDataset.from_dataframe(
+            self.latest_data, self.main_columns, self.round_column,
+            self.date_column, self.bonus_columns[0] if self.bonus_columns else None
+        )
+    
+    def _set_latest_data(self, df):
+        """取り込んだデータを保持し最新回を更新（整合性は追記分だけを検査）"""
+        self.latest_data = df
+        self._build_draws()
+        
+        valid, message = self.validate_data_integrity()
+        if not valid:
+            logger.warning(message)
+        
+        # 最新回を取得
+        if self.round_column in self.latest_data.columns:
+            self.latest_round = int(self.latest_data[self.round_column].max())
+            logger.info(f"最新開催回: 第{self.latest_round}回")
             
-            # CSVデータを取得
-            response = requests.get(self.csv_url, timeout=30)
-            response.raise_for_status()
+            # 最新データの確認
+            latest_entry = self.latest_data[self.latest_data[self.round_column] == self.latest_round].iloc[0]
+            logger.info(f"最新回日付: {latest_entry.get(self.date_column, 'N/A')}")
             
-            logger.info(f"データ取得成功: {len(response.content)} bytes")
+            main_nums = [int(latest_entry[col]) for col in self.main_columns if col in latest_entry.index]
+            bonus_nums = [int(latest_entry[col]) for col in self.bonus_columns if col in latest_entry.index and pd.notna(latest_entry[col])]
+            logger.info(f"最新回当選番号: {main_nums} + ボーナス{bonus_nums}")
+    
+    def _fetch_from_source(self):
+        """
+        取得元からデータを取得
+        - 前回から更新がなければ304で再利用
+        - 追記だけなら新しい末尾の行だけをパース（Range 取得、または本文の前回分以降を切り出し）
+        - 前回取り込んだ部分が変わっていた場合のみ全体を読み直す
+        """
+        self.fetch_deadline = time.monotonic() + get_fetch_deadline()
+        try:
+            logger.info("=== ミニロト自動データ取得開始 ===")
+            logger.info(f"URL: {self.csv_url}")
             
-            # CSVをパース（文字エンコーディングを考慮）
-            df = self._parse_csv_content(response.content)
+            # CSVデータを取得（保存済みの ETag / Last-Modified で条件付きリクエスト）
+            state = self._load_fetch_state()
+            headers = self._conditional_headers(state)
+            response = self._http_get(self._range_headers(state, headers))
             
-            if df is None:
-                logger.error("CSVパースに失敗しました")
-                # キャッシュからの読み込みを試行
-                return self._load_from_cache()
+            if response.status_code == 304:
+                source = self._reuse_state_data(state)
+                if source is not None:
+                    logger.info(f"データ未更新（304）: {'メモリ上のデータ' if source == 'memory' else 'キャッシュ'}を再利用（第{self.latest_round}回まで）")
+                    self._store_fetch_state({**state, 'checked_at': datetime.now().isoformat()})
+                    self.last_fetch_status = 'not_modified'
+                    return True
+                # 再利用できるデータが消えていた場合は通常の取得をやり直す
+                logger.warning("304応答ですが再利用できるデータがないため全件を再取得します")
+                response = self._http_get()
             
-            logger.info(f"データ読み込み: {len(df)}件")
-            logger.info(f"カラム: {list(df.columns)}")
+            if response.status_code == 416:
+                # 前回より短くなっている（作り直された）場合は全体を取得
+                response = self._http_get()
             
-            # データを保存（元のカラム名のまま処理）
-            self.latest_data = df.copy()
+            fingerprint = None
+            if response.status_code == 206:
+                # Range 取得: 重なり部分で接続位置を確認（全体ハッシュは計算できないので次回は全体比較なし）
+                tail = self._partial_tail(response, state)
+                if tail is not None and self._append_rows(tail, state):
+                    content_length = int(state['content_length']) + len(tail)
+                    fingerprint = {
+                        'content_length': content_length,
+                        'content_sha1': None,
+                        'tail_sha1': hashlib.sha1(response.content[-TAIL_OVERLAP_BYTES:]).hexdigest()
+                    }
+                    self.last_fetch_status = 'appended'
+                else:
+                    logger.info("Range 取得の末尾が前回と一致しないため全体を再取得します")
+                    response = self._http_get()
             
-            # 最新回を取得
-            if self.round_column in self.latest_data.columns:
-                self.latest_round = int(self.latest_data[self.round_column].max())
-                logger.info(f"最新開催回: 第{self.latest_round}回")
+            if fingerprint is None:
+                response.raise_for_status()
+                content = response.content
+                logger.info(f"データ取得成功: {len(content)} bytes")
                 
-                # 最新データの確認
-                latest_entry = self.latest_data[self.latest_data[self.round_column] == self.latest_round].iloc[0]
-                logger.info(f"最新回日付: {latest_entry.get(self.date_column, 'N/A')}")
-                
-                main_nums = [int(latest_entry[col]) for col in self.main_columns if col in latest_entry.index]
-                bonus_nums = [int(latest_entry[col]) for col in self.bonus_columns if col in latest_entry.index and pd.notna(latest_entry[col])]
-                logger.info(f"最新回当選番号: {main_nums} + ボーナス{bonus_nums}")
+                tail = self._appended_tail(content, state) if headers else None
+                if tail is not None and self._append_rows(tail, state):
+                    self.last_fetch_status = 'appended'
+                else:
+                    # CSVをパース（文字エンコーディングを考慮）
+                    df = self._parse_csv_content(content, preferred_encoding=state.get('encoding'))
+                    
+                    if df is None:
+                        logger.error("CSVパースに失敗しました")
+                        # キャッシュからの読み込みを試行
+                        return self._fallback_to_cache()
+                    
+                    logger.info(f"データ読み込み: {len(df)}件")
+                    logger.info(f"カラム: {list(df.columns)}")
+                    
+                    # データを保存（元のカラム名のまま処理、パース直後なのでコピー不要）
+                    self.latest_data = df
+                    self.integrity.reset()
+                    self.last_fetch_status = 'downloaded'
+                fingerprint = self._content_fingerprint(content)
             
-            # キャッシュに保存
-            if self.cache_manager:
-                self.cache_manager.save_data_cache(self.latest_data)
+            self._set_latest_data(self.latest_data)
+            
+            # キャッシュに保存（保存できた場合のみ取得状態を更新し、他プロセス・次回の条件付きリクエストに使う）
+            now = datetime.now().isoformat()
+            self.data_version = now
+            latest_date = self.latest_draw_date()
+            if not self.cache_manager or self._save_cache():
+                self._store_fetch_state({
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    **fingerprint,
+                    'encoding': self.csv_encoding or state.get('encoding'),
+                    'header': self.csv_header or state.get('header'),
+                    'latest_round': self.latest_round,
+                    'latest_date': None if latest_date is None else latest_date.isoformat(),
+                    'fetched_at': now,
+                    'checked_at': now
+                })
             
             logger.info("ミニロト自動データ取得完了")
             return True
@@ -81,46 +569,125 @@ class AutoDataFetcher:
         except requests.exceptions.RequestException as e:
             logger.error(f"ネットワークエラー: {e}")
             # キャッシュからの読み込みを試行
-            return self._load_from_cache()
+            return self._fallback_to_cache()
         except Exception as e:
             logger.error(f"データ取得エラー: {e}")
             logger.error(f"詳細: {traceback.format_exc()}")
             # キャッシュからの読み込みを試行
-            return self._load_from_cache()
+            return self._fallback_to_cache()
+        finally:
+            self.fetch_deadline = None
+    
+    def _fallback_to_cache(self):
+        """取得失敗時はキャッシュのデータで続行（鮮度は 'cache_fallback' として報告）"""
+        self.last_fetch_status = 'cache_fallback'
+        if not self._load_from_cache():
+            return False
+        self.data_version = (self.fetch_state or {}).get('fetched_at')
+        return True
+    
+    def _read_csv_bytes(self, content, encoding, header, names=None):
+        """
+        バイト列のままCSVを読み込み（文字列への全体デコード・コピーなし）
+        使うカラムだけを読み、開催回・本数字は整数型を指定（欠損があれば型推定に戻す）
+        """
+        wanted = [self.round_column, self.date_column] + self.main_columns + self.bonus_columns
+        usecols = [col for col in header if col in wanted]
+        if not all(col in usecols for col in [self.round_column] + self.main_columns):
+            usecols = None
+        
+        kwargs = {'encoding': encoding, 'usecols': usecols}
+        if names is not None:
+            kwargs.update(header=None, names=names)
+        
+        int_columns = {col: 'int64' for col in [self.round_column] + self.main_columns if col in header}
+        try:
+            return pd.read_csv(io.BytesIO(content), dtype=int_columns, **kwargs)
+        except ValueError:
+            return pd.read_csv(io.BytesIO(content), **kwargs)
     
-    def _parse_csv_content(self, content):
-        """CSVコンテンツをパース（複数エンコーディング対応）"""
-        encodings = ['utf-8', 'shift-jis', 'cp932', 'iso-8859-1']
+    def _parse_csv_content(self, content, preferred_encoding=None):
+        """CSVコンテンツをパース（エンコーディングは先頭の一部で1回だけ判定、前回の判定結果を優先）"""
+        detected = detect_encoding(content, preferred_encoding)
+        encodings = ([detected] if detected else []) + [e for e in ENCODING_CANDIDATES if e != detected]
+        
+        # ヘッダー行だけを切り出す（本文全体はコピーしない）
+        header_end = content.find(b'\n')
+        header_line = content[:header_end] if header_end >= 0 else content
         
         for encoding in encodings:
             try:
-                csv_content = content.decode(encoding)
-                df = pd.read_csv(io.StringIO(csv_content))
+                # pandas と同じくBOMを除いたカラム名にする（追記分のパースで names に使うため）
+                header = next(csv.reader([header_line.decode(encoding).strip().lstrip('\ufeff')]))
+                df = self._read_csv_bytes(content, encoding, header)
                 
                 # 基本的な検証（ミニロト用）
                 if len(df) > 0 and len(df.columns) >= 5:  # 最低5列あればOK
                     logger.info(f"CSV解析成功（エンコーディング: {encoding}）")
+                    self.csv_encoding = encoding
+                    # 記憶するカラム名はパース結果と一致するものに限る（一致しなければ全カラムを読んだ結果の列名）
+                    self.csv_header = header if set(df.columns) <= set(header) else list(df.columns)
                     return df
                     
             except Exception as e:
+                # 先頭の判定が外れた場合（後半にだけ現れる文字など）のみ他の候補を試す
                 logger.debug(f"エンコーディング {encoding} でのパース失敗: {e}")
                 continue
         
         logger.error("全てのエンコーディングでCSVパースに失敗")
         return None
     
+    def _save_cache(self):
+        """配列データセットを .npy 列キャッシュに保存（他プロセスはメモリマップで共有）"""
+        if self.get_draws() is None:
+            return False
+        return self.cache_manager.save_draw_cache(self.draws.to_columns(), {
+            'source_url': self.csv_url,
+            'latest_round': int(self.latest_round or 0),
+            'column_names': {
+                'round': self.round_column,
+                'date': self.date_column,
+                'main': self.main_columns,
+                'bonus': self.bonus_columns
+            }
+        })
+    
+    def load_cached_draws(self):
+        """
+        キャッシュの抽選履歴を配列データセットとして読み込み（メモリマップ・パースなし）
+        旧形式のCSVキャッシュしかない場合は読み込んで新形式に移行
+        """
+        if not self.cache_manager:
+            return False
+        
+        cached = self.cache_manager.load_draw_cache()
+        if cached is not None:
+            self.draws = DrawDataset.from_columns(cached[1])
+        else:
+            legacy = self.cache_manager.load_data_cache()
+            if legacy is None or len(legacy) == 0:
+                return False
+            self.latest_data = legacy
+            self._build_draws()
+            self._save_cache()
+        
+        if self.draws is None or len(self.draws) == 0:
+            return False
+        self.latest_round = int(self.draws.rounds.max())
+        return True
+    
     def _load_from_cache(self):
-        """キャッシュからデータを読み込み"""
+        """キャッシュからデータを読み込み（DataFrameは配列データセットから復元）"""
         if not self.cache_manager:
             return False
             
         try:
-            cached_data = self.cache_manager.load_data_cache()
-            if cached_data is not None and len(cached_data) > 0:
-                self.latest_data = cached_data
-                
-                if self.round_column in self.latest_data.columns:
-                    self.latest_round = int(self.latest_data[self.round_column].max())
+            if self.load_cached_draws():
+                self.integrity.reset()
+                self.latest_data = self.draws.to_dataframe(
+                    self.main_columns, self.round_column, self.date_column,
+                    self.bonus_columns[0] if self.bonus_columns else None
+                )
                 
                 logger.info(f"キャッシュからデータを読み込み: {len(self.latest_data)}件")
                 logger.info(f"最新開催回: 第{self.latest_round}回（キャッシュ）")
@@ -148,6 +715,21 @@ class AutoDataFetcher:
             'prediction_target': f"第{next_round}回"
         }
     
+    def get_draws(self):
+        """コンパクトな読み取り専用の抽選履歴（未取得ならNone）"""
+        if self.draws is None and self.latest_data is not None:
+            self._build_draws()
+        return self.draws
+    
+    def memory_usage(self):
+        """保持データの使用メモリ（配列データセットと元のDataFrame）"""
+        if self.latest_data is None:
+            return None
+        return {
+            'draws': self.get_draws().memory_usage() if self.get_draws() is not None else None,
+            'dataframe_bytes': int(self.latest_data.memory_usage(deep=True).sum())
+        }
+    
     def get_data_for_training(self):
         """学習用データを返す"""
         if self.latest_data is None:
@@ -155,7 +737,10 @@ class AutoDataFetcher:
         return self.latest_data
     
     def validate_data_integrity(self):
-        """データの整合性をチェック（ミニロト用）"""
+        """
+        データの整合性をチェック（ミニロト用）
+        範囲・抽選内の重複・開催回の重複は不正、ボーナス・開催回の順序・欠番は警告（判定済みの行は再検査しない）
+        """
         if self.latest_data is None:
             return False, "データが読み込まれていません"
         
@@ -168,45 +753,49 @@ class AutoDataFetcher:
                 return False, f"必要なカラムが不足: {missing_columns}"
             
             # データの基本検証
-            if len(self.latest_data) == 0:
+            draws = self.get_draws()
+            if draws is None or len(draws) == 0:
                 return False, "データが空です"
             
-            # 数値データの検証（ミニロト: 1-31）
-            for col in self.main_columns:
-                if col in self.latest_data.columns:
-                    # 数値範囲チェック（1-31）
-                    invalid_numbers = self.latest_data[
-                        (self.latest_data[col] < 1) | (self.latest_data[col] > 31)
-                    ]
-                    if len(invalid_numbers) > 0:
-                        return False, f"{col}に無効な数値があります（1-31の範囲外）"
+            report = self.integrity.check(draws)
+            issues = report['issues']
             
-            # 開催回の連続性チェック
-            rounds = sorted(self.latest_data[self.round_column].unique())
-            if len(rounds) > 1:
-                gaps = []
-                for i in range(1, len(rounds)):
-                    if rounds[i] - rounds[i-1] > 1:
-                        gaps.append((rounds[i-1], rounds[i]))
-                
-                if gaps:
-                    logger.warning(f"開催回に欠損があります: {gaps}")
+            # 警告は新しく検査した行がある場合のみ（判定済みの結果を毎回出さない）
+            if report['checked_rows']:
+                for name in ('invalid_bonus', 'out_of_order'):
+                    if issues[name]['count']:
+                        logger.warning(f"{ISSUE_LABELS[name]}: {issues[name]['count']}件 開催回 {issues[name]['rounds']}")
+                if report['gaps']:
+                    logger.warning(f"開催回に欠損があります: {report['missing_rounds']}回分 {report['gaps']}")
             
-            return True, f"データ検証成功: {len(self.latest_data)}件、第{self.latest_round}回まで"
+            if not report['valid']:
+                errors = [f"{ISSUE_LABELS[name]} {issues[name]['count']}件 開催回 {issues[name]['rounds']}"
+                          for name in ('out_of_range', 'duplicate_numbers', 'duplicate_rounds') if issues[name]['count']]
+                return False, f"不正なデータが{report['invalid_rows']}件あります: {' / '.join(errors)}"
+            
+            return True, f"データ検証成功: {len(draws)}件（新規検査{report['checked_rows']}件）、第{self.latest_round}回まで"
             
         except Exception as e:
             return False, f"データ検証エラー: {str(e)}"
     
+    def integrity_report(self):
+        """整合性チェックの結果（未検査の行があれば検査してから集計）"""
+        draws = self.get_draws()
+        if draws is None:
+            return None
+        return self.integrity.check(draws)
+    
     def get_data_summary(self):
-        """データサマリーを取得"""
+        """データサマリーを取得（配列データセットから集計、日付は取り込み時に解析済み）"""
         if self.latest_data is None:
             return None
         
         try:
+            draws = self.get_draws()
             summary = {
                 'total_records': len(self.latest_data),
                 'latest_round': self.latest_round,
-                'earliest_round': int(self.latest_data[self.round_column].min()) if self.round_column in self.latest_data.columns else None,
+                'earliest_round': int(draws.rounds.min()) if draws is not None and len(draws) else None,
                 'columns': list(self.latest_data.columns),
                 'date_range': {
                     'start': None,
@@ -215,18 +804,18 @@ class AutoDataFetcher:
             }
             
             # 日付範囲の取得
-            if self.date_column in self.latest_data.columns:
-                dates = pd.to_datetime(self.latest_data[self.date_column], errors='coerce')
-                valid_dates = dates.dropna()
+            if draws is not None and draws.dates is not None:
+                valid_dates = draws.dates[~np.isnat(draws.dates)]
                 if len(valid_dates) > 0:
-                    summary['date_range']['start'] = valid_dates.min().isoformat()
-                    summary['date_range']['end'] = valid_dates.max().isoformat()
+                    summary['date_range']['start'] = pd.Timestamp(valid_dates.min()).isoformat()
+                    summary['date_range']['end'] = pd.Timestamp(valid_dates.max()).isoformat()
             
-            # 数値統計
+            # 数値統計（欠損は0として格納されているので除外）
             number_stats = {}
-            for col in self.main_columns:
-                if col in self.latest_data.columns:
-                    numbers = self.latest_data[col].dropna()
+            if draws is not None:
+                for i, col in enumerate(self.main_columns):
+                    numbers = draws.numbers[:, i]
+                    numbers = numbers[numbers > 0]
                     if len(numbers) > 0:
                         number_stats[col] = {
                             'min': int(numbers.min()),
@@ -236,6 +825,8 @@ class AutoDataFetcher:
                         }
             
             summary['number_statistics'] = number_stats
+            summary['integrity'] = self.integrity_report()
+            summary['memory'] = self.memory_usage()
             
             return summary
             
@@ -245,42 +836,12 @@ class AutoDataFetcher:
     
     def get_recent_results(self, count=5):
         """最近の抽選結果を取得"""
-        if self.latest_data is None or len(self.latest_data) == 0:
+        draws = self.get_draws()
+        if draws is None or len(draws) == 0:
             return []
         
         try:
-            # 最新のcount件を取得
-            recent_data = self.latest_data.nlargest(count, self.round_column)
-            
-            results = []
-            for _, row in recent_data.iterrows():
-                round_num = int(row[self.round_column])
-                
-                # メイン数字
-                main_numbers = []
-                for col in self.main_columns:
-                    if col in row.index and pd.notna(row[col]):
-                        main_numbers.append(int(row[col]))
-                
-                # ボーナス数字
-                bonus_numbers = []
-                for col in self.bonus_columns:
-                    if col in row.index and pd.notna(row[col]):
-                        bonus_numbers.append(int(row[col]))
-                
-                # 日付
-                date_str = row.get(self.date_column, '') if self.date_column in row.index else ''
-                
-                if len(main_numbers) == 5:  # ミニロトは5個の有効なデータのみ
-                    results.append({
-                        'round': round_num,
-                        'date': date_str,
-                        'main_numbers': sorted(main_numbers),
-                        'bonus_numbers': sorted(bonus_numbers)
-                    })
-            
-            return sorted(results, key=lambda x: x['round'], reverse=True)
-            
+            return draws.recent_results(count)
         except Exception as e:
             logger.error(f"最近の結果取得エラー: {e}")
-            return []
\ No newline at end of file
+            return []
@@ -0,0 +1,94 @@
+"""
+抽選カレンダー - ミニロト対応版
+毎週火曜 18:45（日本時間）の抽選日程から直近・次回の抽選日時を計算し、
+データやキャッシュが「次回抽選まで有効」かどうかを判定する
+"""
+
+import numpy as np
+from datetime import date, datetime, time, timedelta, timezone
+
+JST = timezone(timedelta(hours=9), 'JST')
+
+# 抽選曜日（月曜=0）と抽選時刻
+DRAW_WEEKDAY = 1
+DRAW_TIME = time(18, 45)
+
+# 抽選から取得元のCSVに結果が載るまでの目安（最初の取得はこの時刻に行う）
+PUBLISH_DELAY = timedelta(minutes=45)
+
+_CRON_WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+
+def _as_date(value):
+    """date / datetime / numpy.datetime64 / ISO文字列を date に変換（変換できなければNone）"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, np.datetime64):
+        if np.isnat(value):
+            return None
+        return value.astype('datetime64[D]').item()
+    try:
+        return date.fromisoformat(str(value)[:10].replace('/', '-'))
+    except ValueError:
+        return None
+
+
+class DrawCalendar:
+    """週1回の抽選日程"""
+
+    def __init__(self, weekday=DRAW_WEEKDAY, draw_time=DRAW_TIME, publish_delay=PUBLISH_DELAY, tz=JST):
+        self.weekday = weekday
+        self.draw_time = draw_time
+        self.publish_delay = publish_delay
+        self.tz = tz
+
+    def now(self):
+        return datetime.now(self.tz)
+
+    def _localize(self, moment):
+        """日時を抽選のタイムゾーンに揃える（タイムゾーンなしは抽選のタイムゾーンとみなす）"""
+        if moment is None:
+            return self.now()
+        if moment.tzinfo is None:
+            return moment.replace(tzinfo=self.tz)
+        return moment.astimezone(self.tz)
+
+    def previous_draw(self, moment=None):
+        """moment 以前で直近の抽選日時"""
+        moment = self._localize(moment)
+        days_back = (moment.weekday() - self.weekday) % 7
+        draw = datetime.combine(moment.date() - timedelta(days=days_back), self.draw_time, tzinfo=self.tz)
+        if draw > moment:
+            draw -= timedelta(days=7)
+        return draw
+
+    def next_draw(self, moment=None):
+        """moment より後の次回抽選日時"""
+        return self.previous_draw(moment) + timedelta(days=7)
+
+    def latest_published_draw(self, moment=None):
+        """moment 時点で結果が公開されているはずの直近の抽選日時"""
+        return self.previous_draw(self._localize(moment) - self.publish_delay)
+
+    def is_current(self, latest_draw_date, moment=None):
+        """最新データの抽選日が公開済みの直近の抽選に追いついているか（追いついていれば次回抽選まで更新なし）"""
+        latest = _as_date(latest_draw_date)
+        return latest is not None and latest >= self.latest_published_draw(moment).date()
+
+    def valid_until(self, moment=None):
+        """現在のデータで足りる期限（次回抽選の結果公開見込み時刻）"""
+        return self.latest_published_draw(moment) + timedelta(days=7) + self.publish_delay
+
+    def refresh_crontab(self):
+        """抽選後の最初の取得時刻（Celery beat の crontab 引数、タイムゾーンは Celery の timezone 設定）"""
+        first_check = datetime.combine(date(2000, 1, 3), self.draw_time) + self.publish_delay
+        weekday = (self.weekday + (first_check.date() - date(2000, 1, 3)).days) % 7
+        return {
+            'minute': first_check.minute,
+            'hour': first_check.hour,
+            'day_of_week': _CRON_WEEKDAYS[weekday]
+        }
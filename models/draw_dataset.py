@@ -0,0 +1,152 @@
+"""
+抽選履歴データセット - ミニロト対応版
+DataFrameを一度だけ必要な列だけのコンパクトな読み取り専用NumPy配列（回号・本数字・ボーナス・抽選日）に変換し、
+窓の切り出しはビューで行う
+"""
+
+import hashlib
+import numpy as np
+import pandas as pd
+
+from .features import PICK_COUNT
+
+DEFAULT_DATE_COLUMN = '日付'
+
+# 本数字・ボーナス数字の格納型（1〜31、欠損・範囲外は0）
+NUMBER_DTYPE = np.uint8
+ROUND_DTYPE = np.int32
+
+
+def _compact_numbers(values):
+    """整数配列を uint8 に詰める（uint8 に収まらない値は範囲外として0にする）"""
+    values = np.asarray(values, dtype=np.int64)
+    limits = np.iinfo(NUMBER_DTYPE)
+    return np.where((values < limits.min) | (values > limits.max), 0, values).astype(NUMBER_DTYPE)
+
+
+def _read_only(array):
+    """共有しても書き換えられないよう読み取り専用にする"""
+    if array is not None:
+        array.setflags(write=False)
+    return array
+
+
+class DrawDataset:
+    """抽選履歴の列をコンパクトなNumPy配列で保持するクラス（DataFrameはAPIの境界でのみ使用）"""
+
+    def __init__(self, rounds, numbers, dates=None, bonus=None):
+        self.rounds = _read_only(np.array(rounds, dtype=ROUND_DTYPE))
+        self.numbers = _read_only(np.ascontiguousarray(_compact_numbers(numbers)).reshape(-1, PICK_COUNT))
+        self.dates = _read_only(None if dates is None else np.array(dates, dtype='datetime64[D]'))
+        self.bonus = _read_only(None if bonus is None else _compact_numbers(bonus))
+
+    @classmethod
+    def from_dataframe(cls, data, main_cols, round_col, date_col=DEFAULT_DATE_COLUMN, bonus_col=None):
+        """DataFrameから作成（本数字・回号カラムが不足している場合はNone）"""
+        if len(main_cols) != PICK_COUNT or any(col not in data.columns for col in list(main_cols) + [round_col]):
+            return None
+
+        numbers = data[main_cols].to_numpy(dtype=np.int64, na_value=0)
+        rounds = data[round_col].to_numpy(dtype=np.int64, na_value=0)
+        dates = None
+        if date_col and date_col in data.columns:
+            # 日付は読み込み時に1回だけ解析
+            dates = pd.to_datetime(data[date_col], errors='coerce').to_numpy(dtype='datetime64[D]')
+        bonus = None
+        if bonus_col and bonus_col in data.columns:
+            bonus = data[bonus_col].to_numpy(dtype=np.int64, na_value=0)
+        return cls(rounds, numbers, dates, bonus)
+
+    @classmethod
+    def from_columns(cls, columns):
+        """列配列の辞書（キャッシュの .npy をメモリマップしたものなど）からコピーせずに作成"""
+        for name in ('rounds', 'numbers'):
+            if name not in columns:
+                raise KeyError(f"列 {name} がありません")
+        return cls._from_arrays(
+            _read_only(np.asarray(columns['rounds'], dtype=ROUND_DTYPE)),
+            _read_only(np.asarray(columns['numbers'], dtype=NUMBER_DTYPE).reshape(-1, PICK_COUNT)),
+            _read_only(None if columns.get('dates') is None else np.asarray(columns['dates'], dtype='datetime64[D]')),
+            _read_only(None if columns.get('bonus') is None else np.asarray(columns['bonus'], dtype=NUMBER_DTYPE))
+        )
+
+    def to_columns(self):
+        """保存用の列配列の辞書（存在する列のみ）"""
+        columns = {'rounds': self.rounds, 'numbers': self.numbers, 'dates': self.dates, 'bonus': self.bonus}
+        return {name: array for name, array in columns.items() if array is not None}
+
+    def to_dataframe(self, main_cols, round_col, date_col=DEFAULT_DATE_COLUMN, bonus_col=None):
+        """DataFrameに戻す（CSVと同じ列構成、日付は YYYY/MM/DD 文字列、欠損のボーナスは NaN）"""
+        frame = {round_col: self.rounds.astype(np.int64)}
+        if date_col and self.dates is not None:
+            frame[date_col] = pd.Series(self.dates).dt.strftime('%Y/%m/%d').to_numpy()
+        for i, col in enumerate(main_cols):
+            frame[col] = self.numbers[:, i].astype(np.int64)
+        if bonus_col and self.bonus is not None:
+            bonus = self.bonus.astype(np.int64)
+            frame[bonus_col] = np.where(bonus > 0, bonus, np.nan) if (bonus == 0).any() else bonus
+        return pd.DataFrame(frame)
+
+    @classmethod
+    def _from_arrays(cls, rounds, numbers, dates, bonus):
+        """変換済みの配列をそのまま共有して作成（コピー・型変換なし）"""
+        draws = cls.__new__(cls)
+        draws.rounds = rounds
+        draws.numbers = numbers
+        draws.dates = dates
+        draws.bonus = bonus
+        return draws
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def window(self, start, end):
+        """[start, end) の区間（行の切り出しは連続領域なのでコピーせずビューを共有）"""
+        return DrawDataset._from_arrays(
+            self.rounds[start:end],
+            self.numbers[start:end],
+            None if self.dates is None else self.dates[start:end],
+            None if self.bonus is None else self.bonus[start:end]
+        )
+
+    def recent_indices(self, count):
+        """開催回の新しい順に count 件の行番号"""
+        count = min(max(int(count), 0), len(self))
+        if count == 0:
+            return np.empty(0, dtype=np.intp)
+        return np.argsort(self.rounds, kind='stable')[::-1][:count]
+
+    def recent_results(self, count):
+        """新しい順に count 件の抽選結果（API表示用、本数字が5個揃っている回のみ）"""
+        results = []
+        for i in self.recent_indices(count):
+            main_numbers = sorted(int(n) for n in self.numbers[i] if n > 0)
+            if len(main_numbers) != PICK_COUNT:
+                continue
+            results.append({
+                'round': int(self.rounds[i]),
+                'date': self.date_string(i),
+                'main_numbers': main_numbers,
+                'bonus_numbers': [int(self.bonus[i])] if self.bonus is not None and self.bonus[i] > 0 else []
+            })
+        return results
+
+    def date_string(self, index):
+        """抽選日の表示用文字列（YYYY/MM/DD、不明なら空文字）"""
+        if self.dates is None or np.isnat(self.dates[index]):
+            return ''
+        return str(self.dates[index]).replace('-', '/')
+
+    def memory_usage(self):
+        """列ごとの使用バイト数（ステータス表示用）"""
+        columns = {
+            'rounds': self.rounds.nbytes,
+            'numbers': self.numbers.nbytes,
+            'dates': 0 if self.dates is None else self.dates.nbytes,
+            'bonus': 0 if self.bonus is None else self.bonus.nbytes
+        }
+        return {'rows': len(self), 'bytes': int(sum(columns.values())), 'columns': columns}
+
+    def content_hash(self):
+        """本数字の内容ハッシュ（実行の識別用）"""
+        return hashlib.sha1(np.ascontiguousarray(self.numbers).tobytes()).hexdigest()[:12]
@@ -0,0 +1,167 @@
+"""
+抽選履歴の整合性チェック - ミニロト対応版
+コンパクトな配列（DrawDataset）に対して範囲・抽選内の重複・ボーナス・開催回の重複／順序／欠番をまとめて判定し、
+判定済みの行の結果を保持して追記された行だけを検証する
+"""
+
+import numpy as np
+
+from .features import NUMBER_MIN, NUMBER_MAX
+
+# 行ごとの問題フラグ（ビットの組み合わせ）
+OUT_OF_RANGE = 1        # 本数字が欠損・範囲外（1-31）
+DUPLICATE_NUMBERS = 2   # 同じ抽選内で本数字が重複
+INVALID_BONUS = 4       # ボーナス数字が範囲外、または本数字と重複
+DUPLICATE_ROUND = 8     # 開催回がそれ以前の行と重複
+OUT_OF_ORDER = 16       # 開催回が直前の行より小さい（ファイル内の並びが時系列でない）
+
+ISSUE_FLAGS = {
+    'out_of_range': OUT_OF_RANGE,
+    'duplicate_numbers': DUPLICATE_NUMBERS,
+    'invalid_bonus': INVALID_BONUS,
+    'duplicate_rounds': DUPLICATE_ROUND,
+    'out_of_order': OUT_OF_ORDER
+}
+
+ISSUE_LABELS = {
+    'out_of_range': '本数字の欠損・範囲外',
+    'duplicate_numbers': '抽選内の本数字の重複',
+    'invalid_bonus': 'ボーナス数字の不正',
+    'duplicate_rounds': '開催回の重複',
+    'out_of_order': '開催回の順序の乱れ'
+}
+
+# データを不正とみなす問題（それ以外は警告のみ）
+ERROR_FLAGS = OUT_OF_RANGE | DUPLICATE_NUMBERS | DUPLICATE_ROUND
+
+# レポートに載せる欠番区間・該当開催回の最大数
+MAX_REPORTED_ITEMS = 20
+
+
+def _row_flags(numbers, bonus):
+    """行ごとに完結する検査（範囲・抽選内の重複・ボーナス）"""
+    numbers = np.asarray(numbers)
+    flags = np.zeros(len(numbers), dtype=np.uint8)
+    if len(numbers) == 0:
+        return flags
+
+    in_range = np.all((numbers >= NUMBER_MIN) & (numbers <= NUMBER_MAX), axis=1)
+    flags[~in_range] |= OUT_OF_RANGE
+    unique = np.all(np.diff(np.sort(numbers, axis=1), axis=1) != 0, axis=1)
+    flags[~unique] |= DUPLICATE_NUMBERS
+
+    if bonus is not None:
+        # ボーナスの欠損（0）は古い回にもあるため問題にしない
+        bonus = np.asarray(bonus)
+        present = bonus > 0
+        bad = present & ((bonus > NUMBER_MAX) | np.any(numbers == bonus[:, np.newaxis], axis=1))
+        flags[bad] |= INVALID_BONUS
+    return flags
+
+
+def _gaps(sorted_rounds):
+    """昇順の開催回から欠番区間 (直前の回, 直後の回) を求める"""
+    if len(sorted_rounds) < 2:
+        return np.empty((0, 2), dtype=np.int64)
+    steps = np.diff(sorted_rounds)
+    at = np.flatnonzero(steps > 1)
+    return np.column_stack([sorted_rounds[at], sorted_rounds[at + 1]]).astype(np.int64)
+
+
+class DrawIntegrityChecker:
+    """
+    抽選履歴の整合性チェック（増分）
+    - 判定済みの行数・行ごとの問題フラグ・開催回の昇順一覧・欠番区間を保持
+    - 追記された行だけを検査し、既存の開催回とは searchsorted で照合
+    - データを丸ごと読み直した場合は reset() で判定結果を破棄する
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """判定結果を破棄（次回の check で全行を検査）"""
+        self.flags = np.empty(0, dtype=np.uint8)
+        self.sorted_rounds = np.empty(0, dtype=np.int64)
+        self.gaps = np.empty((0, 2), dtype=np.int64)
+        self.last_row = None
+        self.last_checked = 0
+
+    def _prefix_matches(self, draws):
+        """判定済みの範囲が今のデータの先頭と一致しているか（最後の判定行で確認）"""
+        checked = len(self.flags)
+        if checked == 0:
+            return True
+        if checked > len(draws):
+            return False
+        row = checked - 1
+        return self.last_row == (int(draws.rounds[row]), draws.numbers[row].tobytes())
+
+    def check(self, draws):
+        """未判定の行を検査し、全体のレポートを返す"""
+        if not self._prefix_matches(draws):
+            self.reset()
+
+        start = len(self.flags)
+        total = len(draws)
+        if start < total:
+            self._check_rows(draws, start, total)
+        self.last_checked = total - start
+        return self.report(draws)
+
+    def _check_rows(self, draws, start, end):
+        """[start, end) の行を検査して判定結果に追加"""
+        rounds = draws.rounds[start:end].astype(np.int64)
+        bonus = None if draws.bonus is None else draws.bonus[start:end]
+        flags = _row_flags(draws.numbers[start:end], bonus)
+
+        # 開催回の並び: 直前の行（判定済みの最終行を含む）より小さければ順序違反
+        previous = np.concatenate([draws.rounds[start - 1:start].astype(np.int64), rounds]) if start else rounds
+        if len(previous) > 1:
+            backwards = np.diff(previous) < 0
+            flags[-len(backwards):][backwards] |= OUT_OF_ORDER
+
+        # 開催回の重複: 追記分の中での重複（2回目以降）と判定済みの回との重複
+        _, first_index = np.unique(rounds, return_index=True)
+        repeated = np.ones(len(rounds), dtype=bool)
+        repeated[first_index] = False
+        if len(self.sorted_rounds):
+            pos = np.minimum(np.searchsorted(self.sorted_rounds, rounds), len(self.sorted_rounds) - 1)
+            repeated |= self.sorted_rounds[pos] == rounds
+        flags[repeated] |= DUPLICATE_ROUND
+
+        # 欠番: 通常の追記（既存の最新回より後ろ）なら境目と追記分の中だけを調べる
+        new_rounds = np.unique(rounds[~repeated])
+        if len(self.sorted_rounds) == 0 or (len(new_rounds) and new_rounds[0] > self.sorted_rounds[-1]):
+            boundary = self.sorted_rounds[-1:]
+            self.gaps = np.concatenate([self.gaps, _gaps(np.concatenate([boundary, new_rounds]))])
+            self.sorted_rounds = np.concatenate([self.sorted_rounds, new_rounds])
+        elif len(new_rounds):
+            self.sorted_rounds = np.union1d(self.sorted_rounds, new_rounds)
+            self.gaps = _gaps(self.sorted_rounds)
+
+        self.flags = np.concatenate([self.flags, flags])
+        self.last_row = (int(draws.rounds[end - 1]), draws.numbers[end - 1].tobytes())
+
+    def report(self, draws=None):
+        """判定結果の集計（問題の件数・該当する開催回の例・欠番）"""
+        issues = {}
+        for name, flag in ISSUE_FLAGS.items():
+            rows = np.flatnonzero(self.flags & flag)
+            issues[name] = {
+                'count': int(len(rows)),
+                'rounds': [] if draws is None else draws.rounds[rows[:MAX_REPORTED_ITEMS]].astype(int).tolist()
+            }
+
+        missing = int((self.gaps[:, 1] - self.gaps[:, 0] - 1).sum()) if len(self.gaps) else 0
+        return {
+            'rows': int(len(self.flags)),
+            'checked_rows': int(self.last_checked),
+            'valid': not bool(np.any(self.flags & ERROR_FLAGS)),
+            'invalid_rows': int(np.count_nonzero(self.flags & ERROR_FLAGS)),
+            'issues': issues,
+            'missing_rounds': missing,
+            'gaps': self.gaps[:MAX_REPORTED_ITEMS].tolist(),
+            'first_round': int(self.sorted_rounds[0]) if len(self.sorted_rounds) else None,
+            'last_round': int(self.sorted_rounds[-1]) if len(self.sorted_rounds) else None
+        }
@@ -0,0 +1,47 @@
+"""
+抽選番号照合モジュール - ミニロト対応版
+5個の数字を31ビットのビットマスク（uint32）に変換し、AND + popcount で一致数をまとめて計算
+"""
+
+import numpy as np
+
+from .features import NUMBER_MIN, NUMBER_MAX, PICK_COUNT
+
+# 数字 n をビット (n - 1) に割り当てる参照表（範囲外は0）
+_NUMBER_BITS = np.zeros(NUMBER_MAX + 1, dtype=np.uint32)
+_NUMBER_BITS[NUMBER_MIN:] = np.left_shift(np.uint32(1), np.arange(NUMBER_MAX - NUMBER_MIN + 1, dtype=np.uint32))
+
+# 一致数の取りうる値（0〜5個）
+MATCH_BINS = PICK_COUNT + 1
+
+
+def to_bitmasks(numbers):
+    """(..., 5) の数字配列を (...) のビットマスク配列に変換"""
+    numbers = np.asarray(numbers, dtype=np.intp)
+    bits = _NUMBER_BITS[np.clip(numbers, 0, NUMBER_MAX)]
+    return np.bitwise_or.reduce(bits, axis=-1)
+
+
+def popcount32(masks):
+    """uint32 配列の各要素の立っているビット数（SWAR方式）"""
+    x = np.asarray(masks, dtype=np.uint32)
+    x = x - ((x >> np.uint32(1)) & np.uint32(0x55555555))
+    x = (x & np.uint32(0x33333333)) + ((x >> np.uint32(2)) & np.uint32(0x33333333))
+    x = (x + (x >> np.uint32(4))) & np.uint32(0x0F0F0F0F)
+    return ((x * np.uint32(0x01010101)) >> np.uint32(24)).astype(np.uint8)
+
+
+def match_counts(predicted_masks, actual_masks):
+    """予測と実際のビットマスクの一致数（ブロードキャスト可）"""
+    return popcount32(np.bitwise_and(predicted_masks, actual_masks))
+
+
+def match_histogram(counts):
+    """一致数（0〜5個）ごとの件数"""
+    return np.bincount(np.asarray(counts, dtype=np.intp).reshape(-1), minlength=MATCH_BINS)[:MATCH_BINS]
+
+
+def mask_to_numbers(mask):
+    """ビットマスクを昇順の数字リストに戻す"""
+    mask = int(mask)
+    return [n for n in range(NUMBER_MIN, NUMBER_MAX + 1) if mask >> (n - NUMBER_MIN) & 1]
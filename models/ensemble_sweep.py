@@ -0,0 +1,259 @@
+"""
+アンサンブル調整パラメータのスイープ - ミニロト対応版
+バックテストで保存した各回・各モデルの確率分布を使い、モデル重み・投票回数・見逃し数字ブースト・
+頻出数字ボーナスの組み合わせを再学習なしにNumPyの一括演算で評価
+"""
+
+import os
+import time
+import logging
+import itertools
+import numpy as np
+
+from .draw_matching import match_counts
+from .features import NUMBER_MIN, NUMBER_MAX, PICK_COUNT
+
+logger = logging.getLogger(__name__)
+
+NUMBER_COUNT = NUMBER_MAX - NUMBER_MIN + 1
+
+# 1回の一括演算で扱う投票配列の最大要素数（メモリ使用量の上限）
+CHUNK_ELEMENTS = 1 << 23
+
+# 本番・検証で使っている値（比較用）
+CURRENT_KNOBS = {
+    'votes_per_model': 8,
+    'boost_factor': 1.5,
+    'frequent_bonus': 0.1
+}
+
+DEFAULT_GRID = {
+    'weight_step': 0.1,
+    'votes_per_model': [5, 8],
+    'boost_factor': [1.0, 1.5, 2.0],
+    'frequent_bonus': [0.0, 0.1, 0.2]
+}
+
+# 見逃し数字ブーストの対象（直近何回の見逃しから上位何個）
+BOOST_WINDOW = 10
+BOOST_COUNT = 5
+
+_BITS = np.left_shift(np.uint32(1), np.arange(NUMBER_COUNT, dtype=np.uint32))
+
+
+def distribution_vector(distribution):
+    """model_distributions の1モデル分を数字1〜31の確率ベクトルに変換"""
+    vector = np.zeros(NUMBER_COUNT, dtype=np.float32)
+    kind, classes, proba = distribution
+    if kind == 'proba':
+        classes = np.asarray(classes, dtype=np.int64)
+        in_range = (classes >= NUMBER_MIN) & (classes <= NUMBER_MAX)
+        vector[classes[in_range] - NUMBER_MIN] = proba[in_range]
+    elif NUMBER_MIN <= int(classes) <= NUMBER_MAX:
+        vector[int(classes) - NUMBER_MIN] = 1.0
+    return vector
+
+
+def mask_bits(masks):
+    """ビットマスク配列 (...) を数字別の0/1配列 (..., 31) に展開"""
+    return (np.asarray(masks, dtype=np.uint32)[..., np.newaxis] & _BITS) != 0
+
+
+def weight_grid(n_models, step):
+    """合計1になるモデル重みの格子（各重みは step 刻み）"""
+    units = int(round(1.0 / step))
+    rows = [combo for combo in itertools.product(range(units + 1), repeat=n_models) if sum(combo) == units]
+    return np.array(rows, dtype=np.float32) / units
+
+
+class EnsembleKnobSweep:
+    """
+    バックテストの確率キャッシュ上でアンサンブル調整パラメータを一括評価するクラス
+    - 各回・各セット・各モデルの抽選用乱数は全組み合わせで共通（差が乱数ではなく設定の違いになる）
+    - 投票 → 見逃し数字ブースト → 頻出数字ボーナス → 上位5個の選択までを配列演算で実行
+    """
+
+    def __init__(self, probabilities, model_names, actual_masks, frequent_masks, predicted_masks,
+                 sets_per_round=20, random_state=42, fidelity=None):
+        self.probabilities = np.asarray(probabilities, dtype=np.float32)  # (R, M, 31)
+        self.model_names = list(model_names)
+        self.actual_masks = np.asarray(actual_masks, dtype=np.uint32)     # (R,)
+        self.frequent = mask_bits(frequent_masks).astype(np.float32)     # (R, 31)
+        self.boost = self._boost_numbers(np.asarray(predicted_masks, dtype=np.uint32))  # (R, 31)
+        self.sets_per_round = sets_per_round
+        self.random_state = random_state
+        self.fidelity = fidelity
+        self._samples = None
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """バックテストが保存した確率キャッシュ（.npz）から作成"""
+        with np.load(path, allow_pickle=False) as cache:
+            return cls(
+                cache['probabilities'], cache['model_names'].tolist(), cache['actual_masks'],
+                cache['frequent_masks'], cache['predicted_masks'],
+                sets_per_round=cache['predicted_masks'].shape[1], fidelity=str(cache['fidelity']), **kwargs
+            )
+
+    def _boost_numbers(self, predicted_masks):
+        """各回の直前 BOOST_WINDOW 回でバックテスト予測が見逃した回数の多い数字（学習器の boost_numbers 相当）"""
+        missed = mask_bits(self.actual_masks[:, np.newaxis] & ~predicted_masks).sum(axis=1)  # (R, 31)
+        cumulative = np.vstack([np.zeros((1, NUMBER_COUNT), dtype=np.int64), np.cumsum(missed, axis=0)])
+        rounds = np.arange(len(missed))
+        recent = cumulative[rounds] - cumulative[np.maximum(rounds - BOOST_WINDOW, 0)]
+
+        # 回数の多い順（同数は小さい数字を優先）に上位 BOOST_COUNT 個、見逃しのない数字は対象外
+        order = np.argsort(-recent, axis=1, kind='stable')[:, :BOOST_COUNT]
+        boost = np.zeros_like(recent, dtype=bool)
+        np.put_along_axis(boost, order, True, axis=1)
+        return (boost & (recent > 0)).astype(np.float32)
+
+    def _ensure_samples(self, max_votes):
+        """各回・各セット・各モデルの抽選結果 (R, S, M, max_votes) を逆関数法で1回だけ作成"""
+        if self._samples is not None and self._samples.shape[-1] >= max_votes:
+            return
+
+        R, M, _ = self.probabilities.shape
+        S = self.sets_per_round
+        rng = np.random.default_rng([self.random_state, 41])
+        # 投票の順番を先頭の次元にして生成（投票回数を増やしても先頭分の乱数は同じ）
+        uniforms = np.moveaxis(rng.random((max_votes, R, S, M), dtype=np.float32), 0, -1)
+
+        cdf = np.cumsum(self.probabilities, axis=2)
+        cdf[..., -1] = np.where(cdf[..., -1] > 0, 1.0, 0.0)
+
+        samples = np.empty((R, S, M, max_votes), dtype=np.int8)
+        for r in range(R):
+            for m in range(M):
+                if cdf[r, m, -1] == 0:
+                    samples[r, :, m] = -1  # このモデルの出力なし
+                else:
+                    samples[r, :, m] = np.searchsorted(cdf[r, m], uniforms[r, :, m], side='right')
+        self._samples = np.minimum(samples, NUMBER_COUNT - 1)
+
+    def _vote_counts(self, votes_per_model):
+        """各回・各セット・各モデルの先頭 votes_per_model 回の抽選で各数字が出た回数 (R, S, M, 31)"""
+        R, M, _ = self.probabilities.shape
+        S = self.sets_per_round
+        self._ensure_samples(votes_per_model)
+
+        samples = self._samples[..., :votes_per_model]
+        valid = samples >= 0
+        cell = np.arange(R * S * M).reshape(R, S, M, 1)
+        flat = (cell * NUMBER_COUNT + samples)[valid]
+        counts = np.bincount(flat, minlength=R * S * M * NUMBER_COUNT)
+        return counts.reshape(R, S, M, NUMBER_COUNT).astype(np.float32)
+
+    def _score(self, votes):
+        """投票配列 (K, R, S, 31) から上位5個を選び、一致数の集計値を計算（votes は上書きされる）"""
+        shape = votes.shape
+        # 最大値の取り出しを5回（argmax は同票なら小さい数字を返す = Counter.most_common の挿入順に近い決定的な順序）
+        votes = votes.reshape(-1, NUMBER_COUNT)
+        rows = np.arange(len(votes))
+        predicted = np.zeros(len(votes), dtype=np.uint32)
+        for _ in range(PICK_COUNT):
+            top = votes.argmax(axis=1)
+            predicted |= _BITS[top]
+            votes[rows, top] = -np.inf
+        predicted = predicted.reshape(shape[:-1])                                        # (K, R, S)
+        counts = match_counts(predicted, self.actual_masks[np.newaxis, :, np.newaxis])   # (K, R, S)
+
+        metrics = {'avg_matches': counts.mean(axis=(1, 2))}
+        for threshold in (3, 4, 5):
+            metrics[f'avg_sets_{threshold}_plus'] = (counts >= threshold).sum(axis=2).mean(axis=1)
+        # compare_validation_methods と同じ総合スコア
+        metrics['score'] = metrics['avg_matches'] + metrics['avg_sets_4_plus'] * 0.5 + metrics['avg_sets_5_plus'] * 1.0
+        return metrics
+
+    def evaluate(self, weights, votes_list, boost_list, bonus_list):
+        """
+        モデル重み (K, M) × 投票回数 × ブースト倍率 × ボーナスの全組み合わせを評価
+        戻り値: 組み合わせごとの設定と集計値のリスト
+        """
+        weights = np.asarray(weights, dtype=np.float32).reshape(-1, len(self.model_names))
+        R, M, _ = self.probabilities.shape
+        S = self.sets_per_round
+        chunk = max(1, CHUNK_ELEMENTS // (R * S * NUMBER_COUNT))
+
+        boost_mask = self.boost[np.newaxis, :, np.newaxis, :]
+        frequent = self.frequent[np.newaxis, :, np.newaxis, :]
+
+        self._ensure_samples(max(int(v) for v in votes_list))
+
+        rows = []
+        for votes_per_model in votes_list:
+            counts = self._vote_counts(int(votes_per_model))
+            # (M, R*S*31) に並べ替えて重み行列との積を一括計算
+            counts = np.moveaxis(counts, 2, 0).reshape(M, -1)
+
+            for start in range(0, len(weights), chunk):
+                w = weights[start:start + chunk]
+                base_votes = (w @ counts).reshape(len(w), R, S, NUMBER_COUNT)
+
+                for boost_factor in boost_list:
+                    boosted = base_votes * (1.0 + (boost_factor - 1.0) * boost_mask)
+                    for bonus in bonus_list:
+                        metrics = self._score(boosted + bonus * frequent)
+                        for i, row_weights in enumerate(w):
+                            rows.append({
+                                'model_weights': {name: round(float(x), 4) for name, x in zip(self.model_names, row_weights)},
+                                'votes_per_model': int(votes_per_model),
+                                'boost_factor': float(boost_factor),
+                                'frequent_bonus': float(bonus),
+                                **{key: float(values[i]) for key, values in metrics.items()}
+                            })
+        return rows
+
+    def run(self, grid=None, current_weights=None, top_k=10):
+        """
+        格子上の全組み合わせを評価して最良設定を報告
+        current_weights: 現在のモデル重み（比較用に同じ乱数で評価）
+        """
+        grid = dict(DEFAULT_GRID, **(grid or {}))
+        start = time.monotonic()
+
+        weights = weight_grid(len(self.model_names), grid['weight_step'])
+        rows = self.evaluate(weights, grid['votes_per_model'], grid['boost_factor'], grid['frequent_bonus'])
+        rows.sort(key=lambda row: row['score'], reverse=True)
+
+        current = None
+        if current_weights:
+            current_w = np.array([[current_weights.get(name, 0.33) for name in self.model_names]])
+            current = self.evaluate(
+                current_w, [CURRENT_KNOBS['votes_per_model']],
+                [CURRENT_KNOBS['boost_factor']], [CURRENT_KNOBS['frequent_bonus']]
+            )[0]
+
+        elapsed = time.monotonic() - start
+        logger.info(f"🎛️ アンサンブル設定スイープ完了: {len(rows)}通り × {len(self.actual_masks)}回 ({elapsed:.1f}秒)")
+
+        return {
+            'fidelity': self.fidelity,
+            'rounds': int(len(self.actual_masks)),
+            'sets_per_round': int(self.sets_per_round),
+            'combinations': len(rows),
+            'grid': grid,
+            'best': rows[0] if rows else None,
+            'current': current,
+            'improvement': rows[0]['score'] - current['score'] if rows and current else None,
+            'top': rows[:top_k],
+            'seconds': round(elapsed, 2)
+        }
+
+
+def save_probability_cache(path, probabilities, model_names, test_round, actual_masks, frequent_masks, predicted_masks,
+                           fidelity):
+    """バックテストの確率キャッシュを保存（一時ファイルから os.replace で置き換え）"""
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        np.savez(
+            f,
+            probabilities=np.asarray(probabilities, dtype=np.float32),
+            model_names=np.array(model_names),
+            test_round=np.asarray(test_round, dtype=np.int64),
+            actual_masks=np.asarray(actual_masks, dtype=np.uint32),
+            frequent_masks=np.asarray(frequent_masks, dtype=np.uint32),
+            predicted_masks=np.asarray(predicted_masks, dtype=np.uint32),
+            fidelity=np.array(fidelity)
+        )
+    os.replace(temp_path, path)
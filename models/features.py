@@ -0,0 +1,73 @@
+"""
+特徴量計算モジュール - ミニロト対応版
+抽選番号配列から16次元特徴量をまとめて計算（ベクトル化）
+"""
+
+import numpy as np
+
+NUMBER_MIN = 1
+NUMBER_MAX = 31
+PICK_COUNT = 5
+FEATURE_DIM = 16
+
+
+def extract_draw_numbers(data, main_cols):
+    """DataFrameから本数字の (N, 5) 配列を取得（欠損列がある場合はNone）"""
+    if any(col not in data.columns for col in main_cols) or len(main_cols) != PICK_COUNT:
+        return None
+    return data[main_cols].to_numpy(dtype=np.int16, na_value=0)
+
+
+def valid_draw_mask(numbers):
+    """範囲内（1-31）かつ5個が重複しない抽選の判定"""
+    numbers = np.asarray(numbers)
+    in_range = np.all((numbers >= NUMBER_MIN) & (numbers <= NUMBER_MAX), axis=1)
+    sorted_nums = np.sort(numbers, axis=1)
+    unique = np.all(np.diff(sorted_nums, axis=1) != 0, axis=1)
+    return in_range & unique
+
+
+def compute_draw_features(numbers):
+    """各抽選の16次元特徴量（本番の create_advanced_features と同じ定義）"""
+    current = np.asarray(numbers, dtype=np.float64)
+    sorted_nums = np.sort(current, axis=1)
+    gaps = np.diff(sorted_nums, axis=1)
+
+    return np.column_stack([
+        current.mean(axis=1),                     # 平均
+        current.std(axis=1),                      # 標準偏差
+        current.sum(axis=1),                      # 合計
+        (current % 2 == 1).sum(axis=1),           # 奇数数
+        sorted_nums[:, -1],                       # 最大値
+        sorted_nums[:, 0],                        # 最小値
+        sorted_nums[:, 2],                        # 中央値
+        sorted_nums[:, -1] - sorted_nums[:, 0],   # 範囲
+        (gaps == 1).sum(axis=1),                  # 連続数
+        current[:, 0],                            # 第1数字
+        current[:, 2],                            # 第3数字
+        current[:, 4],                            # 第5数字
+        gaps.mean(axis=1),                        # 平均ギャップ
+        gaps.max(axis=1),                         # 最大ギャップ
+        gaps.min(axis=1),                         # 最小ギャップ
+        (current <= 15).sum(axis=1)               # 前半数
+    ])
+
+
+def build_next_draw_dataset(numbers, features=None):
+    """
+    第i回の特徴量から第i+1回の5数字を予測する学習データを作成
+    戻り値: X (M*5, 16), y (M*5,), draw_index (M*5,)  ※draw_indexは特徴量側の行番号
+    """
+    numbers = np.asarray(numbers)
+    if len(numbers) < 2:
+        return np.empty((0, FEATURE_DIM)), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    if features is None:
+        features = compute_draw_features(numbers)
+
+    rows = np.flatnonzero(valid_draw_mask(numbers[:-1]))
+    draw_index = np.repeat(rows, PICK_COUNT)
+
+    X = features[draw_index]
+    y = numbers[rows + 1].reshape(-1).astype(np.int64)
+    return X, y, draw_index
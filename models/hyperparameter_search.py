@@ -0,0 +1,357 @@
+"""
+ハイパーパラメータ探索 - ミニロト対応版
+時系列分割上の Successive Halving（逐次半減法）で各モデルの設定を選定
+"""
+
+import os
+import csv
+import json
+import time
+import math
+import hashlib
+import logging
+import warnings
+import itertools
+import numpy as np
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
+from sklearn.model_selection import TimeSeriesSplit
+from sklearn.preprocessing import StandardScaler
+
+from .features import extract_draw_numbers, build_next_draw_dataset
+from .model_factory import create_model, get_boosting_backend, resolve_model_params
+
+logger = logging.getLogger(__name__)
+
+# モデル別の探索空間（gradient_boost はバックエンド非依存のパラメータのみ）
+DEFAULT_SEARCH_SPACE = {
+    'random_forest': {
+        'n_estimators': [50, 100, 200],
+        'max_depth': [6, 12, None],
+        'min_samples_leaf': [1, 5]
+    },
+    'gradient_boost': {
+        'n_estimators': [40, 80, 160],
+        'max_depth': [3, 5, 8],
+        'learning_rate': [0.05, 0.1]
+    },
+    'neural_network': {
+        'hidden_layer_sizes': [[64], [128, 64], [128, 64, 32]],
+        'alpha': [0.0001, 0.001],
+        'max_iter': [200, 300]
+    }
+}
+
+# 初期ラウンドでも31クラスの推定が極端に不安定にならない最小学習回数
+MIN_TRAIN_DRAWS = 80
+
+RESULT_COLUMNS = ['signature', 'model', 'config_key', 'params', 'resource', 'score', 'seconds', 'evaluated_at']
+
+# ワーカープロセスで共有する学習データ（initializerで一度だけ受け取る）
+_worker_dataset = {}
+
+
+def _init_worker(X, y, draw_index):
+    """ワーカープロセス初期化: 学習データを保持"""
+    _worker_dataset['X'] = X
+    _worker_dataset['y'] = y
+    _worker_dataset['draw_index'] = draw_index
+
+
+def config_key(params):
+    """パラメータ設定の識別キー"""
+    encoded = json.dumps(params, sort_keys=True).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()[:12]
+
+
+def top5_matches(model, X_test, y_test):
+    """確率上位5数字と実際の5数字の一致数（1抽選あたり平均）"""
+    X_draws = X_test[::5]
+    proba = model.predict_proba(X_draws)
+    top5 = model.classes_[np.argsort(proba, axis=1)[:, -5:]]
+    actual = y_test.reshape(-1, 5)
+    return float(np.mean([len(set(p) & set(a)) for p, a in zip(top5.tolist(), actual.tolist())]))
+
+
+def evaluate_config(model_name, params, resource, n_splits, boosting_backend, dataset=None):
+    """
+    1設定を時系列分割で評価
+    resource: 各分割の学習区間のうち直近何割を使うか（0-1）
+    """
+    dataset = dataset or _worker_dataset
+    X, y, draw_index = dataset['X'], dataset['y'], dataset['draw_index']
+
+    draws = np.unique(draw_index)
+    scores = []
+    start = time.monotonic()
+
+    for train_draws, test_draws in TimeSeriesSplit(n_splits=n_splits).split(draws):
+        keep = min(len(train_draws), max(MIN_TRAIN_DRAWS, int(math.ceil(len(train_draws) * resource))))
+        train_mask = np.isin(draw_index, draws[train_draws[-keep:]])
+        test_mask = np.isin(draw_index, draws[test_draws])
+
+        scaler = StandardScaler()
+        X_train = scaler.fit_transform(X[train_mask])
+        X_test = scaler.transform(X[test_mask])
+
+        # プロセス並列時はモデル内部の並列化を無効化
+        model = create_model(model_name, params, boosting_backend, n_jobs=1)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            model.fit(X_train, y[train_mask])
+
+        scores.append(top5_matches(model, X_test, y[test_mask]))
+
+    return {
+        'model': model_name,
+        'config_key': config_key(params),
+        'params': params,
+        'resource': resource,
+        'score': float(np.mean(scores)),
+        'seconds': time.monotonic() - start
+    }
+
+
+class SuccessiveHalvingSearch:
+    """時系列分割上で候補設定を逐次半減しながら評価するハイパーパラメータ探索"""
+
+    def __init__(self, search_space=None, eta=3, min_resource=1/9, n_splits=3,
+                 max_candidates=None, max_workers=None, results_path=None,
+                 boosting_backend=None, random_state=42):
+        self.search_space = search_space or DEFAULT_SEARCH_SPACE
+        self.eta = eta
+        self.min_resource = min_resource
+        self.n_splits = n_splits
+        self.max_candidates = max_candidates
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.results_path = results_path
+        self.boosting_backend = get_boosting_backend(boosting_backend)
+        self.random_state = random_state
+
+        self.signature = None
+        self.results_table = {}  # (model, config_key, resource) -> 結果
+        self.rungs = {}
+
+    # ===== 結果テーブル（再開用） =====
+
+    def _load_results_table(self):
+        """同じデータ・バックエンドでの評価済み結果を読み込み"""
+        self.results_table = {}
+        if not self.results_path or not os.path.exists(self.results_path):
+            return
+
+        with open(self.results_path, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                if row['signature'] != self.signature:
+                    continue
+                key = (row['model'], row['config_key'], round(float(row['resource']), 6))
+                self.results_table[key] = {
+                    'model': row['model'],
+                    'config_key': row['config_key'],
+                    'params': json.loads(row['params']),
+                    'resource': float(row['resource']),
+                    'score': float(row['score']),
+                    'seconds': float(row['seconds'])
+                }
+
+        if self.results_table:
+            logger.info(f"♻️ 評価済み結果を再利用: {len(self.results_table)}件")
+
+    def _append_result(self, result):
+        """評価結果を1行追記"""
+        key = (result['model'], result['config_key'], round(result['resource'], 6))
+        self.results_table[key] = result
+
+        if not self.results_path:
+            return
+
+        write_header = not os.path.exists(self.results_path)
+        with open(self.results_path, 'a', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS)
+            if write_header:
+                writer.writeheader()
+            writer.writerow({
+                'signature': self.signature,
+                'model': result['model'],
+                'config_key': result['config_key'],
+                'params': json.dumps(result['params'], sort_keys=True),
+                'resource': result['resource'],
+                'score': result['score'],
+                'seconds': round(result['seconds'], 3),
+                'evaluated_at': datetime.now().isoformat()
+            })
+
+    # ===== 候補生成 =====
+
+    def generate_candidates(self, model_name):
+        """探索空間のグリッドから候補設定を生成（上限があれば乱択）"""
+        space = self.search_space[model_name]
+        keys = sorted(space.keys())
+        candidates = [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+
+        if self.max_candidates and len(candidates) > self.max_candidates:
+            rng = np.random.default_rng(self.random_state)
+            chosen = rng.choice(len(candidates), self.max_candidates, replace=False)
+            candidates = [candidates[i] for i in sorted(chosen)]
+
+        return candidates
+
+    def resource_schedule(self):
+        """各ラウンドで使う学習区間の割合（min_resource から eta 倍ずつ、最後は1.0）"""
+        schedule = []
+        resource = self.min_resource
+        while resource < 1.0:
+            schedule.append(round(resource, 6))
+            resource *= self.eta
+        schedule.append(1.0)
+        return schedule
+
+    # ===== 評価実行 =====
+
+    def _evaluate_batch(self, tasks, dataset, executor, budget):
+        """未評価の (モデル, 設定, resource) をまとめて評価（並列）"""
+        pending = [
+            task for task in tasks
+            if (task[0], config_key(task[1]), round(task[2], 6)) not in self.results_table
+        ]
+        if not pending:
+            return True
+
+        if executor is None:
+            for model_name, params, resource in pending:
+                if budget is not None and budget.expired():
+                    return False
+                result = evaluate_config(model_name, params, resource, self.n_splits,
+                                         self.boosting_backend, dataset)
+                self._append_result(result)
+            return True
+
+        futures = [
+            executor.submit(evaluate_config, model_name, params, resource,
+                            self.n_splits, self.boosting_backend)
+            for model_name, params, resource in pending
+        ]
+        try:
+            for future in as_completed(futures, timeout=budget.remaining() if budget else None):
+                self._append_result(future.result())
+        except FuturesTimeoutError:
+            # Python 3.10 では concurrent.futures.TimeoutError は組み込みの TimeoutError と別クラス
+            for future in futures:
+                future.cancel()
+            return False
+        return True
+
+    def run(self, data, main_cols, budget=None):
+        """全モデルについて逐次半減探索を実行し、最良設定を返す"""
+        numbers = extract_draw_numbers(data, main_cols)
+        if numbers is None:
+            raise ValueError("本数字カラムが不足しています")
+
+        X, y, draw_index = build_next_draw_dataset(numbers)
+        if len(np.unique(draw_index)) < (self.n_splits + 1) * 10:
+            raise ValueError(f"探索に必要なデータが不足: {len(np.unique(draw_index))}回分")
+
+        data_hash = hashlib.sha1(np.ascontiguousarray(numbers).tobytes()).hexdigest()[:12]
+        self.signature = f"{data_hash}:{self.boosting_backend}:{self.n_splits}"
+        self._load_results_table()
+
+        dataset = {'X': X, 'y': y, 'draw_index': draw_index}
+        schedule = self.resource_schedule()
+        survivors = {name: self.generate_candidates(name) for name in self.search_space}
+        evaluations = sum(len(c) for c in survivors.values())
+        logger.info(f"=== ハイパーパラメータ探索開始: 候補{evaluations}件 / resource {schedule} ===")
+
+        executor = None
+        if self.max_workers > 1:
+            try:
+                executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=_init_worker,
+                    initargs=(X, y, draw_index)
+                )
+            except Exception as e:
+                logger.warning(f"プロセスプールを作成できないため逐次実行します: {e}")
+
+        completed = False
+        try:
+            for rung, resource in enumerate(schedule):
+                tasks = [
+                    (name, params, resource)
+                    for name, candidates in survivors.items()
+                    for params in candidates
+                ]
+                if not self._evaluate_batch(tasks, dataset, executor, budget):
+                    logger.warning(f"時間予算切れ: ラウンド{rung + 1}で中断（次回再開可能）")
+                    break
+
+                self.rungs[resource] = {}
+                for name, candidates in survivors.items():
+                    ranked = sorted(
+                        candidates,
+                        key=lambda p: self.results_table[(name, config_key(p), round(resource, 6))]['score'],
+                        reverse=True
+                    )
+                    self.rungs[resource][name] = [
+                        self.results_table[(name, config_key(p), round(resource, 6))] for p in ranked
+                    ]
+                    # 上位 1/eta のみ次ラウンドへ
+                    if rung < len(schedule) - 1:
+                        survivors[name] = ranked[:max(1, len(ranked) // self.eta)]
+                    else:
+                        survivors[name] = ranked[:1]
+
+                logger.info(f"  ラウンド{rung + 1} (resource={resource:.3f}) 完了: "
+                            f"{ {name: len(c) for name, c in survivors.items()} }")
+            else:
+                completed = True
+        finally:
+            # 中断時（時間切れ・ソフトタイムアウト）は実行中の評価を待たない
+            if executor is not None:
+                executor.shutdown(wait=completed, cancel_futures=True)
+
+        return self.summary(completed)
+
+    def best_params(self):
+        """最終ラウンドで最良の設定（モデル別）"""
+        if 1.0 not in self.rungs:
+            return {}
+        return {name: ranked[0]['params'] for name, ranked in self.rungs[1.0].items() if ranked}
+
+    def summary(self, completed=True):
+        """探索結果のサマリー（コスト = 評価回数 × resource の合計）"""
+        cost = sum(result['resource'] for result in self.results_table.values())
+        full_grid = sum(len(self.generate_candidates(name)) for name in self.search_space)
+        best = self.best_params()
+
+        return {
+            'completed': completed and bool(best),
+            'signature': self.signature,
+            'best_params': best,
+            'best_scores': {
+                name: ranked[0]['score'] for name, ranked in self.rungs.get(1.0, {}).items() if ranked
+            },
+            'evaluations': len(self.results_table),
+            'resource_cost': round(cost, 3),
+            'full_grid_cost': full_grid,
+            'rungs': {
+                str(resource): {name: len(ranked) for name, ranked in by_model.items()}
+                for resource, by_model in self.rungs.items()
+            }
+        }
+
+    def publish(self, file_manager, prediction_system=None):
+        """最良設定を公開し、本番（と検証器）へ反映"""
+        best = self.best_params()
+        if not best:
+            logger.warning("公開できる探索結果がありません")
+            return False
+
+        published = resolve_model_params(best)
+        if not file_manager.save_model_params(best, metadata=self.summary()):
+            return False
+
+        if prediction_system is not None:
+            prediction_system.apply_model_params(best)
+
+        logger.info(f"✅ 最良ハイパーパラメータを公開: {published}")
+        return True
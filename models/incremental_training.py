@@ -0,0 +1,143 @@
+"""
+逐次学習アンサンブル - ミニロト対応版
+累積窓検証で検証点ごとにモデル状態を引き継ぎ、追加分の木・ブースティング段・エポックだけを学習
+"""
+
+import math
+import logging
+import warnings
+import numpy as np
+from sklearn.base import clone
+from sklearn.neural_network import MLPClassifier
+from sklearn.preprocessing import StandardScaler
+
+from .features import NUMBER_MIN, NUMBER_MAX
+from .training_budget import get_iteration_param
+
+logger = logging.getLogger(__name__)
+
+# partial_fit に渡す全クラス（未出現の数字があっても出力次元を固定）
+ALL_CLASSES = np.arange(NUMBER_MIN, NUMBER_MAX + 1)
+
+
+class IncrementalEnsemble:
+    """
+    検証点をまたいでモデルを育てるアンサンブル
+    - 木・ブースティング: warm_start で反復回数を段階的に増やし、追加分のみ学習
+    - ニューラルネット: partial_fit で各検証点に数エポックずつ追加学習
+    - スケーラー: 初回の学習データで固定（学習済みの分岐・重みと尺度を揃える）
+    全検証点の合計学習量が本番設定1回分程度になるよう反復回数を配分
+    """
+
+    def __init__(self, template_models, total_steps, initial_ratio=0.2):
+        self.template_models = template_models
+        self.total_steps = max(1, int(total_steps))
+        self.initial_ratio = initial_ratio
+
+        self.models = {}
+        self.units_done = {}  # モデル名 -> 学習済みの反復回数（木の本数・段数・エポック数）
+        self.scaler = None
+        self.step = 0
+        self.refits = []  # (検証点, モデル名, 理由)
+
+    def _target_units(self, name):
+        """現在の検証点で到達すべき反復回数（最終点で本番設定に一致）"""
+        template = self.template_models[name]
+        param = get_iteration_param(template)
+        full_units = template.get_params()[param] if param else 1
+        initial_units = max(1, int(math.ceil(full_units * self.initial_ratio)))
+
+        if self.total_steps <= 1:
+            return full_units
+        progress = min(1.0, self.step / (self.total_steps - 1))
+        return min(full_units, initial_units + int(math.ceil((full_units - initial_units) * progress)))
+
+    def _full_refit(self, name, X, y, units):
+        """状態を破棄して指定反復回数で学習し直す（クラス構成の変化時など）"""
+        model = clone(self.template_models[name])
+
+        if isinstance(model, MLPClassifier):
+            for _ in range(units):
+                model.partial_fit(X, y, classes=ALL_CLASSES)
+            return model
+
+        params = {}
+        param = get_iteration_param(model)
+        if param:
+            params[param] = units
+        if 'warm_start' in model.get_params():
+            params['warm_start'] = True
+        if 'early_stopping' in model.get_params():
+            # 反復回数を検証点間で単調に増やすため早期終了は使わない
+            params['early_stopping'] = False
+        model.set_params(**params)
+        model.fit(X, y)
+        return model
+
+    def _grow(self, name, X, y, units):
+        """前の検証点のモデルに追加分だけ学習（戻り値: 学習済み反復回数）"""
+        model = self.models[name]
+
+        if isinstance(model, MLPClassifier):
+            # 新しい検証点のデータは最低1エポック学習させる
+            epochs = max(1, units - self.units_done[name])
+            for _ in range(epochs):
+                model.partial_fit(X, y)
+            return self.units_done[name] + epochs
+
+        # 木・ブースティングはクラス構成が変わると出力次元が合わないため再学習
+        if not np.array_equal(np.unique(y), model.classes_):
+            raise ValueError("クラス構成が変化しました")
+
+        # 反復のないモデル（頻度ベースラインなど）は毎回そのまま学習
+        param = get_iteration_param(model)
+        if param:
+            model.set_params(**{param: units})
+        model.fit(X, y)
+        return units
+
+    def update(self, X, y):
+        """
+        検証点のデータ（累積）でモデルを更新
+        戻り値: この検証点で再学習したモデル名のリスト
+        """
+        if self.scaler is None:
+            self.scaler = StandardScaler().fit(X)
+        X_scaled = self.scaler.transform(X)
+
+        refitted = []
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+
+            for name in self.template_models:
+                units = self._target_units(name)
+
+                try:
+                    if name in self.models:
+                        units = self._grow(name, X_scaled, y, units)
+                    else:
+                        self.models[name] = self._full_refit(name, X_scaled, y, units)
+                except Exception as e:
+                    logger.info(f"  {name}: 追加学習できないため再学習 ({e})")
+                    self.refits.append((self.step, name, str(e)))
+                    refitted.append(name)
+                    try:
+                        self.models[name] = self._full_refit(name, X_scaled, y, units)
+                    except Exception as refit_error:
+                        logger.warning(f"モデル {name} の学習でエラー: {refit_error}")
+                        self.models.pop(name, None)
+                        self.units_done.pop(name, None)
+                        continue
+
+                self.units_done[name] = units
+
+        self.step += 1
+        return refitted
+
+    def model_data(self, freq_counter):
+        """generate_validation_predictions 用のモデル一式"""
+        return {
+            'models': dict(self.models),
+            'scalers': {name: self.scaler for name in self.models},
+            'freq_counter': freq_counter
+        }
@@ -0,0 +1,230 @@
+"""
+モデル生成ファクトリ - ミニロト対応版
+アンサンブル各モデルの生成とブースティングバックエンドの切り替え
+"""
+
+import os
+import copy
+import json
+import hashlib
+import logging
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.ensemble import (
+    RandomForestClassifier,
+    GradientBoostingClassifier,
+    HistGradientBoostingClassifier
+)
+from sklearn.linear_model import LogisticRegression
+from sklearn.neural_network import MLPClassifier
+
+logger = logging.getLogger(__name__)
+
+# 'hist': HistGradientBoostingClassifier（ヒストグラム・早期終了・マルチスレッド）
+# 'classic': 従来のGradientBoostingClassifier
+BOOSTING_BACKENDS = ('hist', 'classic')
+DEFAULT_BOOSTING_BACKEND = 'hist'
+
+# 本番・検証共通の既定ハイパーパラメータ（探索結果で上書き可能）
+DEFAULT_MODEL_PARAMS = {
+    'random_forest': {
+        'n_estimators': 100,
+        'max_depth': 12
+    },
+    'gradient_boost': {
+        'n_estimators': 80,
+        'max_depth': 8,
+        'learning_rate': 0.1
+    },
+    'neural_network': {
+        'hidden_layer_sizes': (128, 64, 32),
+        'max_iter': 300
+    }
+}
+
+# 検証の忠実度（quick: 秒単位の簡易モデル / standard: 中規模 / full: 本番と同じ）
+FIDELITY_LEVELS = ('quick', 'standard', 'full')
+DEFAULT_FIDELITY = 'full'
+
+# standard で本番パラメータの反復回数・層幅に掛ける縮小率
+STANDARD_FIDELITY_SCALE = 0.4
+
+# 本番アンサンブルの重み（quick は構成モデルが異なるため別定義）
+FIDELITY_MODEL_WEIGHTS = {
+    'quick': {
+        'frequency_baseline': 0.2,
+        'random_forest': 0.45,
+        'logistic_regression': 0.35
+    },
+    'standard': {
+        'random_forest': 0.4,
+        'gradient_boost': 0.35,
+        'neural_network': 0.25
+    },
+    'full': {
+        'random_forest': 0.4,
+        'gradient_boost': 0.35,
+        'neural_network': 0.25
+    }
+}
+
+
+class FrequencyBaselineClassifier(ClassifierMixin, BaseEstimator):
+    """特徴量を使わず学習データの出現頻度をそのまま確率とする基準モデル"""
+
+    def __init__(self, smoothing=1.0):
+        self.smoothing = smoothing
+
+    def fit(self, X, y):
+        self.classes_, counts = np.unique(y, return_counts=True)
+        smoothed = counts + self.smoothing
+        self.class_prior_ = smoothed / smoothed.sum()
+        self.n_features_in_ = np.asarray(X).shape[1]
+        return self
+
+    def predict_proba(self, X):
+        return np.tile(self.class_prior_, (len(X), 1))
+
+    def predict(self, X):
+        return np.full(len(X), self.classes_[np.argmax(self.class_prior_)])
+
+
+class AdaptiveHistGradientBoostingClassifier(HistGradientBoostingClassifier):
+    """早期終了用の層化分割が作れない少量データ（検証窓など）では早期終了を外して学習"""
+
+    def _can_stratify(self, y):
+        """検証用分割に全クラスが2件以上ずつ収まるか"""
+        counts = np.unique(y, return_counts=True)[1]
+        n_val = int(np.ceil(len(y) * self.validation_fraction))
+        return counts.min() >= 2 and n_val >= len(counts) and len(y) - n_val >= len(counts)
+
+    def fit(self, X, y, sample_weight=None):
+        early_stopping = self.early_stopping
+        if early_stopping is True and self.validation_fraction and not self._can_stratify(y):
+            self.early_stopping = False
+        try:
+            return super().fit(X, y, sample_weight=sample_weight)
+        finally:
+            self.early_stopping = early_stopping
+
+
+def get_boosting_backend(backend=None):
+    """使用するブースティングバックエンド名を決定（引数 > 環境変数 > 既定値）"""
+    backend = (backend or os.environ.get('BOOSTING_BACKEND') or DEFAULT_BOOSTING_BACKEND).lower()
+
+    if backend not in BOOSTING_BACKENDS:
+        logger.warning(f"未知のブースティングバックエンド: {backend}（{DEFAULT_BOOSTING_BACKEND}を使用）")
+        backend = DEFAULT_BOOSTING_BACKEND
+
+    return backend
+
+
+def resolve_model_params(model_params=None):
+    """既定値に上書きパラメータをマージ（JSON由来のリストはタプルに戻す）"""
+    resolved = copy.deepcopy(DEFAULT_MODEL_PARAMS)
+
+    for name, params in (model_params or {}).items():
+        if name not in resolved:
+            logger.warning(f"未知のモデルのパラメータを無視: {name}")
+            continue
+        resolved[name].update(params)
+
+    layers = resolved['neural_network'].get('hidden_layer_sizes')
+    if isinstance(layers, list):
+        resolved['neural_network']['hidden_layer_sizes'] = tuple(layers)
+
+    return resolved
+
+
+def model_params_hash(model_params=None):
+    """パラメータ一式の短いハッシュ（チェックポイント・キャッシュのキー用）"""
+    resolved = resolve_model_params(model_params)
+    encoded = json.dumps(resolved, sort_keys=True, default=list).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()[:12]
+
+
+def create_boosting_model(backend=None, n_estimators=80, max_depth=8, learning_rate=0.1,
+                          random_state=42, early_stopping=True):
+    """'gradient_boost' 用のブースティングモデルを生成"""
+    backend = get_boosting_backend(backend)
+
+    if backend == 'hist':
+        # 31クラス分の木をヒストグラムで高速構築（OpenMPで自動並列化）
+        return AdaptiveHistGradientBoostingClassifier(
+            max_iter=n_estimators,
+            max_depth=max_depth,
+            learning_rate=learning_rate,
+            early_stopping=early_stopping,
+            validation_fraction=0.1,
+            n_iter_no_change=10,
+            random_state=random_state
+        )
+
+    return GradientBoostingClassifier(
+        n_estimators=n_estimators,
+        max_depth=max_depth,
+        learning_rate=learning_rate,
+        random_state=random_state
+    )
+
+
+def create_model(name, params=None, boosting_backend=None, n_jobs=-1):
+    """モデル名とパラメータから1モデルを生成"""
+    params = dict(resolve_model_params({name: params or {}})[name])
+
+    if name == 'random_forest':
+        return RandomForestClassifier(random_state=42, n_jobs=n_jobs, **params)
+    if name == 'gradient_boost':
+        return create_boosting_model(boosting_backend, **params)
+    if name == 'neural_network':
+        return MLPClassifier(random_state=42, **params)
+
+    raise ValueError(f"未知のモデル: {name}")
+
+
+def create_ensemble_models(boosting_backend=None, model_params=None, n_jobs=-1):
+    """本番・検証共通のアンサンブルモデル一式を生成"""
+    resolved = resolve_model_params(model_params)
+    return {
+        name: create_model(name, params, boosting_backend, n_jobs=n_jobs)
+        for name, params in resolved.items()
+    }
+
+
+def get_fidelity(fidelity=None):
+    """検証の忠実度を決定（引数 > 環境変数 > 既定値）"""
+    fidelity = (fidelity or os.environ.get('VALIDATION_FIDELITY') or DEFAULT_FIDELITY).lower()
+
+    if fidelity not in FIDELITY_LEVELS:
+        logger.warning(f"未知の検証忠実度: {fidelity}（{DEFAULT_FIDELITY}を使用）")
+        fidelity = DEFAULT_FIDELITY
+
+    return fidelity
+
+
+def create_fidelity_models(fidelity=None, boosting_backend=None, model_params=None, n_jobs=-1):
+    """忠実度に応じた検証用モデル一式を生成"""
+    fidelity = get_fidelity(fidelity)
+
+    if fidelity == 'quick':
+        return {
+            'frequency_baseline': FrequencyBaselineClassifier(),
+            'random_forest': RandomForestClassifier(
+                n_estimators=20, max_depth=6, random_state=42, n_jobs=n_jobs
+            ),
+            'logistic_regression': LogisticRegression(max_iter=200, C=0.5)
+        }
+
+    if fidelity == 'standard':
+        # 本番（探索結果を含む）パラメータの反復回数と層幅を縮小
+        resolved = resolve_model_params(model_params)
+        for name in ('random_forest', 'gradient_boost'):
+            resolved[name]['n_estimators'] = max(10, int(resolved[name]['n_estimators'] * STANDARD_FIDELITY_SCALE))
+        network = resolved['neural_network']
+        network['hidden_layer_sizes'] = tuple(
+            max(8, int(size * STANDARD_FIDELITY_SCALE)) for size in network['hidden_layer_sizes']
+        )
+        network['max_iter'] = max(50, int(network['max_iter'] * STANDARD_FIDELITY_SCALE))
+        return create_ensemble_models(boosting_backend, resolved, n_jobs=n_jobs)
+
+    return create_ensemble_models(boosting_backend, model_params, n_jobs=n_jobs)
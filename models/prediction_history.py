@@ -78,7 +78,7 @@ class RoundAwarePredictionHistory:
                     if col in actual_row.index and pd.notna(actual_row[col]):
                         actual_numbers.append(int(actual_row[col]))
                 
-                if len(actual_numbers) == 7:
+                if len(actual_numbers) == len(main_cols):
                     entry['actual'] = actual_numbers
                     
                     # 各予測セットとの一致数を計算
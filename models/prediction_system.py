@@ -6,10 +6,9 @@
 import numpy as np
 import pandas as pd
 import logging
+import time
 from collections import Counter
 from datetime import datetime
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
-from sklearn.neural_network import MLPClassifier
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import cross_val_score
 
@@ -17,6 +16,7 @@ from .data_fetcher import AutoDataFetcher
 from .prediction_history import RoundAwarePredictionHistory
 from .learning import AutoVerificationLearner
 from .validation import TimeSeriesCrossValidator
+from .model_factory import create_ensemble_models, get_boosting_backend, get_fidelity, model_params_hash
 
 logger = logging.getLogger(__name__)
 
@@ -29,18 +29,10 @@ class AutoFetchEnsembleMiniLoto:
         # データ取得器（ミニロト対応）
         self.data_fetcher = AutoDataFetcher()
         
-        # 複数モデル（そのまま使用可能）
-        self.models = {
-            'random_forest': RandomForestClassifier(
-                n_estimators=100, max_depth=12, random_state=42, n_jobs=-1
-            ),
-            'gradient_boost': GradientBoostingClassifier(
-                n_estimators=80, max_depth=8, random_state=42
-            ),
-            'neural_network': MLPClassifier(
-                hidden_layer_sizes=(128, 64, 32), max_iter=300, random_state=42
-            )
-        }
+        # 複数モデル（gradient_boostのバックエンドは切り替え可能）
+        self.boosting_backend = get_boosting_backend()
+        self.model_params = {}  # ハイパーパラメータ探索で公開された上書き値
+        self.models = create_ensemble_models(self.boosting_backend)
         
         self.scalers = {}
         self.model_weights = {
@@ -58,6 +50,9 @@ class AutoFetchEnsembleMiniLoto:
         self.trained_models = {}
         self.model_scores = {}
         self.data_count = 0
+        self.last_training_report = None
+        self.resumed_models = []
+        self.model_version = None  # レジストリのバージョンID
         
         # 開催回対応予測履歴
         self.history = RoundAwarePredictionHistory()
@@ -81,6 +76,20 @@ class AutoFetchEnsembleMiniLoto:
         self.data_fetcher.set_cache_manager(file_manager)
         self.history.set_file_manager(file_manager)
         
+        # 公開済みハイパーパラメータがあれば適用
+        published_params = file_manager.load_model_params()
+        if published_params:
+            self.apply_model_params(published_params)
+    
+    def apply_model_params(self, model_params):
+        """ハイパーパラメータを本番モデルと検証器の両方に適用"""
+        self.model_params = model_params or {}
+        self.models = create_ensemble_models(self.boosting_backend, self.model_params)
+        
+        # 検証器は次回利用時に同じパラメータで再生成
+        self.validator = None
+        logger.info(f"ハイパーパラメータ適用: {model_params_hash(self.model_params)}")
+        
     def load_models(self):
         """保存済みモデルと統計情報を読み込み"""
         if not self.file_manager:
@@ -89,16 +98,62 @@ class AutoFetchEnsembleMiniLoto:
             
         return self.file_manager.load_model(self)
     
+    def refresh_models(self):
+        """
+        公開中のバージョンが保持中のものと異なれば読み込み直す（ホットスワップ）
+        戻り値: 切り替えた場合True
+        """
+        if not self.file_manager:
+            return False
+        
+        current_version = self.file_manager.current_model_version()
+        if not current_version or current_version == self.model_version:
+            return False
+        
+        previous_version = self.model_version
+        if self.file_manager.load_model(self, version_id=current_version):
+            logger.info(f"🔄 モデルをホットスワップ: {previous_version} → {current_version}")
+            return True
+        return False
+    
+    def get_validator(self, fidelity=None):
+        """本番と同じ設定の時系列検証器を取得（検証結果ストアも共有・fidelity で忠実度を切り替え）"""
+        fidelity = get_fidelity(fidelity)
+        if not self.validator or self.validator.fidelity != fidelity:
+            self.validator = TimeSeriesCrossValidator(
+                boosting_backend=self.boosting_backend,
+                model_params=self.model_params,
+                result_store=getattr(self.file_manager, 'validation_store', None),
+                fidelity=fidelity
+            )
+        return self.validator
+    
+    def get_model_manifest(self):
+        """レジストリのマニフェストに記録する学習条件"""
+        return {
+            'data_round': int(self.data_fetcher.latest_round or 0),
+            'boosting_backend': self.boosting_backend,
+            'model_params_hash': model_params_hash(self.model_params)
+        }
+    
     def save_models(self):
         """学習済みモデルと統計情報を保存"""
         if not self.file_manager:
             logger.warning("ファイル管理器が設定されていません")
             return False
             
-        return self.file_manager.save_model(self)
+        saved = self.file_manager.save_model(self)
+        if saved:
+            # 正式保存できたら途中経過のチェックポイントは不要
+            self.file_manager.clear_training_checkpoints()
+        return saved
     
-    def auto_setup_and_train(self, force_full_train=False):
-        """自動セットアップ・学習"""
+    def auto_setup_and_train(self, force_full_train=False, budget=None, progress_callback=None):
+        """
+        自動セットアップ・学習
+        budget: TrainingBudget で時間内に収める
+        progress_callback: (完了数, 総数, モデル名, 状態) を受け取る進捗通知
+        """
         try:
             logger.info("=== ミニロト自動セットアップ・学習開始 ===")
             
@@ -118,7 +173,9 @@ class AutoFetchEnsembleMiniLoto:
                     if self.data_count < len(training_data):
                         logger.info(f"差分学習を実行: {len(training_data) - self.data_count}件の新規データ")
                         # 新規学習を実行
-                        success = self.train_ensemble_models(training_data)
+                        success = self.train_ensemble_models(
+                            training_data, budget=budget, progress_callback=progress_callback
+                        )
                         if success and self.file_manager:
                             self.save_models()
                         return success
@@ -139,7 +196,9 @@ class AutoFetchEnsembleMiniLoto:
                 logger.info(f"{verified_count}件の過去予測を自動照合・学習に反映")
             
             # 4. 学習実行
-            success = self.train_ensemble_models(training_data)
+            success = self.train_ensemble_models(
+                training_data, budget=budget, progress_callback=progress_callback
+            )
             if not success:
                 logger.error("学習失敗")
                 return False
@@ -155,8 +214,15 @@ class AutoFetchEnsembleMiniLoto:
             logger.error(f"自動セットアップエラー: {e}")
             return False
     
-    def train_ensemble_models(self, data):
-        """アンサンブルモデル学習（ミニロト対応）"""
+    def _training_signature(self, data):
+        """チェックポイント再開可否を判定する学習条件の識別子"""
+        latest_round = 0
+        if self.data_fetcher.round_column in data.columns and len(data) > 0:
+            latest_round = int(data[self.data_fetcher.round_column].max())
+        return f"{len(data)}:{latest_round}:{self.boosting_backend}:{model_params_hash(self.model_params)}"
+    
+    def train_ensemble_models(self, data, budget=None, progress_callback=None):
+        """アンサンブルモデル学習（ミニロト対応・時間予算・チェックポイント対応）"""
         try:
             logger.info("=== ミニロトアンサンブル学習開始 ===")
             
@@ -170,34 +236,105 @@ class AutoFetchEnsembleMiniLoto:
                 return False
             
             self.data_count = len(data)
+            total_models = len(self.models)
+            
+            # 前回中断した学習のチェックポイントを復元
+            signature = self._training_signature(data)
+            checkpoints = {}
+            if self.file_manager:
+                checkpoints = self.file_manager.load_training_checkpoints(signature)
+            
+            self.resumed_models = []
+            for name, checkpoint in checkpoints.items():
+                if name not in self.models:
+                    continue
+                self.trained_models[name] = checkpoint['model']
+                self.scalers[name] = checkpoint['scaler']
+                if checkpoint.get('score') is not None:
+                    self.model_scores[name] = checkpoint['score']
+                self.resumed_models.append(name)
+            
+            if self.resumed_models:
+                logger.info(f"チェックポイントから再開: {self.resumed_models}")
+                if progress_callback:
+                    progress_callback(len(self.resumed_models), total_models, ', '.join(self.resumed_models), '復元')
+            
+            pending_models = {
+                name: model for name, model in self.models.items()
+                if name not in self.resumed_models
+            }
+            
+            # 時間予算がある場合は各モデルの学習スループットを事前計測
+            if budget is not None and pending_models:
+                logger.info("学習スループット計測中...")
+                budget.probe(pending_models, StandardScaler().fit_transform(X), y)
             
             # 各モデルの学習
             logger.info("ミニロトアンサンブルモデル学習中...")
+            completed = len(self.resumed_models)
             
-            for name, model in self.models.items():
+            for name, model in list(pending_models.items()):
                 try:
+                    if progress_callback:
+                        progress_callback(completed, total_models, name, '学習中')
+                    
+                    run_cv = True
+                    X_fit, y_fit = X, y
+                    
+                    # 残り時間に応じて反復回数・サンプル数を調整
+                    if budget is not None:
+                        plan = budget.plan_fit(name, model, len(X), pending_models)
+                        pending_models.pop(name, None)
+                        if plan['skip']:
+                            logger.warning(f"    ⏭️ {name}: 時間予算不足のためスキップ")
+                            continue
+                        model = plan['model']
+                        run_cv = plan['run_cv']
+                        X_fit, y_fit = X[-plan['n_samples']:], y[-plan['n_samples']:]
+                    
                     logger.info(f"  {name} 学習中...")
                     
                     # スケーリング
                     scaler = StandardScaler()
-                    X_scaled = scaler.fit_transform(X)
+                    X_scaled = scaler.fit_transform(X_fit)
                     self.scalers[name] = scaler
                     
                     # 学習
-                    model.fit(X_scaled, y)
-                    
-                    # クロスバリデーション評価
-                    cv_score = np.mean(cross_val_score(model, X_scaled, y, cv=3))
+                    fit_start = time.monotonic()
+                    model.fit(X_scaled, y_fit)
+                    if budget is not None:
+                        budget.record_fit(name, model, len(X_scaled), time.monotonic() - fit_start)
                     
                     self.trained_models[name] = model
-                    self.model_scores[name] = cv_score
                     
-                    logger.info(f"    ✅ {name}: CV精度 {cv_score*100:.2f}%")
+                    # クロスバリデーション評価（予算不足時は省略）
+                    if run_cv:
+                        cv_score = np.mean(cross_val_score(model, X_scaled, y_fit, cv=3))
+                        self.model_scores[name] = cv_score
+                        logger.info(f"    ✅ {name}: CV精度 {cv_score*100:.2f}%")
+                    else:
+                        self.model_scores.pop(name, None)
+                        logger.info(f"    ✅ {name}: 学習完了（CV省略）")
+                    
+                    # 完了したモデルは即座にチェックポイント保存
+                    if self.file_manager:
+                        self.file_manager.save_training_checkpoint(name, {
+                            'model': model,
+                            'scaler': scaler,
+                            'score': self.model_scores.get(name)
+                        }, signature)
+                    
+                    completed += 1
+                    if progress_callback:
+                        progress_callback(completed, total_models, name, '完了')
                     
                 except Exception as e:
                     logger.error(f"    ❌ {name}: エラー {e}")
                     continue
             
+            if budget is not None:
+                self.last_training_report = budget.report()
+            
             logger.info(f"ミニロトアンサンブル学習完了: {len(self.trained_models)}モデル")
             return True
             
@@ -294,8 +431,11 @@ class AutoFetchEnsembleMiniLoto:
             logger.error(f"特徴量エンジニアリングエラー: {e}")
             return None, None
     
-    def predict_next_round(self, count=20, use_learning=True):
-        """次回開催回の予測（学習改善オプション付き）"""
+    def predict_next_round(self, count=20, use_learning=True, reuse_recorded=True):
+        """
+        次回開催回の予測（学習改善オプション付き）
+        reuse_recorded: 次回分の予測を記録済みなら作り直さずに返す（次回抽選まで有効）
+        """
         try:
             # 次回情報取得
             next_info = self.data_fetcher.get_next_round_info()
@@ -303,6 +443,16 @@ class AutoFetchEnsembleMiniLoto:
                 logger.error("次回開催回情報取得失敗")
                 return [], {}
             
+            valid_until = self.data_fetcher.valid_until()
+            next_info['valid_until'] = None if valid_until is None else valid_until.isoformat()
+            
+            recorded = self.history.find_prediction_by_round(next_info['next_round']) if reuse_recorded else None
+            if recorded and len(recorded['predictions']) >= count:
+                logger.info(f"{next_info['prediction_target']}の記録済み予測を使用（次回抽選まで再計算なし）")
+                next_info['precomputed'] = True
+                return [list(pred_set) for pred_set in recorded['predictions'][:count]], next_info
+            next_info['precomputed'] = False
+            
             logger.info(f"=== {next_info['prediction_target']}の予測開始 ===")
             logger.info(f"予測日時: {next_info['current_date']}")
             logger.info(f"最新データ: 第{next_info['latest_round']}回まで")
@@ -494,12 +644,11 @@ class AutoFetchEnsembleMiniLoto:
                 return None
             
             # 時系列検証器初期化
-            if not self.validator:
-                self.validator = TimeSeriesCrossValidator()
+            validator = self.get_validator()
             
             # 検証実行
-            results = self.validator.run_validation(
-                self.data_fetcher.latest_data,
+            results = validator.run_validation(
+                self.data_fetcher.get_draws(),
                 self.data_fetcher.main_columns,
                 self.data_fetcher.round_column
             )
@@ -566,7 +715,12 @@ class AutoFetchEnsembleMiniLoto:
             'latest_round': self.data_fetcher.latest_round,
             'model_scores': self.model_scores,
             'model_weights': self.model_weights,
+            'boosting_backend': self.boosting_backend,
+            'model_params_hash': model_params_hash(self.model_params),
+            'model_version': self.model_version,
+            'last_training_report': self.last_training_report,
             'has_data': self.data_fetcher.latest_data is not None,
+            'data_memory': self.data_fetcher.memory_usage(),
             'prediction_history': self.history.get_prediction_summary(),
             'learning_status': self.auto_learner.get_learning_summary()
         }
@@ -575,6 +729,7 @@ class AutoFetchEnsembleMiniLoto:
         if self.file_manager:
             status['files'] = {
                 'model_exists': self.file_manager.model_exists(),
+                'current_model_version': self.file_manager.current_model_version(),
                 'history_exists': self.file_manager.history_exists(),
                 'data_cached': self.file_manager.data_cached()
             }
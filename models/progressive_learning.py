@@ -178,11 +178,7 @@ class ProgressiveLearningManager:
         feature_adjustments = self._get_accumulated_feature_adjustments()
         
         # 固定窓検証の実行（フル機能）
-        validator = self.prediction_system.validator
-        if not validator:
-            from models.validation import TimeSeriesCrossValidator
-            validator = TimeSeriesCrossValidator()
-            self.prediction_system.validator = validator
+        validator = self.prediction_system.get_validator()
         
         # 単一窓サイズでの検証
         results = validator.fixed_window_validation(
@@ -216,11 +212,7 @@ class ProgressiveLearningManager:
         """累積窓段階の実行"""
         logger.info("累積窓検証開始")
         
-        validator = self.prediction_system.validator
-        if not validator:
-            from models.validation import TimeSeriesCrossValidator
-            validator = TimeSeriesCrossValidator()
-            self.prediction_system.validator = validator
+        validator = self.prediction_system.get_validator()
         
         # 累積窓検証の実行
         results = validator.expanding_window_validation(
@@ -0,0 +1,128 @@
+"""
+ランダム購入ベースライン - ミニロト対応版
+ランダムな5/31口の組をビットマスク（uint32）で大量に生成し、実際の抽選履歴との一致数分布をモンテカルロで推定
+検証結果の平均一致数などにp値・信頼区間を付ける
+"""
+
+import os
+import time
+import logging
+import itertools
+import numpy as np
+
+from .draw_matching import MATCH_BINS, match_counts, match_histogram, to_bitmasks
+from .features import NUMBER_MIN, NUMBER_MAX, PICK_COUNT
+
+logger = logging.getLogger(__name__)
+
+# 1回の配列演算で扱う最大口数（メモリ使用量の上限）
+DEFAULT_CHUNK_TICKETS = 1 << 18
+
+# p値の分解能を保つための最小ポートフォリオ数（検証点が多い場合は口数の指定を超えて生成）
+MIN_PORTFOLIOS = 500
+
+# 比較する集計値（検証点ごとの平均を全検証点で平均）
+BASELINE_METRICS = ('avg_matches', 'avg_sets_3_plus', 'avg_sets_4_plus', 'avg_sets_5_plus')
+
+_ticket_masks = None
+
+
+def all_ticket_masks():
+    """5/31 の全組み合わせ（169,911通り）のビットマスク表（初回のみ作成）"""
+    global _ticket_masks
+    if _ticket_masks is None:
+        combos = np.array(list(itertools.combinations(range(NUMBER_MIN, NUMBER_MAX + 1), PICK_COUNT)), dtype=np.uint8)
+        _ticket_masks = to_bitmasks(combos)
+    return _ticket_masks
+
+
+def get_baseline_tickets(n_tickets=None):
+    """シミュレーション口数（環境変数 RANDOM_BASELINE_TICKETS、0で無効）"""
+    if n_tickets is None:
+        n_tickets = os.environ.get('RANDOM_BASELINE_TICKETS', 1_000_000)
+    return max(0, int(n_tickets))
+
+
+class RandomBaselineSimulator:
+    """
+    ランダム購入ポートフォリオのモンテカルロシミュレーション
+    検証と同じ「各検証点でS口」の構成のポートフォリオを繰り返し生成し、集計値の帰無分布を作る
+    """
+
+    def __init__(self, n_tickets=None, chunk_tickets=DEFAULT_CHUNK_TICKETS, random_state=42, confidence=0.95):
+        self.n_tickets = get_baseline_tickets(n_tickets)
+        self.chunk_tickets = max(1, int(chunk_tickets))
+        self.random_state = random_state
+        self.confidence = confidence
+
+    def simulate(self, actual_masks, sets_per_point=20):
+        """
+        実際の抽選（ビットマスク）の並びに対してランダムポートフォリオを評価
+        戻り値: ポートフォリオごとの集計値の配列と、1口あたりの一致数ヒストグラム
+        """
+        actual_masks = np.asarray(actual_masks, dtype=np.uint32)
+        points = len(actual_masks)
+        portfolio_tickets = points * sets_per_point
+        n_portfolios = max(MIN_PORTFOLIOS, self.n_tickets // max(1, portfolio_tickets))
+        chunk_portfolios = max(1, self.chunk_tickets // max(1, portfolio_tickets))
+
+        table = all_ticket_masks()
+        rng = np.random.default_rng([self.random_state, points, sets_per_point])
+
+        metrics = {name: np.empty(n_portfolios) for name in BASELINE_METRICS}
+        histogram = np.zeros(MATCH_BINS, dtype=np.int64)
+
+        for start in range(0, n_portfolios, chunk_portfolios):
+            size = min(chunk_portfolios, n_portfolios - start)
+            tickets = table[rng.integers(0, len(table), size=(size, points, sets_per_point))]
+            counts = match_counts(tickets, actual_masks[np.newaxis, :, np.newaxis])
+
+            histogram += match_histogram(counts)
+            metrics['avg_matches'][start:start + size] = counts.mean(axis=(1, 2))
+            for threshold in (3, 4, 5):
+                per_point = (counts >= threshold).sum(axis=2)
+                metrics[f'avg_sets_{threshold}_plus'][start:start + size] = per_point.mean(axis=1)
+
+        return metrics, histogram
+
+    def compare(self, match_counts_by_point, actual_masks):
+        """
+        検証結果（検証点ごとの一致数配列）をランダム購入と比較
+        戻り値: 集計値ごとの観測値・ベースライン平均・信頼区間・p値（片側: ランダム以上になる確率）
+        """
+        counts = np.asarray(match_counts_by_point)
+        if self.n_tickets == 0 or counts.ndim != 2 or len(counts) == 0:
+            return None
+
+        start = time.monotonic()
+        metrics, histogram = self.simulate(actual_masks, counts.shape[1])
+
+        observed = {
+            'avg_matches': float(counts.mean()),
+            'avg_sets_3_plus': float((counts >= 3).sum(axis=1).mean()),
+            'avg_sets_4_plus': float((counts >= 4).sum(axis=1).mean()),
+            'avg_sets_5_plus': float((counts >= 5).sum(axis=1).mean())
+        }
+
+        alpha = (1.0 - self.confidence) / 2
+        n_portfolios = len(metrics['avg_matches'])
+        comparison = {}
+        for name in BASELINE_METRICS:
+            simulated = metrics[name]
+            low, high = np.quantile(simulated, [alpha, 1.0 - alpha])
+            comparison[name] = {
+                'observed': observed[name],
+                'baseline_mean': float(simulated.mean()),
+                'ci_low': float(low),
+                'ci_high': float(high),
+                'p_value': float((1 + np.count_nonzero(simulated >= observed[name])) / (n_portfolios + 1))
+            }
+
+        return {
+            'metrics': comparison,
+            'confidence': self.confidence,
+            'portfolios': n_portfolios,
+            'simulated_tickets': int(n_portfolios * counts.size),
+            'ticket_match_rates': (histogram / histogram.sum()).tolist(),
+            'seconds': round(time.monotonic() - start, 3)
+        }
@@ -0,0 +1,201 @@
+"""
+時間予算付き学習スケジューラ - ミニロト対応版
+Celeryのソフトタイムアウト内に学習・検証を収めるための計画と記録
+"""
+
+import time
+import logging
+import warnings
+from sklearn.base import clone
+
+logger = logging.getLogger(__name__)
+
+# 反復回数を表すパラメータ（木の本数・ブースティング段数・エポック数）
+ITERATION_PARAMS = ('n_estimators', 'max_iter')
+
+# cross_val_score(cv=3) は 2/3 のデータで3回学習するため本学習の約2倍
+CV_COST_FACTOR = 2.0
+
+
+def get_iteration_param(model):
+    """モデルの反復回数パラメータ名を取得"""
+    params = model.get_params()
+    for name in ITERATION_PARAMS:
+        if name in params:
+            return name
+    return None
+
+
+class TrainingBudget:
+    """締切と各モデルの学習スループットから学習規模を調整するクラス"""
+
+    def __init__(self, seconds, safety_margin=0.1, min_iteration_ratio=0.2,
+                 min_samples=500, probe_samples=1000):
+        self.seconds = float(seconds)
+        self.started_at = time.monotonic()
+        self.deadline = self.started_at + self.seconds * (1.0 - safety_margin)
+        self.min_iteration_ratio = min_iteration_ratio
+        self.min_samples = min_samples
+        self.probe_samples = probe_samples
+
+        self.throughput = {}  # モデル名 -> 1反復・1サンプルあたりの秒数
+        self.decisions = []
+        self.stopped_early = False
+
+    @classmethod
+    def from_time_limit(cls, soft_time_limit, reserve_seconds=30, **kwargs):
+        """Celeryのソフトタイムアウトから予算を作成（保存・後処理分を確保）"""
+        return cls(max(1.0, soft_time_limit - reserve_seconds), **kwargs)
+
+    # ===== 残り時間 =====
+
+    def elapsed(self):
+        """経過秒数"""
+        return time.monotonic() - self.started_at
+
+    def remaining(self):
+        """締切までの残り秒数"""
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self):
+        """締切を過ぎたか"""
+        return self.remaining() <= 0
+
+    def record_decision(self, name, action, **details):
+        """予算判断を記録"""
+        decision = {'model': name, 'action': action, 'at_seconds': round(self.elapsed(), 2)}
+        decision.update(details)
+        self.decisions.append(decision)
+        logger.info(f"⏱️ 予算判断: {name} → {action} {details}")
+
+    # ===== スループット計測 =====
+
+    def probe(self, models, X, y):
+        """各モデルを縮小学習して1反復・1サンプルあたりの学習時間を計測"""
+        n = min(len(X), self.probe_samples)
+        X_probe, y_probe = X[-n:], y[-n:]
+
+        for name, model in models.items():
+            if name in self.throughput:
+                continue
+
+            param = get_iteration_param(model)
+            units = model.get_params()[param] if param else 1
+            probe_units = max(2, int(units * 0.1)) if param else 1
+
+            probe_model = clone(model)
+            if param:
+                probe_model.set_params(**{param: probe_units})
+
+            start = time.monotonic()
+            try:
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore')
+                    probe_model.fit(X_probe, y_probe)
+            except Exception as e:
+                logger.warning(f"スループット計測失敗 ({name}): {e}")
+                continue
+            elapsed = time.monotonic() - start
+
+            self.throughput[name] = elapsed / (probe_units * n)
+            logger.info(f"  {name}: {elapsed:.2f}秒 / {probe_units}反復×{n}サンプル")
+
+    def record_fit(self, name, model, n_samples, elapsed):
+        """実際の学習時間でスループットを更新"""
+        param = get_iteration_param(model)
+        units = getattr(model, 'n_iter_', None) or (model.get_params()[param] if param else 1)
+        if n_samples > 0 and units:
+            self.throughput[name] = elapsed / (units * n_samples)
+
+    def estimate_seconds(self, name, model, n_samples, with_cv=True):
+        """フル設定での学習時間を見積もり"""
+        rate = self.throughput.get(name)
+        if rate is None:
+            return 0.0
+        param = get_iteration_param(model)
+        units = model.get_params()[param] if param else 1
+        factor = 1.0 + (CV_COST_FACTOR if with_cv else 0.0)
+        return rate * units * n_samples * factor
+
+    # ===== 学習計画 =====
+
+    def plan_fit(self, name, model, n_samples, pending_models, with_cv=True):
+        """
+        残り時間を未学習モデルの見積もり比で配分し、学習規模を決定
+        優先順位: CV省略 → 反復回数縮小 → 直近サンプルへ縮小 → スキップ
+        """
+        plan = {
+            'model': model,
+            'n_samples': n_samples,
+            'run_cv': with_cv,
+            'skip': False
+        }
+
+        remaining = self.remaining()
+        if remaining <= 0:
+            self.stopped_early = True
+            self.record_decision(name, 'skip', reason='deadline_reached')
+            plan['skip'] = True
+            return plan
+
+        rate = self.throughput.get(name)
+        if rate is None:
+            return plan
+
+        # 未学習モデル全体の見積もりに対するこのモデルの取り分
+        estimates = {
+            other: self.estimate_seconds(other, other_model, n_samples, with_cv)
+            for other, other_model in pending_models.items()
+        }
+        total = sum(estimates.values())
+        if total <= remaining:
+            return plan
+
+        allowance = remaining * (estimates.get(name, 0.0) / total if total > 0 else 1.0)
+
+        param = get_iteration_param(model)
+        full_units = model.get_params()[param] if param else 1
+
+        if with_cv and rate * full_units * n_samples <= allowance:
+            plan['run_cv'] = False
+            self.record_decision(name, 'skip_cv', allowance_seconds=round(allowance, 1))
+            return plan
+
+        plan['run_cv'] = False
+        units = int(allowance / (rate * n_samples))
+        min_units = max(2, int(full_units * self.min_iteration_ratio))
+
+        if param and units >= min_units:
+            plan['model'] = clone(model).set_params(**{param: units})
+            self.record_decision(name, f'scale_{param}', original=full_units, scaled=units,
+                                 allowance_seconds=round(allowance, 1))
+            return plan
+
+        if param:
+            plan['model'] = clone(model).set_params(**{param: min_units})
+        else:
+            min_units = 1
+        samples = int(allowance / (rate * min_units))
+
+        if samples >= self.min_samples:
+            plan['n_samples'] = min(samples, n_samples)
+            self.record_decision(name, 'subsample', original=n_samples, scaled=plan['n_samples'],
+                                 **({f'scaled_{param}': min_units} if param else {}))
+            return plan
+
+        self.stopped_early = True
+        self.record_decision(name, 'skip', reason='insufficient_time',
+                             allowance_seconds=round(allowance, 1))
+        plan['skip'] = True
+        return plan
+
+    def report(self):
+        """予算判断のレポート（タスク結果用）"""
+        return {
+            'budget_seconds': round(self.seconds, 1),
+            'elapsed_seconds': round(self.elapsed(), 1),
+            'remaining_seconds': round(self.remaining(), 1),
+            'stopped_early': self.stopped_early,
+            'decisions': list(self.decisions),
+            'throughput': {name: float(rate) for name, rate in self.throughput.items()}
+        }
@@ -3,158 +3,256 @@
 本格的な時系列交差検証を実行
 """
 
+import os
+import json
+import hashlib
 import numpy as np
 import pandas as pd
 import logging
+import time
+import weakref
+import warnings
 from collections import Counter
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
-from sklearn.neural_network import MLPClassifier
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from multiprocessing import shared_memory
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import cross_val_score
+from threadpoolctl import threadpool_limits
+
+from .draw_dataset import DrawDataset
+from .features import PICK_COUNT, valid_draw_mask, compute_draw_features, build_next_draw_dataset
+from .draw_matching import match_counts, match_histogram, mask_to_numbers, to_bitmasks
+from .incremental_training import IncrementalEnsemble
+from .random_baseline import RandomBaselineSimulator
+from .model_factory import (
+    FIDELITY_MODEL_WEIGHTS,
+    create_fidelity_models,
+    get_boosting_backend,
+    get_fidelity,
+    model_params_hash
+)
 
 logger = logging.getLogger(__name__)
 
+# 本番と同じ基準特徴量（16次元）
+BASE_FEATURES = [16.0, 8.0, 80.0, 2.5, 29.0, 3.0, 16.0, 26.0, 1.0, 8.0, 16.0, 24.0, 6.5, 12.0, 2.0, 2.5]
+
+# 検証1点の学習に最低限必要なサンプル数
+MIN_TRAIN_SAMPLES = 50
+
+# 固定窓の検証点の上限
+MAX_FIXED_WINDOW_POINTS = 50
+
+# ワーカープロセスで共有する抽選番号配列と検証器（initializerで一度だけ準備）
+_worker_state = {}
+
+
+def _init_worker(shm_name, shape, dtype, validator_config):
+    """ワーカープロセス初期化: 共有メモリ上の抽選番号配列に接続"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    
+    # プロセス並列時はモデル内部のスレッド並列化を無効化
+    threadpool_limits(1)
+    
+    _worker_state['shm'] = shm
+    _worker_state['numbers'] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    _worker_state['validator'] = TimeSeriesCrossValidator(n_jobs=1, **validator_config)
+
+
+def _evaluate_window_point(train_start, train_end, test_idx, seed, numbers=None, validator=None, rng_key=None):
+    """
+    固定窓の1検証点（学習→20セット予測→評価）
+    numbers/validator 省略時はワーカーの共有データを使用
+    rng_key: 乱数列の識別子（省略時は全体配列上の (train_start, test_idx)）
+    """
+    numbers = _worker_state['numbers'] if numbers is None else numbers
+    validator = validator or _worker_state['validator']
+    start = time.monotonic()
+    
+    actual = numbers[test_idx]
+    if not valid_draw_mask(actual[np.newaxis])[0]:
+        return None, time.monotonic() - start
+    
+    model_data = validator.train_models_on_numbers(numbers[train_start:train_end])
+    if not model_data or not model_data['models']:
+        return None, time.monotonic() - start
+    
+    # 検証点ごとに独立した乱数列（並列・逐次どちらでも同じ結果）
+    rng = np.random.default_rng([seed, *(rng_key or (train_start, test_idx))])
+    predicted_sets = validator.generate_validation_predictions(
+        model_data, model_data['freq_counter'], 20, rng=rng
+    )
+    if not predicted_sets:
+        return None, time.monotonic() - start
+    
+    eval_result = validator.evaluate_prediction_sets(predicted_sets, actual)
+    return eval_result, time.monotonic() - start
+
+
 class TimeSeriesCrossValidator:
     """本格的な時系列交差検証クラス（モデル学習・20セット予測対応）"""
     
-    def __init__(self, min_train_size=10):
+    def __init__(self, min_train_size=10, boosting_backend=None, model_params=None,
+                 n_jobs=-1, max_workers=None, random_state=42, result_store=None, fidelity=None):
         self.min_train_size = min_train_size
         self.fixed_window_results = {}  # 窓サイズ別の結果
         self.expanding_window_results = []
         self.validation_history = []
         self.feature_importance_history = {}
         
-        # 本番と同じフルモデル
-        self.validation_models = {
-            'random_forest': RandomForestClassifier(
-                n_estimators=100, max_depth=12, random_state=42, n_jobs=-1
-            ),
-            'gradient_boost': GradientBoostingClassifier(
-                n_estimators=80, max_depth=8, random_state=42
-            ),
-            'neural_network': MLPClassifier(
-                hidden_layer_sizes=(128, 64, 32), max_iter=300, random_state=42
-            )
-        }
+        # 忠実度別の検証モデル（full は本番と同じバックエンド・ハイパーパラメータ）
+        self.boosting_backend = get_boosting_backend(boosting_backend)
+        self.model_params = model_params or {}
+        self.fidelity = get_fidelity(fidelity)
+        self.validation_models = create_fidelity_models(
+            self.fidelity, self.boosting_backend, self.model_params, n_jobs=n_jobs
+        )
         
-        self.model_weights = {
-            'random_forest': 0.4,
-            'gradient_boost': 0.35,
-            'neural_network': 0.25
-        }
+        # 検証点のプロセス並列数（環境変数 VALIDATION_WORKERS で上書き可能）
+        self.max_workers = max_workers or int(
+            os.environ.get('VALIDATION_WORKERS', max(1, (os.cpu_count() or 2) - 1))
+        )
+        self.random_state = random_state
         
+        self.model_weights = dict(FIDELITY_MODEL_WEIGHTS[self.fidelity])
+        
+        # 検証1点の結果キャッシュ（utils.validation_store.ValidationResultStore）
+        self.result_store = result_store
+        
+        # ランダム購入との比較（口数は環境変数 RANDOM_BASELINE_TICKETS、0で無効）
+        self.random_baseline = RandomBaselineSimulator(random_state=random_state)
+        
+        # 直近に変換したDataFrame（弱参照）と配列版（同じ履歴での再変換を省く）
+        self._draws_source = None
+        self._draws_key = None
+        self._draws = None
+    
+    def as_draws(self, data, main_cols, round_col):
+        """
+        抽選履歴を連続したNumPy配列（DrawDataset）に変換（同じDataFrameは1回だけ変換）
+        DrawDataset が渡された場合はそのまま返す
+        """
+        if data is None or isinstance(data, DrawDataset):
+            return data
+        
+        key = (tuple(main_cols), round_col, len(data))
+        if self._draws_source is not None and self._draws_source() is data and self._draws_key == key:
+            return self._draws
+        
+        draws = DrawDataset.from_dataframe(data, main_cols, round_col)
+        self._draws_source = weakref.ref(data)
+        self._draws_key = key
+        self._draws = draws
+        return draws
+        
+    def config_hash(self, mode):
+        """検証結果に影響する設定一式のハッシュ（ストアのキー用）"""
+        config = {
+            'mode': mode,
+            'fidelity': self.fidelity,
+            'boosting_backend': self.boosting_backend,
+            'model_params': model_params_hash(self.model_params),
+            'model_weights': self.model_weights,
+            'prediction_count': 20,
+            'result_format': 2  # 一致数配列形式の評価結果
+        }
+        encoded = json.dumps(config, sort_keys=True).encode('utf-8')
+        return hashlib.sha1(encoded).hexdigest()[:12]
+    
+    def _store_key(self, numbers, train_start, test_idx, rounds, config_hash):
+        """学習区間＋テスト抽選の内容・テスト回・設定・シードから保存キーを作成"""
+        if self.result_store is None:
+            return None
+        window = np.ascontiguousarray(numbers[train_start:test_idx + 1], dtype=np.int16)
+        train_hash = hashlib.sha1(window.tobytes()).hexdigest()[:16]
+        return self.result_store.make_key(train_hash, int(rounds[test_idx]), config_hash, self.random_state)
+    
+    def _load_stored_result(self, key):
+        """保存済みの検証結果を取得（JSONでリスト化された配列を戻す）"""
+        if key is None:
+            return None
+        return self.restore_result(self.result_store.get(key))
+    
+    def _save_result(self, key, eval_result):
+        """検証結果を保存"""
+        if key is not None and eval_result is not None:
+            self.result_store.put(key, eval_result)
+    
     def evaluate_prediction_sets(self, predicted_sets, actual):
-        """20セット予測と実際の一致を評価"""
-        results = []
+        """
+        予測セット (S, 5) と実際の抽選の一致をまとめて評価
+        結果は一致数配列・一致数ヒストグラムと集計値のみ（セット別の内訳は prediction_set_details で必要時に計算）
+        """
+        predicted = np.asarray(predicted_sets, dtype=np.uint8).reshape(-1, PICK_COUNT)
+        actual = np.asarray(actual, dtype=np.uint8).reshape(PICK_COUNT)
         
-        actual_set = set(actual)
-        
-        for i, predicted in enumerate(predicted_sets):
-            predicted_set = set([int(x) for x in predicted])
-            matches = len(predicted_set & actual_set)
-            
-            result = {
-                'set_idx': i,
-                'matches': matches,
-                'accuracy': matches / 5.0,
-                'predicted': [int(x) for x in predicted],
-                'actual': actual,
-                'matched_numbers': sorted(list(predicted_set & actual_set)),
-                'missed_numbers': sorted(list(actual_set - predicted_set)),
-                'extra_numbers': sorted(list(predicted_set - actual_set))
-            }
-            results.append(result)
+        counts = match_counts(to_bitmasks(predicted), to_bitmasks(actual))
+        histogram = match_histogram(counts)
         
-        # 全体統計
-        all_matches = [r['matches'] for r in results]
-        summary = {
-            'avg_matches': np.mean(all_matches),
-            'max_matches': max(all_matches),
-            'min_matches': min(all_matches),
-            'std_matches': np.std(all_matches),
-            'sets_3_plus': sum(1 for m in all_matches if m >= 3),
-            'sets_4_plus': sum(1 for m in all_matches if m >= 4),
-            'sets_5_plus': sum(1 for m in all_matches if m >= 5),
-            'match_distribution': dict(Counter(all_matches)),
-            'individual_results': results
+        return {
+            'avg_matches': float(counts.mean()),
+            'max_matches': int(counts.max()),
+            'min_matches': int(counts.min()),
+            'std_matches': float(counts.std()),
+            'sets_3_plus': int(histogram[3:].sum()),
+            'sets_4_plus': int(histogram[4:].sum()),
+            'sets_5_plus': int(histogram[5:].sum()),
+            'match_counts': counts,
+            'match_histogram': histogram,
+            'predicted': predicted,
+            'actual': actual
         }
+    
+    def prediction_set_details(self, eval_result, set_indices=None):
+        """評価結果からセット別の一致・見逃し・余分な数字を計算（表示・分析時のみ使用）"""
+        predicted = np.asarray(eval_result['predicted'], dtype=np.uint8).reshape(-1, PICK_COUNT)
+        actual = np.asarray(eval_result['actual'], dtype=np.uint8)
+        counts = np.asarray(eval_result['match_counts'])
         
-        return summary
+        predicted_masks = to_bitmasks(predicted)
+        actual_mask = to_bitmasks(actual)
+        indices = range(len(predicted)) if set_indices is None else set_indices
+        
+        details = []
+        for i in indices:
+            mask = predicted_masks[i]
+            details.append({
+                'set_idx': int(i),
+                'matches': int(counts[i]),
+                'accuracy': int(counts[i]) / PICK_COUNT,
+                'predicted': predicted[i].tolist(),
+                'actual': actual.tolist(),
+                'matched_numbers': mask_to_numbers(mask & actual_mask),
+                'missed_numbers': mask_to_numbers(actual_mask & ~mask),
+                'extra_numbers': mask_to_numbers(mask & ~actual_mask)
+            })
+        return details
+    
+    def restore_result(self, result):
+        """JSON経由（ストア・Celery）で配列がリストになった評価結果をNumPy配列に戻す"""
+        if result is None:
+            return None
+        result['match_counts'] = np.asarray(result['match_counts'], dtype=np.uint8)
+        result['match_histogram'] = np.asarray(result['match_histogram'], dtype=np.int64)
+        result['predicted'] = np.asarray(result['predicted'], dtype=np.uint8).reshape(-1, PICK_COUNT)
+        result['actual'] = np.asarray(result['actual'], dtype=np.uint8)
+        return result
     
     def create_validation_features(self, data, main_cols):
-        """本番と同じ16次元フル特徴量を作成"""
+        """本番と同じ16次元フル特徴量を作成（配列に1回変換して一括計算）"""
         try:
-            features = []
-            targets = []
-            freq_counter = Counter()
-            pair_freq = Counter()
+            if isinstance(data, DrawDataset):
+                numbers = data.numbers
+            else:
+                numbers = data[main_cols].to_numpy(dtype=np.int16, na_value=0) if len(main_cols) == PICK_COUNT else None
+            if numbers is None:
+                return None, None, Counter()
             
-            for i in range(len(data)):
-                try:
-                    current = []
-                    for col in main_cols:
-                        if col in data.columns:
-                            current.append(int(data.iloc[i][col]))
-                    
-                    if len(current) != 5:
-                        continue
-                    
-                    if not all(1 <= x <= 31 for x in current):
-                        continue
-                    if len(set(current)) != 7:
-                        continue
-                    
-                    # 基本統計
-                    for num in current:
-                        freq_counter[num] += 1
-                    
-                    # ペア分析
-                    for j in range(len(current)):
-                        for k in range(j+1, len(current)):
-                            pair = tuple(sorted([current[j], current[k]]))
-                            pair_freq[pair] += 1
-                    
-                    # 本番と同じ16次元特徴量
-                    sorted_nums = sorted(current)
-                    gaps = [sorted_nums[j+1] - sorted_nums[j] for j in range(4)]
-                    
-                    feat = [
-                        float(np.mean(current)),           # 平均
-                        float(np.std(current)),            # 標準偏差
-                        float(np.sum(current)),            # 合計
-                        float(sum(1 for x in current if x % 2 == 1)),  # 奇数数
-                        float(max(current)),               # 最大値
-                        float(min(current)),               # 最小値
-                        float(np.median(current)),         # 中央値
-                        float(max(current) - min(current)), # 範囲
-                        float(len([j for j in range(len(sorted_nums)-1) 
-                                 if sorted_nums[j+1] - sorted_nums[j] == 1])), # 連続数
-                        float(current[0]),                 # 第1数字
-                        float(current[2]),                 # 第3数字
-                        float(current[4]),                 # 第5数字
-                        float(np.mean(gaps)),              # 平均ギャップ
-                        float(max(gaps)),                  # 最大ギャップ
-                        float(min(gaps)),                  # 最小ギャップ
-                        float(len([x for x in current if x <= 15])), # 小数字数
-                    ]
-                    
-                    # 次回予測ターゲット
-                    if i < len(data) - 1:
-                        next_nums = []
-                        for col in main_cols:
-                            if col in data.columns:
-                                next_nums.append(int(data.iloc[i+1][col]))
-                        
-                        if len(next_nums) == 5:
-                            for target_num in next_nums:
-                                features.append(feat.copy())
-                                targets.append(target_num)
-                        
-                except Exception as e:
-                    continue
+            X, y, _ = build_next_draw_dataset(numbers)
+            freq_counter = Counter(numbers[valid_draw_mask(numbers)].reshape(-1).tolist())
             
-            logger.info(f"フル特徴量完成: {len(features)}個（16次元）")
-            return np.array(features), np.array(targets), freq_counter
+            logger.info(f"フル特徴量完成: {len(X)}個（16次元）")
+            return X, y, freq_counter
             
         except Exception as e:
             logger.error(f"特徴量エンジニアリングエラー: {e}")
@@ -162,24 +260,32 @@ class TimeSeriesCrossValidator:
     
     def train_validation_models(self, train_data, main_cols):
         """本番と同じフルモデルを学習"""
+        numbers = train_data.numbers if isinstance(train_data, DrawDataset) else train_data[main_cols].to_numpy(dtype=np.int16, na_value=0)
+        return self.train_models_on_numbers(numbers)
+    
+    def train_models_on_numbers(self, numbers):
+        """抽選番号配列 (N, 5) から本番と同じフルモデルを学習（DataFrameを介さない版）"""
         try:
-            # 本番と同じ16次元特徴量作成
-            X, y, freq_counter = self.create_validation_features(train_data, main_cols)
-            if X is None or len(X) < 50:  # 最低限必要なデータ数
+            X, y, _ = build_next_draw_dataset(numbers)
+            if len(X) < MIN_TRAIN_SAMPLES:
                 return None
             
+            valid = numbers[valid_draw_mask(numbers)]
+            freq_counter = Counter(valid.reshape(-1).tolist())
+            
+            # スケーラーは全モデル共通の特徴量なので1回だけ学習
+            scaler = StandardScaler()
+            X_scaled = scaler.fit_transform(X)
+            
             trained_models = {}
             scalers = {}
             
             for name, model in self.validation_models.items():
                 try:
-                    # スケーリング
-                    scaler = StandardScaler()
-                    X_scaled = scaler.fit_transform(X)
-                    
-                    # 本番と同じ学習
                     model_copy = type(model)(**model.get_params())
-                    model_copy.fit(X_scaled, y)
+                    with warnings.catch_warnings():
+                        warnings.simplefilter('ignore')
+                        model_copy.fit(X_scaled, y)
                     
                     trained_models[name] = model_copy
                     scalers[name] = scaler
@@ -189,7 +295,7 @@ class TimeSeriesCrossValidator:
                     continue
             
             return {
-                'models': trained_models, 
+                'models': trained_models,
                 'scalers': scalers,
                 'freq_counter': freq_counter
             }
@@ -198,17 +304,34 @@ class TimeSeriesCrossValidator:
             logger.error(f"検証モデル学習エラー: {e}")
             return None
     
-    def generate_validation_predictions(self, model_data, freq_counter, count=20):
-        """本番と同じアンサンブル手法で20セット予測を生成"""
+    def model_distributions(self, model_data):
+        """
+        各モデルの基準特徴量に対する出力（入力が固定なので検証点ごとに1回だけ計算）
+        戻り値: モデル名 -> ('proba', classes, 確率) または ('predict', 予測値, None)
+        """
+        distributions = {}
+        for name, model in model_data['models'].items():
+            try:
+                X_scaled = model_data['scalers'][name].transform([BASE_FEATURES])
+                if hasattr(model, 'predict_proba'):
+                    proba = model.predict_proba(X_scaled)[0]
+                    if len(model.classes_) > 0:
+                        distributions[name] = ('proba', model.classes_, proba / proba.sum())
+                else:
+                    distributions[name] = ('predict', model.predict(X_scaled)[0], None)
+            except Exception as e:
+                continue
+        return distributions
+    
+    def generate_validation_predictions(self, model_data, freq_counter, count=20, rng=None, distributions=None):
+        """本番と同じアンサンブル手法で20セット予測を生成（rngで再現性を確保）"""
         try:
             if not model_data or not model_data['models']:
                 return []
             
-            trained_models = model_data['models']
-            scalers = model_data['scalers']
-            
-            # 本番と同じ基準特徴量（16次元）
-            base_features = [16.0, 8.0, 80.0, 2.5, 29.0, 3.0, 16.0, 26.0, 1.0, 8.0, 16.0, 24.0, 6.5, 12.0, 2.0, 2.5]
+            rng = rng if rng is not None else np.random.default_rng()
+            if distributions is None:
+                distributions = self.model_distributions(model_data)
             
             predictions = []
             
@@ -216,29 +339,17 @@ class TimeSeriesCrossValidator:
                 # 各モデルの予測を収集（本番と同じアルゴリズム）
                 ensemble_votes = Counter()
                 
-                for name, model in trained_models.items():
-                    try:
-                        scaler = scalers[name]
-                        X_scaled = scaler.transform([base_features])
-                        
-                        # 複数回予測（本番と同じ回数）
-                        for _ in range(8):
-                            if hasattr(model, 'predict_proba'):
-                                proba = model.predict_proba(X_scaled)[0]
-                                classes = model.classes_
-                                if len(classes) > 0:
-                                    selected = np.random.choice(classes, p=proba/proba.sum())
-                                    if 1 <= selected <= 31:
-                                        weight = self.model_weights.get(name, 0.33)
-                                        ensemble_votes[int(selected)] += weight
-                            else:
-                                pred = model.predict(X_scaled)[0]
-                                if 1 <= pred <= 31:
-                                    weight = self.model_weights.get(name, 0.33)
-                                    ensemble_votes[int(pred)] += weight
-                                    
-                    except Exception as e:
-                        continue
+                for name, (kind, classes, proba) in distributions.items():
+                    weight = self.model_weights.get(name, 0.33)
+                    
+                    # 複数回予測（本番と同じ回数）
+                    for _ in range(8):
+                        if kind == 'proba':
+                            selected = rng.choice(classes, p=proba)
+                        else:
+                            selected = classes
+                        if 1 <= selected <= 31:
+                            ensemble_votes[int(selected)] += weight
                 
                 # 頻出数字と組み合わせ（本番と同じ）
                 frequent_nums = [num for num, _ in freq_counter.most_common(15)]
@@ -250,7 +361,7 @@ class TimeSeriesCrossValidator:
                 
                 # 不足分をランダム補完
                 while len(top_numbers) < 5:
-                    candidate = np.random.randint(1, 32)
+                    candidate = int(rng.integers(1, 32))
                     if candidate not in top_numbers:
                         top_numbers.append(candidate)
                 
@@ -263,69 +374,174 @@ class TimeSeriesCrossValidator:
             logger.error(f"検証用予測生成エラー: {e}")
             return []
     
-    def fixed_window_validation(self, data, main_cols, round_col, window_sizes=[10, 20, 30]):
-        """複数窓サイズによる固定窓検証（効率化版）"""
-        logger.info(f"=== 固定窓検証開始（窓サイズ: {window_sizes}回） ===")
+    def budget_exhausted(self, budget, point_seconds, label):
+        """残り時間が検証1点分の平均所要時間を下回ったら打ち切り（バックテストなど検証器を使う逐次評価からも呼ぶ）"""
+        if budget is None:
+            return False
+        
+        expected = float(np.mean(point_seconds)) if point_seconds else 0.0
+        if budget.remaining() > expected:
+            return False
+        
+        budget.stopped_early = True
+        budget.record_decision(
+            label, 'stop_validation',
+            completed_points=len(point_seconds),
+            expected_point_seconds=round(expected, 2)
+        )
+        return True
+    
+    def _fixed_window_points(self, total_rounds, window_size):
+        """
+        固定窓の検証点 (train_start, train_end, test_idx) を列挙（最大50点）
+        間隔は上限に収まる最小の2の累乗で先頭から数え、最新の1点を加える:
+        新しい回が追加されても既存の検証点（結果キー）は変わらず、再計算は最新の点だけ（間隔が変わるのは履歴が倍になった時）
+        """
+        span = total_rounds - window_size - 1
+        if span <= 0:
+            return []
+        
+        # 効率化：全回ではなく一定間隔でサンプリング
+        step = 1
+        while span > step * (MAX_FIXED_WINDOW_POINTS - 1):
+            step *= 2
         
-        total_rounds = len(data)
+        starts = list(range(0, span, step))
+        if starts[-1] != span - 1:
+            starts.append(span - 1)
+        return [(i, i + window_size, i + window_size) for i in starts]
+    
+    def _run_points_parallel(self, numbers, points, budget, label, on_outcome=None):
+        """検証点をプロセスプールで実行（結果は投入順・完了ごとに on_outcome を呼ぶ）"""
+        shm = shared_memory.SharedMemory(create=True, size=max(1, numbers.nbytes))
+        try:
+            shared = np.ndarray(numbers.shape, dtype=numbers.dtype, buffer=shm.buf)
+            shared[:] = numbers
+            
+            validator_config = {
+                'boosting_backend': self.boosting_backend,
+                'model_params': self.model_params,
+                'random_state': self.random_state,
+                'fidelity': self.fidelity
+            }
+            
+            executor = ProcessPoolExecutor(
+                max_workers=min(self.max_workers, len(points)),
+                initializer=_init_worker,
+                initargs=(shm.name, numbers.shape, numbers.dtype.str, validator_config)
+            )
+            futures = [
+                executor.submit(_evaluate_window_point, train_start, train_end, test_idx, self.random_state)
+                for train_start, train_end, test_idx in points
+            ]
+            
+            outcomes = []
+            completed = False
+            try:
+                for index, future in enumerate(futures):
+                    timeout = budget.remaining() if budget is not None else None
+                    outcomes.append(future.result(timeout=timeout))
+                    if on_outcome is not None:
+                        on_outcome(index, outcomes[-1])
+                completed = True
+            except FuturesTimeoutError:
+                # Python 3.10 では concurrent.futures.TimeoutError は組み込みの TimeoutError と別クラス
+                budget.stopped_early = True
+                budget.record_decision(label, 'stop_validation', completed_points=len(outcomes))
+            finally:
+                # 中断時（時間切れ・ソフトタイムアウト）は実行中の検証点を待たない
+                executor.shutdown(wait=completed, cancel_futures=True)
+            
+            return outcomes
+        finally:
+            shm.close()
+            shm.unlink()
+    
+    def _run_points_sequential(self, numbers, points, budget, label, on_outcome=None):
+        """検証点を逐次実行（並列と同じ乱数系列）"""
+        outcomes = []
+        point_seconds = []
+        
+        for index, (train_start, train_end, test_idx) in enumerate(points):
+            if self.budget_exhausted(budget, point_seconds, label):
+                break
+            
+            outcome = _evaluate_window_point(
+                train_start, train_end, test_idx, self.random_state,
+                numbers=numbers, validator=self
+            )
+            outcomes.append(outcome)
+            point_seconds.append(outcome[1])
+            if on_outcome is not None:
+                on_outcome(index, outcome)
+        
+        return outcomes
+    
+    def fixed_window_validation(self, data, main_cols, round_col, window_sizes=[10, 20, 30], budget=None,
+                                compute=True):
+        """
+        複数窓サイズによる固定窓検証（検証点をプロセス並列・時間予算対応）
+        compute: Falseなら保存済みの検証点だけを集計（中断時の部分結果用）
+        """
+        logger.info(f"=== 固定窓検証開始（窓サイズ: {window_sizes}回・忠実度: {self.fidelity}） ===")
+        
+        draws = self.as_draws(data, main_cols, round_col)
+        if draws is None:
+            logger.error("本数字カラムが不足しています")
+            return {}
+        
+        numbers = draws.numbers
+        rounds = draws.rounds
+        total_rounds = len(draws)
         results_by_window = {}
+        stopped = False
         
         for window_size in window_sizes:
-            logger.info(f"🔄 {window_size}回分窓での検証開始")
-            results = []
+            if stopped:
+                break
             
-            # 効率化：全回ではなく一定間隔でサンプリング
-            max_tests = min(total_rounds - window_size - 1, 50)  # 最大50回のテストに制限
-            step = max(1, (total_rounds - window_size - 1) // max_tests)
+            points = self._fixed_window_points(total_rounds, window_size)
+            label = f'fixed_window_{window_size}'
+            logger.info(f"🔄 {window_size}回分窓での検証開始: {len(points)}点（並列数: {self.max_workers}）")
             
-            logger.info(f"検証範囲: {max_tests}回（step={step}）")
+            # 保存済みの検証点は再計算しない
+            config_hash = self.config_hash(f'fixed_{window_size}')
+            keys = [self._store_key(numbers, start, test_idx, rounds, config_hash)
+                    for start, _, test_idx in points]
+            stored = [self._load_stored_result(key) for key in keys]
+            pending = [i for i, result in enumerate(stored) if result is None]
+            pending_points = [points[i] for i in pending]
+            if len(pending) < len(points):
+                logger.info(f"  保存済み結果を再利用: {len(points) - len(pending)}点 / 計算: {len(pending)}点")
             
-            for i in range(0, total_rounds - window_size - 1, step):
-                if len(results) >= max_tests:
-                    break
-                    
-                # 訓練データ: i〜i+window_size-1
-                train_start = i
-                train_end = i + window_size
-                test_idx = train_end
-                
-                if test_idx >= total_rounds:
-                    break
-                
-                # 訓練データ取得
-                train_data = data.iloc[train_start:train_end]
-                test_round = data.iloc[test_idx][round_col]
-                actual_numbers = []
-                for col in main_cols:
-                    if col in data.columns:
-                        actual_numbers.append(int(data.iloc[test_idx][col]))
-                
-                if len(actual_numbers) == 7:
-                    # フルモデル学習
-                    model_data = self.train_validation_models(train_data, main_cols)
-                    
-                    if model_data and model_data['models']:
-                        # 本番と同じ20セット予測生成
-                        predicted_sets = self.generate_validation_predictions(
-                            model_data, 
-                            model_data['freq_counter'], 
-                            20
-                        )
-                        
-                        if predicted_sets:
-                            # 詳細評価
-                            eval_result = self.evaluate_prediction_sets(predicted_sets, actual_numbers)
-                            eval_result['train_range'] = f"第{train_start + 1}回〜第{train_end}回"
-                            eval_result['test_round'] = test_round
-                            eval_result['window_size'] = window_size
-                            
-                            results.append(eval_result)
-                
-                # 進捗表示
-                if (len(results) + 1) % 10 == 0:
-                    if results:
-                        avg_matches = np.mean([r['avg_matches'] for r in results])
-                        logger.info(f"  進捗: {len(results)}/{max_tests}件 | 平均一致: {avg_matches:.2f}")
+            # 完了した検証点は即座に保存（途中で強制終了されても再実行時に再利用）
+            def on_outcome(index, outcome):
+                eval_result = outcome[0]
+                stored[pending[index]] = eval_result
+                self._save_result(keys[pending[index]], eval_result)
+            
+            outcomes = []
+            if pending_points and compute:
+                if self.max_workers > 1 and len(pending_points) > 1:
+                    try:
+                        outcomes = self._run_points_parallel(numbers, pending_points, budget, label, on_outcome)
+                    except (OSError, RuntimeError) as e:
+                        logger.warning(f"プロセス並列を使用できないため逐次実行します: {e}")
+                        outcomes = self._run_points_sequential(numbers, pending_points, budget, label, on_outcome)
+                else:
+                    outcomes = self._run_points_sequential(numbers, pending_points, budget, label, on_outcome)
+            
+            if compute and len(outcomes) < len(pending_points):
+                stopped = True
+            
+            results = []
+            for (train_start, train_end, test_idx), eval_result in zip(points, stored):
+                if eval_result is None:
+                    continue
+                eval_result['train_range'] = f"第{train_start + 1}回〜第{train_end}回"
+                eval_result['test_round'] = int(rounds[test_idx])
+                eval_result['window_size'] = window_size
+                results.append(eval_result)
             
             results_by_window[window_size] = results
             
@@ -333,69 +549,117 @@ class TimeSeriesCrossValidator:
             if results:
                 avg_matches = np.mean([r['avg_matches'] for r in results])
                 max_matches = max([r['max_matches'] for r in results])
-                sets_4_plus = np.mean([r['sets_4_plus'] for r in results])
                 logger.info(f"📊 {window_size}回分窓 結果:")
                 logger.info(f"    検証回数: {len(results)}回 | 平均一致: {avg_matches:.3f}個 | 最高一致: {max_matches}個")
         
         self.fixed_window_results = results_by_window
         return results_by_window
     
-    def expanding_window_validation(self, data, main_cols, round_col, initial_size=30):
-        """累積窓による時系列交差検証（効率化版）"""
-        logger.info(f"=== 累積窓検証開始（初期サイズ: {initial_size}回） ===")
+    def expanding_window_validation(self, data, main_cols, round_col, initial_size=30, budget=None,
+                                    warm_start=True, compute=True):
+        """
+        累積窓による時系列交差検証（効率化版・時間予算対応）
+        warm_start: 検証点をまたいでモデルを引き継ぎ、追加分のみ学習（Falseで毎回フル学習）
+        compute: Falseなら保存済みの検証点だけを集計（中断時の部分結果用）
+        """
+        logger.info(f"=== 累積窓検証開始（初期サイズ: {initial_size}回・{'逐次学習' if warm_start else 'フル再学習'}・忠実度: {self.fidelity}） ===")
+        
+        draws = self.as_draws(data, main_cols, round_col)
+        if draws is None:
+            logger.error("本数字カラムが不足しています")
+            return []
         
         results = []
-        total_rounds = len(data)
+        numbers = draws.numbers
+        rounds = draws.rounds
+        total_rounds = len(draws)
         
         # 効率化：全回ではなく一定間隔でサンプリング
         max_tests = min(total_rounds - initial_size, 30)  # 最大30回のテストに制限
+        if max_tests <= 0:
+            self.expanding_window_results = results
+            return results
         step = max(1, (total_rounds - initial_size) // max_tests)
+        test_indices = list(range(initial_size, total_rounds, step))[:max_tests]
         
         logger.info(f"検証範囲: {max_tests}回（step={step}）")
         
-        for i in range(0, total_rounds - initial_size, step):
-            if len(results) >= max_tests:
+        # 特徴量は行ごとに独立なので全体で1回だけ計算して各検証点で切り出す
+        features = compute_draw_features(numbers)
+        valid = valid_draw_mask(numbers)
+        ensemble = IncrementalEnsemble(self.validation_models, len(test_indices)) if warm_start else None
+        point_seconds = []
+        
+        # 保存済み結果の照会（逐次学習ではそれまでの検証点の並びも結果に影響するためキーに含める）
+        keys = []
+        for k, test_idx in enumerate(test_indices):
+            if warm_start:
+                path = hashlib.sha1(str(test_indices[:k + 1]).encode('utf-8')).hexdigest()[:12]
+                mode = f'expanding_warm:{len(test_indices)}:{path}'
+            else:
+                mode = 'expanding_full'
+            keys.append(self._store_key(numbers, 0, test_idx, rounds, self.config_hash(mode)))
+        stored = [self._load_stored_result(key) if valid[test_idx] else None
+                  for key, test_idx in zip(keys, test_indices)]
+        
+        # 最後の未計算点まで学習すればよい（逐次学習は途中の保存済み点も状態更新のみ行う）
+        missing = [k for k, test_idx in enumerate(test_indices) if valid[test_idx] and stored[k] is None]
+        last_missing = missing[-1] if missing and compute else -1
+        if len(missing) < len(test_indices):
+            logger.info(f"  保存済み結果を再利用: {len(test_indices) - len(missing)}点 / 計算: {len(missing)}点")
+        
+        for k, test_idx in enumerate(test_indices):
+            if k > last_missing:
                 break
-                
-            test_idx = initial_size + i
             
-            if test_idx >= total_rounds:
+            if self.budget_exhausted(budget, point_seconds, 'expanding_window'):
                 break
             
+            point_start = time.monotonic()
+            
             # 訓練データ: 0〜test_idx-1（累積）
-            train_data = data.iloc[0:test_idx]
-            test_round = data.iloc[test_idx][round_col]
-            actual_numbers = []
-            for col in main_cols:
-                if col in data.columns:
-                    actual_numbers.append(int(data.iloc[test_idx][col]))
-            
-            if len(actual_numbers) == 7:
-                # フルモデル学習
-                model_data = self.train_validation_models(train_data, main_cols)
+            if valid[test_idx] and (stored[k] is None or warm_start):
+                if ensemble is not None:
+                    X, y, _ = build_next_draw_dataset(numbers[:test_idx], features[:test_idx])
+                    model_data = None
+                    if len(X) >= MIN_TRAIN_SAMPLES:
+                        ensemble.update(X, y)
+                        train_valid = numbers[:test_idx][valid[:test_idx]]
+                        model_data = ensemble.model_data(Counter(train_valid.reshape(-1).tolist()))
+                else:
+                    model_data = self.train_models_on_numbers(numbers[:test_idx])
                 
-                if model_data and model_data['models']:
+                if stored[k] is None and model_data and model_data['models']:
                     # 本番と同じ20セット予測生成
+                    rng = np.random.default_rng([self.random_state, 0, test_idx])
                     predicted_sets = self.generate_validation_predictions(
                         model_data, 
                         model_data['freq_counter'], 
-                        20
+                        20,
+                        rng=rng
                     )
                     
                     if predicted_sets:
                         # 詳細評価
-                        eval_result = self.evaluate_prediction_sets(predicted_sets, actual_numbers)
-                        eval_result['train_range'] = f"第1回〜第{test_idx}回"
-                        eval_result['test_round'] = test_round
-                        eval_result['train_size'] = len(train_data)
-                        
-                        results.append(eval_result)
+                        stored[k] = self.evaluate_prediction_sets(predicted_sets, numbers[test_idx])
+                        self._save_result(keys[k], stored[k])
+                
+                point_seconds.append(time.monotonic() - point_start)
             
             # 進捗表示
-            if (len(results) + 1) % 10 == 0:
-                if results:
-                    avg_matches = np.mean([r['avg_matches'] for r in results])
-                    logger.info(f"  進捗: {len(results)}/{max_tests}件 | 平均一致: {avg_matches:.2f}")
+            if (k + 1) % 10 == 0:
+                done = [r for r in stored[:k + 1] if r is not None]
+                if done:
+                    avg_matches = np.mean([r['avg_matches'] for r in done])
+                    logger.info(f"  進捗: {len(done)}/{max_tests}件 | 平均一致: {avg_matches:.2f}")
+        
+        for test_idx, eval_result in zip(test_indices, stored):
+            if eval_result is None:
+                continue
+            eval_result['train_range'] = f"第1回〜第{test_idx}回"
+            eval_result['test_round'] = int(rounds[test_idx])
+            eval_result['train_size'] = test_idx
+            results.append(eval_result)
         
         self.expanding_window_results = results
         
@@ -403,12 +667,161 @@ class TimeSeriesCrossValidator:
         if results:
             avg_matches = np.mean([r['avg_matches'] for r in results])
             max_matches = max([r['max_matches'] for r in results])
-            sets_4_plus = np.mean([r['sets_4_plus'] for r in results])
             logger.info(f"📊 累積窓 結果:")
             logger.info(f"    検証回数: {len(results)}回 | 平均一致: {avg_matches:.3f}個 | 最高一致: {max_matches}個")
+            logger.info(f"    学習時間合計: {sum(point_seconds):.1f}秒"
+                        + (f" | 再学習: {len(ensemble.refits)}回" if ensemble is not None else ""))
         
         return results
     
+    def fixed_point_specs(self, data, main_cols, round_col, window_sizes=[10, 20, 30]):
+        """
+        固定窓の検証点を独立した作業単位に分解（分散実行用）
+        各単位は学習区間＋テスト抽選の番号だけを持つため、どのワーカーでも単独で評価できる
+        """
+        draws = self.as_draws(data, main_cols, round_col)
+        if draws is None:
+            return []
+        numbers = draws.numbers
+        rounds = draws.rounds
+        
+        specs = []
+        for window_size in window_sizes:
+            if (window_size - 1) * PICK_COUNT < MIN_TRAIN_SAMPLES:
+                logger.info(f"  {window_size}回分窓は学習サンプル不足のため分散対象外")
+                continue
+            for train_start, train_end, test_idx in self._fixed_window_points(len(numbers), window_size):
+                specs.append({
+                    'window_size': window_size,
+                    'train_start': train_start,
+                    'test_idx': test_idx,
+                    'test_round': int(rounds[test_idx]),
+                    'numbers': numbers[train_start:test_idx + 1].tolist()
+                })
+        return specs
+    
+    def evaluate_fixed_point(self, spec):
+        """分解された固定窓の1検証点を評価（結果ストアがあれば再利用・保存）"""
+        window = np.asarray(spec['numbers'], dtype=np.int16)
+        window_size = spec['window_size']
+        train_start = spec['train_start']
+        rounds = np.full(len(window), spec['test_round'])
+        
+        key = self._store_key(window, 0, window_size, rounds, self.config_hash(f'fixed_{window_size}'))
+        eval_result = self._load_stored_result(key)
+        
+        if eval_result is None:
+            eval_result, _ = _evaluate_window_point(
+                0, window_size, window_size, self.random_state,
+                numbers=window, validator=self, rng_key=(train_start, spec['test_idx'])
+            )
+            self._save_result(key, eval_result)
+        
+        if eval_result is not None:
+            eval_result['train_range'] = f"第{train_start + 1}回〜第{train_start + window_size}回"
+            eval_result['test_round'] = spec['test_round']
+            eval_result['window_size'] = window_size
+        return eval_result
+    
+    def collect_results(self, fixed_results, expanding_results, window_sizes=[10, 20, 30]):
+        """分散実行された検証点の結果を集約して比較（run_validation と同じ形式）"""
+        self.fixed_window_results = {size: [] for size in window_sizes}
+        for result in fixed_results:
+            if result is not None:
+                self.fixed_window_results.setdefault(result['window_size'], []).append(result)
+        self.expanding_window_results = [r for r in expanding_results if r is not None]
+        
+        return self._run_summary(True)
+    
+    def _run_summary(self, completed, result_store=None):
+        """検証一式の結果サマリー"""
+        return {
+            'completed': completed,
+            'fidelity': self.fidelity,
+            'fixed_window_tests': {size: len(results) for size, results in self.fixed_window_results.items()},
+            'expanding_window_tests': len(self.expanding_window_results),
+            'comparison': self.compare_validation_methods(),
+            'summary': self.get_validation_summary(),
+            'store': result_store.stats() if result_store is not None and hasattr(result_store, 'stats') else None
+        }
+    
+    def run_signature(self, data, main_cols, round_col, window_sizes, initial_size):
+        """検証実行1回分の識別子（データ内容・設定・シード・窓構成）"""
+        draws = self.as_draws(data, main_cols, round_col)
+        data_hash = draws.content_hash() if draws is not None else 'none'
+        return f"{data_hash}:{self.config_hash('run')}:{self.random_state}:{list(window_sizes)}:{initial_size}"
+    
+    def run_validation(self, data, main_cols, round_col, window_sizes=[10, 20, 30], initial_size=30,
+                       budget=None, result_store=None, compute=True):
+        """
+        固定窓（複数サイズ）と累積窓の検証一式を実行して比較
+        result_store: 一時的に使う結果ストア（チェックポイント付きストアなど）
+        compute: Falseなら保存済みの検証点だけで集計（中断時の部分結果）
+        """
+        base_store = self.result_store
+        if result_store is not None:
+            self.result_store = result_store
+        
+        # DataFrameからの変換は1回だけ（以降は配列のビューで窓を切り出す）
+        draws = self.as_draws(data, main_cols, round_col)
+        
+        try:
+            self.fixed_window_results = {}
+            self.expanding_window_results = []
+            
+            self.fixed_window_validation(
+                draws, main_cols, round_col, window_sizes, budget=budget, compute=compute
+            )
+            if not (budget is not None and budget.stopped_early):
+                self.expanding_window_validation(
+                    draws, main_cols, round_col, initial_size=initial_size, budget=budget, compute=compute
+                )
+        finally:
+            self.result_store = base_store
+        
+        completed = compute and not (budget is not None and budget.stopped_early)
+        return self._run_summary(completed, result_store)
+    
+    def point_statistics(self, results):
+        """
+        検証点ごとの一致数配列を連結して統計をまとめて計算
+        戻り値: 検証点別の平均一致数・4個以上/5個以上一致セット数の配列と全体の最大一致数
+        """
+        counts = [np.asarray(r['match_counts']) for r in results]
+        lengths = np.array([len(c) for c in counts])
+        offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        flat = np.concatenate(counts).astype(np.int64)
+        
+        return {
+            'avg_matches': np.add.reduceat(flat, offsets) / lengths,
+            'sets_4_plus': np.add.reduceat(flat >= 4, offsets),
+            'sets_5_plus': np.add.reduceat(flat >= 5, offsets),
+            'max_matches': int(flat.max()),
+            'histogram': match_histogram(flat)
+        }
+    
+    def _method_stats(self, results):
+        """1手法分の比較用統計"""
+        point_stats = self.point_statistics(results)
+        return {
+            'avg_matches': float(point_stats['avg_matches'].mean()),
+            'std_matches': float(point_stats['avg_matches'].std()),
+            'max_matches': point_stats['max_matches'],
+            'avg_sets_4_plus': float(point_stats['sets_4_plus'].mean()),
+            'avg_sets_5_plus': float(point_stats['sets_5_plus'].mean()),
+            'match_histogram': point_stats['histogram'].tolist(),
+            'total_tests': len(results),
+            'random_baseline': self.compare_with_random(results)
+        }
+    
+    def compare_with_random(self, results):
+        """検証点と同じ抽選・同じセット数のランダム購入と比較（p値・信頼区間）"""
+        counts = [np.asarray(r['match_counts']) for r in results]
+        if not counts or len({len(c) for c in counts}) != 1:
+            return None
+        actual_masks = to_bitmasks(np.stack([np.asarray(r['actual']) for r in results]))
+        return self.random_baseline.compare(np.stack(counts), actual_masks)
+    
     def compare_validation_methods(self):
         """固定窓（複数サイズ）と累積窓の結果を比較"""
         logger.info("=== 検証手法の詳細比較分析 ===")
@@ -422,39 +835,14 @@ class TimeSeriesCrossValidator:
         # 固定窓（各サイズ）の統計
         for window_size, results in self.fixed_window_results.items():
             if results:
-                avg_matches_list = [r['avg_matches'] for r in results]
-                max_matches_list = [r['max_matches'] for r in results]
-                sets_4_plus_list = [r['sets_4_plus'] for r in results]
-                sets_5_plus_list = [r['sets_5_plus'] for r in results]
-                
-                stats = {
-                    'method': f'固定窓（{window_size}回）',
-                    'window_size': window_size,
-                    'avg_matches': np.mean(avg_matches_list),
-                    'std_matches': np.std(avg_matches_list),
-                    'max_matches': max(max_matches_list),
-                    'avg_sets_4_plus': np.mean(sets_4_plus_list),
-                    'avg_sets_5_plus': np.mean(sets_5_plus_list),
-                    'total_tests': len(results)
-                }
+                stats = {'method': f'固定窓（{window_size}回）', 'window_size': window_size}
+                stats.update(self._method_stats(results))
                 comparison_results[f'fixed_{window_size}'] = stats
         
         # 累積窓の統計
         if self.expanding_window_results:
-            avg_matches_list = [r['avg_matches'] for r in self.expanding_window_results]
-            max_matches_list = [r['max_matches'] for r in self.expanding_window_results]
-            sets_4_plus_list = [r['sets_4_plus'] for r in self.expanding_window_results]
-            sets_5_plus_list = [r['sets_5_plus'] for r in self.expanding_window_results]
-            
-            expanding_stats = {
-                'method': '累積窓',
-                'avg_matches': np.mean(avg_matches_list),
-                'std_matches': np.std(avg_matches_list),
-                'max_matches': max(max_matches_list),
-                'avg_sets_4_plus': np.mean(sets_4_plus_list),
-                'avg_sets_5_plus': np.mean(sets_5_plus_list),
-                'total_tests': len(self.expanding_window_results)
-            }
+            expanding_stats = {'method': '累積窓'}
+            expanding_stats.update(self._method_stats(self.expanding_window_results))
             comparison_results['expanding'] = expanding_stats
         
         # 最適手法の決定
@@ -494,23 +882,21 @@ class TimeSeriesCrossValidator:
             'total_validations': sum(len(results) for results in self.fixed_window_results.values()) + len(self.expanding_window_results)
         }
         
-        if self.fixed_window_results:
-            all_fixed_results = []
-            for results in self.fixed_window_results.values():
-                all_fixed_results.extend(results)
-            
-            if all_fixed_results:
-                summary['fixed_window_performance'] = {
-                    'avg_matches': np.mean([r['avg_matches'] for r in all_fixed_results]),
-                    'max_matches': max([r['max_matches'] for r in all_fixed_results]),
-                    'avg_sets_4_plus': np.mean([r['sets_4_plus'] for r in all_fixed_results])
-                }
+        all_fixed_results = [r for results in self.fixed_window_results.values() for r in results]
+        if all_fixed_results:
+            summary['fixed_window_performance'] = self._performance_summary(all_fixed_results)
         
         if self.expanding_window_results:
-            summary['expanding_window_performance'] = {
-                'avg_matches': np.mean([r['avg_matches'] for r in self.expanding_window_results]),
-                'max_matches': max([r['max_matches'] for r in self.expanding_window_results]),
-                'avg_sets_4_plus': np.mean([r['sets_4_plus'] for r in self.expanding_window_results])
-            }
+            summary['expanding_window_performance'] = self._performance_summary(self.expanding_window_results)
         
-        return summary
\ No newline at end of file
+        return summary
+    
+    def _performance_summary(self, results):
+        """サマリー用の平均一致数・最大一致数・4個以上一致セット数"""
+        point_stats = self.point_statistics(results)
+        return {
+            'avg_matches': float(point_stats['avg_matches'].mean()),
+            'max_matches': point_stats['max_matches'],
+            'avg_sets_4_plus': float(point_stats['sets_4_plus'].mean()),
+            'random_baseline': self.compare_with_random(results)
+        }
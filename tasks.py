@@ -5,9 +5,11 @@ Celeryタスク定義 - 修正版（インポートエラー対策）
 
 import traceback
 import logging
+import json
 import sys
 import os
-from celery import current_task
+from celery import current_task, chain, chord, group
+from celery.exceptions import Ignore, Retry, SoftTimeLimitExceeded
 
 # セーフインポート処理
 try:
@@ -29,10 +31,50 @@ except ImportError as e:
     print(f"❌ AutoFetchEnsembleMiniLoto インポートエラー: {e}")
     AutoFetchEnsembleMiniLoto = None
 
+try:
+    from models.hyperparameter_search import SuccessiveHalvingSearch
+except ImportError as e:
+    print(f"❌ SuccessiveHalvingSearch インポートエラー: {e}")
+    SuccessiveHalvingSearch = None
+
+try:
+    from models.training_budget import TrainingBudget
+except ImportError as e:
+    print(f"❌ TrainingBudget インポートエラー: {e}")
+    TrainingBudget = None
+
+try:
+    from utils.validation_store import CheckpointedResultStore
+except ImportError as e:
+    print(f"❌ CheckpointedResultStore インポートエラー: {e}")
+    CheckpointedResultStore = None
+
+try:
+    from models.backtest import WalkForwardBacktest, probabilities_path_for
+except ImportError as e:
+    print(f"❌ WalkForwardBacktest インポートエラー: {e}")
+    WalkForwardBacktest = None
+
+try:
+    from models.ensemble_sweep import EnsembleKnobSweep
+except ImportError as e:
+    print(f"❌ EnsembleKnobSweep インポートエラー: {e}")
+    EnsembleKnobSweep = None
+
+try:
+    from models.validation import TimeSeriesCrossValidator
+except ImportError as e:
+    print(f"❌ TimeSeriesCrossValidator インポートエラー: {e}")
+    TimeSeriesCrossValidator = None
+
 # ログ設定
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 抽選後の更新: 新しい回が取得元に載るまでの再試行間隔（秒）と回数（30分×48回 = 翌日同時刻まで）
+POST_DRAW_RETRY_SECONDS = 1800
+POST_DRAW_MAX_RETRIES = 48
+
 def update_task_progress(current, total, status_message):
     """タスクの進捗を更新"""
     try:
@@ -50,6 +92,58 @@ def update_task_progress(current, total, status_message):
     except Exception as e:
         logger.warning(f"⚠️ 進捗更新エラー: {e}")
 
+def create_training_budget():
+    """Celeryのソフトタイムアウトに収まる学習予算を作成"""
+    if TrainingBudget is None:
+        return None
+    soft_time_limit = celery_app.conf.task_soft_time_limit or 300
+    return TrainingBudget.from_time_limit(soft_time_limit)
+
+# ワーカープロセス内で使い回す予測システム（currentポインタ変更時のみ再読み込み）
+_prediction_system_cache = None
+
+def get_prediction_system():
+    """プロセス内キャッシュの予測システムを取得し、公開中のモデルバージョンへ追従"""
+    global _prediction_system_cache
+    
+    if _prediction_system_cache is None:
+        file_manager = FileManager()
+        prediction_system = AutoFetchEnsembleMiniLoto()
+        prediction_system.set_file_manager(file_manager)
+        _prediction_system_cache = prediction_system
+    
+    # 学習タスクが新バージョンを公開・ロールバックしていれば次のリクエストで切り替え
+    prediction_system = _prediction_system_cache
+    if not prediction_system.refresh_models() and prediction_system.model_version is None \
+            and not prediction_system.trained_models and prediction_system.file_manager.model_exists():
+        # レジストリにcurrentがない（旧形式の単一ファイルのみの）環境では従来どおり読み込む
+        prediction_system.load_models()
+    return prediction_system
+
+# 分散検証のサブタスクで使い回す検証器（設定ごと）
+_point_validator_cache = {}
+
+def get_point_validator(config):
+    """サブタスク用の検証器（オーケストレーターと同じバックエンド・パラメータ・シード）"""
+    cache_key = json.dumps(config, sort_keys=True)
+    if cache_key not in _point_validator_cache:
+        _point_validator_cache.clear()
+        _point_validator_cache[cache_key] = TimeSeriesCrossValidator(
+            max_workers=1,
+            result_store=FileManager().validation_store,
+            **config
+        )
+    return _point_validator_cache[cache_key]
+
+def json_safe(value):
+    """NumPy型を含む結果をCeleryのJSONシリアライザで送れる形に変換"""
+    def default(obj):
+        # ndarray・NumPyスカラーとも tolist でPythonの値になる
+        if hasattr(obj, 'tolist'):
+            return obj.tolist()
+        return str(obj)
+    return json.loads(json.dumps(value, default=default))
+
 def safe_module_check():
     """必要なモジュールが利用可能かチェック"""
     missing_modules = []
@@ -151,6 +245,7 @@ def heavy_init_task(self):
             'models_loaded': models_loaded,
             'data_loaded': data_loaded,
             'latest_round': getattr(prediction_system.data_fetcher, 'latest_round', 'N/A'),
+            'data_freshness': prediction_system.data_fetcher.fetch_freshness(),
             'game_type': 'miniloto',
             'timestamp': str(update_task_progress.__code__.co_filename)  # デバッグ用
         }
@@ -183,11 +278,9 @@ def predict_task(self, round_number=None):
                 'error_type': 'import_error'
             }
         
-        # システム初期化
+        # システム初期化（モデルはバージョンが変わった時だけ読み込み直す）
         try:
-            file_manager = FileManager()
-            prediction_system = AutoFetchEnsembleMiniLoto()
-            prediction_system.set_file_manager(file_manager)
+            prediction_system = get_prediction_system()
             update_task_progress(1, 4, "システム初期化完了")
         except Exception as e:
             return {
@@ -196,9 +289,8 @@ def predict_task(self, round_number=None):
                 'error_type': 'initialization_error'
             }
         
-        # モデル・履歴読み込み
+        # 履歴読み込み
         try:
-            prediction_system.load_models()
             prediction_system.history.load_from_csv()
             update_task_progress(2, 4, "モデル・履歴読み込み完了")
         except Exception as e:
@@ -230,6 +322,8 @@ def predict_task(self, round_number=None):
                 'message': 'ミニロト予測生成が完了しました',
                 'predictions': predictions,
                 'next_info': next_info,
+                'model_version': prediction_system.model_version,
+                'data_freshness': prediction_system.data_fetcher.fetch_freshness(),
                 'game_type': 'miniloto'
             }
             
@@ -254,15 +348,15 @@ def predict_task(self, round_number=None):
 
 @celery_app.task(bind=True, name='tasks.train_model_task')
 def train_model_task(self, options=None):
-    """ミニロトモデル学習タスク（簡易版）"""
+    """ミニロトモデル学習タスク（モデル別進捗・チェックポイント再開対応）"""
     try:
         logger.info("🤖 ミニロト学習タスク開始")
         
         if options is None:
             options = {}
+        force_full_train = bool(options.get('force_full_train', False))
         
-        # 学習は重い処理のため、現在は簡易実装
-        update_task_progress(0, 2, "学習準備中...")
+        update_task_progress(0, 1, "学習準備中...")
         
         # モジュールチェック
         modules_ok, modules_msg = safe_module_check()
@@ -273,20 +367,62 @@ def train_model_task(self, options=None):
                 'error_type': 'import_error'
             }
         
-        update_task_progress(1, 2, "学習完了（簡易版）")
+        # システム初期化
+        try:
+            file_manager = FileManager()
+            prediction_system = AutoFetchEnsembleMiniLoto()
+            prediction_system.set_file_manager(file_manager)
+            prediction_system.history.load_from_csv()
+        except Exception as e:
+            return {
+                'status': 'error',
+                'message': f'システム初期化エラー: {str(e)}',
+                'error_type': 'initialization_error'
+            }
+        
+        # 進捗: 準備(1) + モデル数 + 完了(1)
+        total_steps = len(prediction_system.models) + 2
+        update_task_progress(1, total_steps, "ミニロト学習システム初期化完了")
+        
+        def on_model_progress(completed, total_models, name, state):
+            update_task_progress(1 + completed, total_steps, f"{name}: {state} ({completed}/{total_models}モデル)")
+        
+        # 学習実行（完了モデルはチェックポイント保存、再起動時は残りのみ学習）
+        budget = create_training_budget()
+        success = prediction_system.auto_setup_and_train(
+            force_full_train=force_full_train,
+            budget=budget,
+            progress_callback=on_model_progress
+        )
+        
+        if not success:
+            return {
+                'status': 'error',
+                'message': 'ミニロト学習に失敗しました',
+                'error_type': 'training_error',
+                'budget': budget.report() if budget else None
+            }
+        
+        update_task_progress(total_steps, total_steps, "学習タスク完了")
         
-        # 簡易結果
         result = {
             'status': 'success',
-            'message': 'ミニロト学習が完了しました（簡易版）',
+            'message': 'ミニロト学習が完了しました',
             'training': {
                 'success': True,
-                'model_count': 3,  # ダミー
+                'model_count': len(prediction_system.trained_models),
+                'models': list(prediction_system.trained_models.keys()),
+                'model_scores': {name: float(score) for name, score in prediction_system.model_scores.items()},
+                'resumed_models': prediction_system.resumed_models,
+                'data_count': prediction_system.data_count,
+                'latest_round': prediction_system.data_fetcher.latest_round,
+                'model_version': prediction_system.model_version,
                 'game_type': 'miniloto'
-            }
+            },
+            'data_freshness': prediction_system.data_fetcher.fetch_freshness(),
+            'budget': budget.report() if budget else None
         }
         
-        update_task_progress(2, 2, "学習タスク完了")
         logger.info("🎉 ミニロト学習タスク完了")
         return result
         
@@ -299,12 +435,90 @@ def train_model_task(self, options=None):
             'error_type': 'unexpected_error'
         }
 
+@celery_app.task(bind=True, name='tasks.hyperparameter_search_task')
+def hyperparameter_search_task(self, options=None):
+    """ハイパーパラメータ探索タスク（時間切れ時は結果テーブルから次回再開）"""
+    try:
+        logger.info("🔍 ハイパーパラメータ探索タスク開始")
+        
+        if options is None:
+            options = {}
+        
+        update_task_progress(0, 3, "探索準備中...")
+        
+        modules_ok, modules_msg = safe_module_check()
+        if not modules_ok or SuccessiveHalvingSearch is None:
+            return {
+                'status': 'error',
+                'message': modules_msg if not modules_ok else 'SuccessiveHalvingSearch が利用できません',
+                'error_type': 'import_error'
+            }
+        
+        file_manager = FileManager()
+        prediction_system = AutoFetchEnsembleMiniLoto()
+        prediction_system.set_file_manager(file_manager)
+        
+        if not prediction_system.data_fetcher.fetch_latest_data():
+            return {
+                'status': 'error',
+                'message': 'ミニロトデータ取得に失敗しました',
+                'error_type': 'data_fetch_error'
+            }
+        
+        update_task_progress(1, 3, "候補設定を評価中...")
+        
+        search = SuccessiveHalvingSearch(
+            max_candidates=options.get('max_candidates'),
+            max_workers=options.get('max_workers'),
+            results_path=file_manager.get_file_path('hyperparameter_search.csv'),
+            boosting_backend=prediction_system.boosting_backend
+        )
+        budget = create_training_budget()
+        summary = search.run(
+            prediction_system.data_fetcher.latest_data,
+            prediction_system.data_fetcher.main_columns,
+            budget=budget
+        )
+        
+        # 全ラウンド完了時のみ本番・検証へ公開
+        published = False
+        if summary['completed'] and options.get('publish', True):
+            update_task_progress(2, 3, "最良設定を公開中...")
+            published = search.publish(file_manager, prediction_system)
+        
+        update_task_progress(3, 3, "探索タスク完了")
+        
+        return {
+            'status': 'success',
+            'message': 'ハイパーパラメータ探索が完了しました' if summary['completed']
+                       else 'ハイパーパラメータ探索を中断しました（再実行で続きから再開）',
+            'search': summary,
+            'published': published,
+            'data_freshness': prediction_system.data_fetcher.fetch_freshness(),
+            'budget': budget.report() if budget else None
+        }
+        
+    except Exception as e:
+        logger.error(f"❌ ハイパーパラメータ探索タスクエラー: {e}")
+        return {
+            'status': 'error',
+            'message': str(e),
+            'traceback': traceback.format_exc(),
+            'error_type': 'unexpected_error'
+        }
+
 @celery_app.task(bind=True, name='tasks.validation_task')
-def validation_task(self):
-    """時系列検証タスク（簡易版）"""
+def validation_task(self, options=None):
+    """時系列検証タスク（検証点ごとにチェックポイント・再実行時は続きから・ソフトタイムアウト時は部分結果）"""
     try:
         logger.info("📊 検証タスク開始")
-        update_task_progress(0, 2, "検証準備中...")
+        
+        if options is None:
+            options = {}
+        window_sizes = options.get('window_sizes', [10, 20, 30])
+        initial_size = int(options.get('initial_size', 30))
+        
+        update_task_progress(0, 3, "検証準備中...")
         
         # モジュールチェック
         modules_ok, modules_msg = safe_module_check()
@@ -315,21 +529,118 @@ def validation_task(self):
                 'error_type': 'import_error'
             }
         
-        update_task_progress(1, 2, "検証完了（簡易版）")
+        # システム初期化・データ取得
+        try:
+            file_manager = FileManager()
+            prediction_system = AutoFetchEnsembleMiniLoto()
+            prediction_system.set_file_manager(file_manager)
+            if not prediction_system.data_fetcher.fetch_latest_data():
+                raise Exception("ミニロトデータ取得に失敗しました")
+        except Exception as e:
+            return {
+                'status': 'error',
+                'message': f'システム初期化エラー: {str(e)}',
+                'error_type': 'initialization_error'
+            }
+        
+        # 取り込み時に作成済みの読み取り専用配列を共有（DataFrameからの再変換なし）
+        data = prediction_system.data_fetcher.get_draws()
+        main_cols = prediction_system.data_fetcher.main_columns
+        round_col = prediction_system.data_fetcher.round_column
+        validator = prediction_system.get_validator(options.get('fidelity'))
+        
+        # 既定は検証点ごとのサブタスクに分解して validation キューへ（ワーカー追加で並列度が上がる）
+        if options.get('mode', 'chord') == 'chord':
+            config = {
+                'boosting_backend': validator.boosting_backend,
+                'model_params': validator.model_params,
+                'random_state': validator.random_state,
+                'fidelity': validator.fidelity
+            }
+            specs = validator.fixed_point_specs(data, main_cols, round_col, window_sizes)
+            draws = validator.as_draws(data, main_cols, round_col)
+            expanding_payload = {
+                'numbers': draws.numbers.tolist(),
+                'rounds': draws.rounds.tolist(),
+                'main_cols': main_cols,
+                'round_col': round_col,
+                'initial_size': initial_size
+            }
+            meta = {
+                'config': config,
+                'window_sizes': window_sizes,
+                'point_count': len(specs),
+                'data_freshness': prediction_system.data_fetcher.fetch_freshness()
+            }
+            
+            header = [validation_point_task.s(spec, config) for spec in specs]
+            header.append(validation_expanding_task.s(expanding_payload, config))
+            
+            logger.info(f"🔀 検証を分散実行: 固定窓{len(specs)}点 + 累積窓1タスク")
+            update_task_progress(1, 3, f"検証サブタスクを投入しました（{len(header)}件）")
+            
+            # このタスクをコード（chord）で置き換え、結果は集約タスクの戻り値になる
+            return self.replace(chord(group(header), validation_reduce_task.s(meta)))
+        
+        # 同じデータ・設定での再実行（ワーカー再起動後の再配送を含む）は完了済みの検証点から再開
+        signature = validator.run_signature(data, main_cols, round_col, window_sizes, initial_size)
+        checkpoint = file_manager.get_validation_checkpoint(signature)
+        result_store = CheckpointedResultStore(checkpoint, file_manager.validation_store)
+        resumed_points = len(checkpoint.records)
+        
+        update_task_progress(1, 3, f"検証実行中...（再開: {resumed_points}点完了済み）")
+        
+        budget = create_training_budget()
+        try:
+            validation = validator.run_validation(
+                data, main_cols, round_col,
+                window_sizes=window_sizes,
+                initial_size=initial_size,
+                budget=budget,
+                result_store=result_store
+            )
+        except SoftTimeLimitExceeded:
+            # 完了済みの検証点だけで集計して返す（残りは再実行で続きから）
+            logger.warning("⏱️ ソフトタイムアウト: 完了済みの検証点で部分結果を返します")
+            validation = validator.run_validation(
+                data, main_cols, round_col,
+                window_sizes=window_sizes,
+                initial_size=initial_size,
+                result_store=result_store,
+                compute=False
+            )
+        
+        if validation['completed']:
+            checkpoint.clear()
+        
+        update_task_progress(2, 3, "検証結果を集計しました")
         
         result = {
             'status': 'success',
-            'message': '時系列検証が完了しました（簡易版）',
+            'message': '時系列検証が完了しました' if validation['completed'] else '時系列検証の途中結果です（再実行で続きから）',
             'validation': {
                 'success': True,
+                'completed': validation['completed'],
+                'fidelity': validation['fidelity'],
+                'resumed_points': resumed_points,
+                'fixed_window_tests': validation['fixed_window_tests'],
+                'expanding_window_tests': validation['expanding_window_tests'],
+                'comparison': validation['comparison'],
+                'summary': validation['summary'],
+                'store': validation['store'],
                 'game_type': 'miniloto'
-            }
+            },
+            'data_freshness': prediction_system.data_fetcher.fetch_freshness(),
+            'budget': budget.report() if budget else None
         }
         
-        update_task_progress(2, 2, "検証タスク完了")
+        update_task_progress(3, 3, "検証タスク完了")
         logger.info("🎉 検証タスク完了")
-        return result
+        return json_safe(result)
         
+    except Ignore:
+        # self.replace による置き換え
+        raise
     except Exception as e:
         logger.error(f"❌ 検証タスクエラー: {e}")
         return {
@@ -339,6 +650,305 @@ def validation_task(self):
             'error_type': 'unexpected_error'
         }
 
+@celery_app.task(bind=True, name='tasks.validation_point_task')
+def validation_point_task(self, spec, config):
+    """固定窓の1検証点を評価するサブタスク（結果ストアにあれば再利用・失敗時はエラー結果を返して chord を止めない）"""
+    try:
+        validator = get_point_validator(config)
+        eval_result = validator.evaluate_fixed_point(spec)
+        return json_safe(eval_result)
+    except Exception as e:
+        logger.error(f"❌ 検証点エラー（{spec.get('window_size')}回分窓・第{spec.get('test_round')}回）: {e}")
+        return {
+            'status': 'error',
+            'message': str(e),
+            'window_size': spec.get('window_size'),
+            'test_round': spec.get('test_round'),
+            'error_type': 'validation_point_error'
+        }
+
+@celery_app.task(bind=True, name='tasks.validation_expanding_task')
+def validation_expanding_task(self, payload, config):
+    """累積窓検証のサブタスク（検証点間でモデルを引き継ぐため1タスクで実行・失敗時はエラー結果を返して chord を止めない）"""
+    from models.draw_dataset import DrawDataset
+    
+    try:
+        validator = get_point_validator(config)
+        draws = DrawDataset(payload['rounds'], payload['numbers'])
+        
+        results = validator.expanding_window_validation(
+            draws, payload['main_cols'], payload['round_col'],
+            initial_size=payload['initial_size']
+        )
+        return json_safe(results)
+    except Exception as e:
+        logger.error(f"❌ 累積窓検証エラー: {e}")
+        return {
+            'status': 'error',
+            'message': str(e),
+            'error_type': 'validation_expanding_error'
+        }
+
+@celery_app.task(bind=True, name='tasks.validation_reduce_task')
+def validation_reduce_task(self, results, meta):
+    """分散検証の集約タスク: 各サブタスクの結果から検証手法比較を作成"""
+    try:
+        point_results = results[:meta['point_count']]
+        expanding_results = results[meta['point_count']] if len(results) > meta['point_count'] else []
+        
+        # 失敗した検証点は逐次実行と同様に除外して集計（件数は結果に残す）
+        failed_points = [r for r in point_results if isinstance(r, dict) and r.get('status') == 'error']
+        if failed_points:
+            logger.warning(f"⚠️ 失敗した検証点を除外: {len(failed_points)}点 / {len(point_results)}点")
+        point_results = [r for r in point_results if not (isinstance(r, dict) and r.get('status') == 'error')]
+        
+        # 累積窓のサブタスクが失敗した場合は累積窓の結果なしとして集計
+        expanding_failed = isinstance(expanding_results, dict) and expanding_results.get('status') == 'error'
+        if expanding_failed:
+            logger.warning(f"⚠️ 累積窓検証の結果を除外: {expanding_results.get('message')}")
+            expanding_results = []
+        
+        validator = get_point_validator(meta['config'])
+        # JSON経由でリスト化された一致数配列などを戻す
+        point_results = [validator.restore_result(r) for r in point_results]
+        expanding_results = [validator.restore_result(r) for r in expanding_results]
+        
+        validation = validator.collect_results(point_results, expanding_results, meta['window_sizes'])
+        
+        result = {
+            'status': 'success',
+            'message': '時系列検証が完了しました（分散実行）',
+            'validation': {
+                'success': True,
+                'completed': validation['completed'],
+                'fidelity': validation['fidelity'],
+                'distributed': True,
+                'subtask_count': len(results),
+                'failed_points': len(failed_points),
+                'expanding_failed': expanding_failed,
+                'fixed_window_tests': validation['fixed_window_tests'],
+                'expanding_window_tests': validation['expanding_window_tests'],
+                'comparison': validation['comparison'],
+                'summary': validation['summary'],
+                'game_type': 'miniloto'
+            },
+            'data_freshness': meta.get('data_freshness')
+        }
+        
+        logger.info("🎉 分散検証の集約完了")
+        return json_safe(result)
+        
+    except Exception as e:
+        logger.error(f"❌ 検証集約タスクエラー: {e}")
+        return {
+            'status': 'error',
+            'message': str(e),
+            'traceback': traceback.format_exc(),
+            'error_type': 'unexpected_error'
+        }
+
+@celery_app.task(bind=True, name='tasks.backtest_task')
+def backtest_task(self, options=None):
+    """全回ウォークフォワード・バックテストタスク（結果は1回ごとにファイルへ追記・時間切れ時は途中までを集計）"""
+    try:
+        logger.info("📈 バックテストタスク開始")
+        
+        if options is None:
+            options = {}
+        
+        update_task_progress(0, 3, "バックテスト準備中...")
+        
+        modules_ok, modules_msg = safe_module_check()
+        if not modules_ok or WalkForwardBacktest is None:
+            return {
+                'status': 'error',
+                'message': modules_msg if not modules_ok else 'WalkForwardBacktest が利用できません',
+                'error_type': 'import_error'
+            }
+        
+        file_manager = FileManager()
+        prediction_system = AutoFetchEnsembleMiniLoto()
+        prediction_system.set_file_manager(file_manager)
+        
+        if not prediction_system.data_fetcher.fetch_latest_data():
+            return {
+                'status': 'error',
+                'message': 'ミニロトデータ取得に失敗しました',
+                'error_type': 'data_fetch_error'
+            }
+        
+        update_task_progress(1, 3, "全回バックテスト実行中...")
+        
+        def on_progress(done, total):
+            update_task_progress(1, 3, f"全回バックテスト実行中...（{done}/{total}回）")
+        
+        backtest = WalkForwardBacktest(
+            prediction_system.get_validator(options.get('fidelity')),
+            file_manager.backtest_results_path,
+            update_every=options.get('update_every', 1)
+        )
+        budget = create_training_budget()
+        summary = backtest.run(
+            prediction_system.data_fetcher.get_draws(),
+            prediction_system.data_fetcher.main_columns,
+            prediction_system.data_fetcher.round_column,
+            initial_size=options.get('initial_size'),
+            budget=budget,
+            progress_callback=on_progress
+        )
+        
+        if summary is None:
+            return {
+                'status': 'error',
+                'message': 'バックテストに必要なデータが不足しています',
+                'error_type': 'insufficient_data'
+            }
+        
+        update_task_progress(3, 3, "バックテストタスク完了")
+        
+        return json_safe({
+            'status': 'success',
+            'message': 'ウォークフォワード・バックテストが完了しました' if summary['completed']
+                       else 'ウォークフォワード・バックテストの途中結果です（時間予算到達）',
+            'backtest': summary,
+            'data_freshness': prediction_system.data_fetcher.fetch_freshness(),
+            'budget': budget.report() if budget else None
+        })
+        
+    except Exception as e:
+        logger.error(f"❌ バックテストタスクエラー: {e}")
+        return {
+            'status': 'error',
+            'message': str(e),
+            'traceback': traceback.format_exc(),
+            'error_type': 'unexpected_error'
+        }
+
+@celery_app.task(bind=True, name='tasks.ensemble_sweep_task')
+def ensemble_sweep_task(self, options=None):
+    """アンサンブル調整パラメータのスイープタスク（バックテストの確率キャッシュを使用・再学習なし）"""
+    try:
+        logger.info("🎛️ アンサンブル設定スイープタスク開始")
+        
+        if options is None:
+            options = {}
+        
+        if FileManager is None or WalkForwardBacktest is None or EnsembleKnobSweep is None:
+            return {
+                'status': 'error',
+                'message': 'FileManager・WalkForwardBacktest・EnsembleKnobSweep のいずれかが利用できません',
+                'error_type': 'import_error'
+            }
+        
+        file_manager = FileManager()
+        cache_path = probabilities_path_for(file_manager.backtest_results_path)
+        if not os.path.exists(cache_path):
+            return {
+                'status': 'error',
+                'message': '確率キャッシュがありません。先にバックテストを実行してください',
+                'error_type': 'missing_backtest'
+            }
+        
+        update_task_progress(1, 2, "設定の組み合わせを評価中...")
+        
+        from models.model_factory import FIDELITY_MODEL_WEIGHTS
+        sweep = EnsembleKnobSweep.from_file(cache_path)
+        grid = {key: options[key] for key in ('weight_step', 'votes_per_model', 'boost_factor', 'frequent_bonus') if key in options}
+        report = sweep.run(
+            grid=grid,
+            current_weights=FIDELITY_MODEL_WEIGHTS.get(sweep.fidelity),
+            top_k=int(options.get('top_k', 10))
+        )
+        
+        update_task_progress(2, 2, "スイープタスク完了")
+        
+        return json_safe({
+            'status': 'success',
+            'message': 'アンサンブル設定スイープが完了しました',
+            'sweep': report
+        })
+        
+    except Exception as e:
+        logger.error(f"❌ スイープタスクエラー: {e}")
+        return {
+            'status': 'error',
+            'message': str(e),
+            'traceback': traceback.format_exc(),
+            'error_type': 'unexpected_error'
+        }
+
+@celery_app.task(bind=True, name='tasks.post_draw_refresh_task', max_retries=POST_DRAW_MAX_RETRIES)
+def post_draw_refresh_task(self):
+    """
+    抽選後の更新タスク（Celery beat から抽選日に起動）
+    直近の抽選結果が取り込めるまで再試行し、取り込めたら予測の照合 → 差分学習 → 次回予測の事前計算を起動
+    """
+    try:
+        logger.info("🗓️ 抽選後の更新タスク開始")
+        
+        modules_ok, modules_msg = safe_module_check()
+        if not modules_ok:
+            return {
+                'status': 'error',
+                'message': modules_msg,
+                'error_type': 'import_error'
+            }
+        
+        prediction_system = get_prediction_system()
+        data_fetcher = prediction_system.data_fetcher
+        prediction_system.history.load_from_csv()
+        
+        # TTL・抽選日程による再利用はせず取得元へ確認（未更新なら条件付きリクエストで304）
+        fetched = data_fetcher.fetch_latest_data(force=True)
+        if not fetched or not data_fetcher.data_is_current():
+            latest_published = data_fetcher.calendar.latest_published_draw()
+            if self.request.retries < self.max_retries:
+                logger.info(f"⏳ {latest_published:%Y-%m-%d}の抽選結果が未反映のため"
+                            f"{POST_DRAW_RETRY_SECONDS // 60}分後に再試行します（{self.request.retries + 1}/{self.max_retries}）")
+                raise self.retry(countdown=POST_DRAW_RETRY_SECONDS)
+            return {
+                'status': 'error',
+                'message': f'{latest_published:%Y-%m-%d}の抽選結果が取得元に反映されませんでした',
+                'error_type': 'data_not_updated',
+                'data_freshness': data_fetcher.fetch_freshness()
+            }
+        
+        next_round = data_fetcher.latest_round + 1
+        verified_count = prediction_system.history.auto_verify_with_data(
+            data_fetcher.latest_data, data_fetcher.round_column, data_fetcher.main_columns
+        )
+        
+        # 次回分の予測が記録済みなら学習・予測とも済んでいる（次回抽選まで再計算しない）
+        if prediction_system.history.find_prediction_by_round(next_round):
+            logger.info(f"第{next_round}回の予測は計算済みのため学習・予測はスキップします")
+            refresh_id = None
+        else:
+            refresh = chain(train_model_task.si(), predict_task.si()).apply_async()
+            refresh_id = refresh.id
+            logger.info(f"第{next_round}回に向けて差分学習・予測を起動しました")
+        
+        return {
+            'status': 'success',
+            'message': f'第{data_fetcher.latest_round}回の抽選結果を取り込みました',
+            'latest_round': data_fetcher.latest_round,
+            'verified_count': verified_count,
+            'next_round': next_round,
+            'refresh_task_id': refresh_id,
+            'data_freshness': data_fetcher.fetch_freshness(),
+            'game_type': 'miniloto'
+        }
+        
+    except Retry:
+        raise
+    except Exception as e:
+        logger.error(f"❌ 抽選後の更新タスクエラー: {e}")
+        return {
+            'status': 'error',
+            'message': str(e),
+            'traceback': traceback.format_exc(),
+            'error_type': 'unexpected_error'
+        }
+
 # ヘルスチェック用のダミータスク
 @celery_app.task(name='tasks.health_check')
 def health_check():
@@ -359,4 +969,4 @@ def health_check():
 
 # タスク登録確認
 logger.info("📋 ミニロト用Celeryタスク定義完了")
-logger.info("📋 利用可能タスク: heavy_init_task, predict_task, train_model_task, validation_task, health_check")
\ No newline at end of file
+logger.info("📋 利用可能タスク: heavy_init_task, predict_task, train_model_task, hyperparameter_search_task, validation_task, post_draw_refresh_task, health_check")
\ No newline at end of file
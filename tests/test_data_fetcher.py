@@ -0,0 +1,285 @@
+"""
+AutoDataFetcher の取得処理のテスト
+ローカルの代替HTTPサーバー（ThreadingHTTPServer）で取得元の応答・遅延・エラーを再現する
+"""
+
+import io
+import os
+import shutil
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+import models.data_fetcher as data_fetcher
+from models.data_fetcher import AutoDataFetcher
+from utils.file_manager import FileManager
+
+HEADER = '開催回,日付,第1数字,第2数字,第3数字,第4数字,第5数字,BONUS数字\n'
+
+
+def make_csv(rounds, bom=False):
+    """第1回〜第rounds回のCSV本文（数字は回ごとにずらした重複のない組）"""
+    lines = [HEADER]
+    for r in range(1, rounds + 1):
+        numbers = [(r + k * 6) % 31 + 1 for k in range(6)]
+        day = time.strftime('%Y/%m/%d', time.gmtime(954806400 + (r - 1) * 7 * 86400))
+        lines.append(f"{r},{day}," + ','.join(str(n) for n in numbers) + '\n')
+    body = ''.join(lines).encode('utf-8')
+    return b'\xef\xbb\xbf' + body if bom else body
+
+
+class StandInSource:
+    """代替サーバーの応答内容（テストから書き換える）"""
+
+    def __init__(self):
+        self.body = make_csv(30)
+        self.etag = '"v1"'
+        self.fail_count = 0
+        self.not_modified_once = False
+        self.delay = 0.0
+        self.requests = []
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        source = self.server.source
+        source.requests.append(dict(self.headers))
+
+        if source.fail_count > 0:
+            source.fail_count -= 1
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        if source.delay:
+            time.sleep(source.delay)
+
+        if self.headers.get('If-None-Match') == source.etag or source.not_modified_once:
+            source.not_modified_once = False
+            self.send_response(304)
+            self.send_header('ETag', source.etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('ETag', source.etag)
+        self.send_header('Content-Length', str(len(source.body)))
+        self.end_headers()
+        self.wfile.write(source.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def source():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    server.daemon_threads = True
+    server.source = StandInSource()
+    server.source.url = f'http://127.0.0.1:{server.server_address[1]}/miniloto.csv'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.source
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fetch_settings(monkeypatch):
+    """テスト用の短いタイムアウト・バックオフ（セッションは設定ごとに作り直す）"""
+    monkeypatch.delenv('USE_LOCAL_STORAGE', raising=False)
+    monkeypatch.setenv('DATA_FETCH_TTL', '0')
+    monkeypatch.setenv('DATA_FETCH_CONNECT_TIMEOUT', '1')
+    monkeypatch.setenv('DATA_FETCH_READ_TIMEOUT', '0.5')
+    monkeypatch.setenv('DATA_FETCH_RETRIES', '2')
+    monkeypatch.setattr(data_fetcher, 'RETRY_BACKOFF_FACTOR', 0.01)
+    monkeypatch.setattr(data_fetcher, '_http_session', None)
+
+
+def make_fetcher(source, data_dir):
+    fetcher = AutoDataFetcher()
+    fetcher.csv_url = source.url
+    fetcher.set_cache_manager(FileManager(str(data_dir)))
+    return fetcher
+
+
+def test_retries_server_errors(source, tmp_path):
+    source.fail_count = 2
+    fetcher = make_fetcher(source, tmp_path)
+
+    assert fetcher.fetch_latest_data()
+    assert fetcher.last_fetch_status == 'downloaded'
+    assert fetcher.latest_round == 30
+    assert len(source.requests) == 3
+    assert fetcher.http_stats()['retries'] == 2
+
+
+def test_read_timeout_falls_back_to_cache(source, tmp_path):
+    fetcher = make_fetcher(source, tmp_path)
+    assert fetcher.fetch_latest_data()
+
+    source.delay = 2.0
+    source.etag = '"v2"'
+    other = make_fetcher(source, tmp_path)
+    started = time.monotonic()
+    assert other.fetch_latest_data()
+
+    # 読み込みタイムアウトは再試行しない
+    assert time.monotonic() - started < 1.5
+    assert len(source.requests) == 2
+    assert other.last_fetch_status == 'cache_fallback'
+    assert other.latest_round == 30
+
+
+def test_deadline_bounds_the_whole_fetch(source, tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA_FETCH_DEADLINE', '1')
+    monkeypatch.setenv('DATA_FETCH_READ_TIMEOUT', '5')
+    source.delay = 3.0
+    fetcher = make_fetcher(source, tmp_path)
+
+    started = time.monotonic()
+    assert not fetcher.fetch_latest_data()
+    assert time.monotonic() - started < 2.0
+    assert fetcher.last_fetch_status == 'cache_fallback'
+
+
+def test_deadline_stays_below_lock_timeout(monkeypatch):
+    monkeypatch.setenv('DATA_FETCH_DEADLINE', '1000')
+    assert data_fetcher.get_fetch_deadline() < data_fetcher.FETCH_LOCK_TIMEOUT
+
+
+def test_not_modified_reuses_memory_and_cache(source, tmp_path):
+    fetcher = make_fetcher(source, tmp_path)
+    assert fetcher.fetch_latest_data()
+    assert fetcher.last_fetch_status == 'downloaded'
+
+    # 同じプロセス: 304 でメモリ上のデータを再利用
+    data = fetcher.latest_data
+    assert fetcher.fetch_latest_data()
+    assert fetcher.last_fetch_status == 'not_modified'
+    assert source.requests[-1].get('If-None-Match') == '"v1"'
+    assert fetcher.latest_data is data
+
+    # 別プロセス相当: 304 でキャッシュから読み込み
+    other = make_fetcher(source, tmp_path)
+    assert other.fetch_latest_data()
+    assert other.last_fetch_status == 'not_modified'
+    assert other.latest_round == 30
+    assert len(other.latest_data) == 30
+    assert len(source.requests) == 3
+
+
+def test_missing_cache_sends_unconditional_request(source, tmp_path):
+    fetcher = make_fetcher(source, tmp_path)
+    assert fetcher.fetch_latest_data()
+
+    shutil.rmtree(fetcher.cache_manager.draw_cache_dir)
+    other = make_fetcher(source, tmp_path)
+    assert other.fetch_latest_data()
+    assert 'If-None-Match' not in source.requests[-1]
+    assert other.last_fetch_status == 'downloaded'
+    assert other.latest_round == 30
+
+
+def test_not_modified_without_reusable_data_refetches(source, tmp_path):
+    fetcher = make_fetcher(source, tmp_path)
+    assert fetcher.fetch_latest_data()
+
+    # 条件付きリクエストを送った後にキャッシュが消えていた場合
+    other = make_fetcher(source, tmp_path)
+    other._reuse_state_data = lambda state: None
+    source.not_modified_once = True
+    source.etag = '"v2"'
+    assert other.fetch_latest_data()
+    assert len(source.requests) == 3
+    assert 'If-None-Match' not in source.requests[-1]
+    assert other.last_fetch_status == 'downloaded'
+
+
+def test_new_etag_downloads_again(source, tmp_path):
+    fetcher = make_fetcher(source, tmp_path)
+    assert fetcher.fetch_latest_data()
+
+    # 前回の本文の後ろに1回分が追記されただけなら追記分のみ取り込む
+    source.body = make_csv(31)
+    source.etag = '"v2"'
+    assert fetcher.fetch_latest_data()
+    assert fetcher.last_fetch_status == 'appended'
+    assert fetcher.latest_round == 31
+    assert fetcher.fetch_state['etag'] == '"v2"'
+
+
+def test_changed_prefix_downloads_whole_csv(source, tmp_path):
+    fetcher = make_fetcher(source, tmp_path)
+    assert fetcher.fetch_latest_data()
+
+    # 過去の回が訂正された場合は前回の本文が先頭に残らないため全体を読み直す
+    lines = make_csv(31).decode('utf-8').splitlines(keepends=True)
+    lines[5] = lines[5].rsplit(',', 1)[0] + ',31\n'
+    source.body = ''.join(lines).encode('utf-8')
+    source.etag = '"v2"'
+    assert fetcher.fetch_latest_data()
+    assert fetcher.last_fetch_status == 'downloaded'
+    assert fetcher.latest_round == 31
+    assert fetcher.latest_data['BONUS数字'].iloc[4] == 31
+
+
+@pytest.mark.parametrize('bom', [False, True])
+def test_appended_rows_keep_columns(source, tmp_path, bom):
+    source.body = make_csv(30, bom=bom)
+    fetcher = make_fetcher(source, tmp_path)
+    assert fetcher.fetch_latest_data()
+    assert fetcher.fetch_state['header'][0] == '開催回'
+
+    source.body = make_csv(33, bom=bom)
+    source.etag = '"v2"'
+    assert fetcher.fetch_latest_data()
+    assert fetcher.last_fetch_status == 'appended'
+    assert set(fetcher.latest_data.columns) == set(HEADER.strip().split(','))
+    assert fetcher.latest_round == 33
+    assert fetcher.latest_data['開催回'].tolist() == list(range(1, 34))
+    assert fetcher.validate_data_integrity()[0]
+
+
+def test_mismatched_header_reparses_whole_csv(source, tmp_path):
+    source.body = make_csv(30, bom=True)
+    fetcher = make_fetcher(source, tmp_path)
+    assert fetcher.fetch_latest_data()
+
+    # BOM付きのカラム名を記憶していた場合（修正前の取得状態）
+    state = dict(fetcher.fetch_state)
+    state['header'] = ['\ufeff' + state['header'][0]] + state['header'][1:]
+    fetcher._store_fetch_state(state)
+
+    source.body = make_csv(33, bom=True)
+    source.etag = '"v2"'
+    assert fetcher.fetch_latest_data()
+    assert fetcher.last_fetch_status == 'downloaded'
+    assert fetcher.latest_round == 33
+    assert '\ufeff開催回' not in fetcher.latest_data.columns
+
+
+def test_data_download_exports_cached_draws(source, tmp_path):
+    fetcher = make_fetcher(source, tmp_path)
+    assert fetcher.fetch_latest_data()
+
+    info = fetcher.cache_manager.get_download_info('data')
+    assert info['filename'].endswith('.csv')
+    exported = pd.read_csv(info['path'], encoding='utf-8')
+    expected = pd.read_csv(io.BytesIO(source.body), encoding='utf-8')
+    pd.testing.assert_frame_equal(exported, expected[exported.columns.tolist()])
+    assert list(exported.columns) == list(expected.columns)
+
+    # 同じ版なら書き出し済みのCSVを再利用し、新しい版では作り直す
+    assert fetcher.cache_manager.get_download_info('data')['path'] == info['path']
+    source.body = make_csv(31)
+    source.etag = '"v2"'
+    assert fetcher.fetch_latest_data()
+    updated = fetcher.cache_manager.get_download_info('data')
+    assert updated['path'] != info['path']
+    assert len(pd.read_csv(updated['path'])) == 31
+    assert not os.path.exists(info['path'])
@@ -5,15 +5,34 @@
 
 import os
 import pickle
+import hashlib
+import numpy as np
 import pandas as pd
 import logging
 import shutil
 import tempfile
+import time
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:
+    # Windows など fcntl がない環境ではプロセス間ロックなしで動作
+    fcntl = None
+
+from utils.model_registry import ModelRegistry
+from utils.validation_store import ValidationResultStore, ValidationCheckpoint
+
 logger = logging.getLogger(__name__)
 
+# 抽選履歴キャッシュの保持版数（最新＋1つ前: 読み込み中のプロセスがあっても消さない・バックアップ代わり）
+DRAW_CACHE_KEEP_VERSIONS = 2
+
+# 検証チェックポイントの保持期間（秒）: 実行中の検証は毎点追記するので、これより古いものは再開されない
+VALIDATION_CHECKPOINT_MAX_AGE = 24 * 3600
+
 class FileManager:
     """ファイル管理クラス - ローカルストレージ対応完全版"""
     
@@ -36,16 +55,35 @@ class FileManager:
         self.cache_dir = os.path.join(self.data_dir, 'cache')
         self.uploads_dir = os.path.join(self.data_dir, 'uploads')
         self.backups_dir = os.path.join(self.data_dir, 'backups')
+        self.checkpoints_dir = os.path.join(self.data_dir, 'checkpoints')
+        self.registry_dir = os.path.join(self.models_dir, 'registry')
+        self.validation_store_dir = os.path.join(self.cache_dir, 'validation_results')
         
         # ファイルパス設定
         self.model_path = os.path.join(self.models_dir, 'miniloto_model.pkl')
         self.history_path = os.path.join(self.data_dir, 'prediction_history.csv')
-        self.data_cache_path = os.path.join(self.cache_dir, 'miniloto_data.csv')
+        self.data_cache_path = os.path.join(self.cache_dir, 'miniloto_data.csv')  # 旧形式（移行時の読み込みのみ）
+        self.draw_cache_dir = os.path.join(self.cache_dir, 'draws')
+        self.draw_cache_header_path = os.path.join(self.draw_cache_dir, 'header.json')
+        self.draw_export_dir = os.path.join(self.cache_dir, 'exports')  # ダウンロード用CSV（キャッシュの版ごとに作成）
+        self.fetch_state_path = os.path.join(self.cache_dir, 'fetch_state.json')
+        self.fetch_lock_path = os.path.join(self.cache_dir, 'fetch.lock')
         self.config_path = os.path.join(self.data_dir, 'config.json')
+        self.model_params_path = os.path.join(self.data_dir, 'model_params.json')
+        self.backtest_results_path = os.path.join(self.cache_dir, 'walk_forward_backtest.jsonl')
         
         # ディレクトリ初期化
         self._ensure_directories()
         
+        # バージョン管理されたモデルレジストリ（旧 miniloto_model.pkl は読み込みのみ互換）
+        self.model_registry = ModelRegistry(
+            self.registry_dir,
+            keep_versions=int(os.environ.get('MODEL_KEEP_VERSIONS', '10'))
+        )
+        
+        # 時系列検証の検証点ごとの結果キャッシュ（データ・設定が同じなら再計算しない）
+        self.validation_store = ValidationResultStore(self.validation_store_dir)
+        
         # 起動時情報ログ
         self._log_storage_info()
     
@@ -55,8 +93,10 @@ class FileManager:
             self.data_dir,
             self.models_dir,
             self.cache_dir,
+            self.draw_cache_dir,
             self.uploads_dir,
-            self.backups_dir
+            self.backups_dir,
+            self.checkpoints_dir
         ]
         
         for directory in directories:
@@ -85,16 +125,34 @@ class FileManager:
     # ===== 存在確認メソッド =====
     
     def model_exists(self):
-        """モデルファイルの存在確認"""
-        return os.path.exists(self.model_path)
+        """モデルファイルの存在確認（レジストリのcurrent または旧形式ファイル）"""
+        return self.current_model_version() is not None or os.path.exists(self.model_path)
+    
+    def current_model_version(self):
+        """公開中のモデルバージョンID（ポインタを読むだけなのでリクエスト毎に呼んでよい）"""
+        return self.model_registry.current_version()
+    
+    def current_model_path(self):
+        """公開中のモデルファイルパス"""
+        version_id = self.current_model_version()
+        if version_id:
+            return self.model_registry.model_file(version_id)
+        return self.model_path
     
     def history_exists(self):
         """履歴ファイルの存在確認"""
         return os.path.exists(self.history_path)
     
     def data_cached(self):
-        """データキャッシュファイルの存在確認"""
-        return os.path.exists(self.data_cache_path)
+        """データキャッシュの存在確認（旧形式CSVを含む）"""
+        return os.path.exists(self.draw_cache_header_path) or os.path.exists(self.data_cache_path)
+    
+    def draw_cache_signature(self):
+        """抽選履歴キャッシュの更新識別子（ヘッダーの更新時刻、未作成ならNone）"""
+        try:
+            return os.stat(self.draw_cache_header_path).st_mtime_ns
+        except OSError:
+            return None
     
     def config_exists(self):
         """設定ファイルの存在確認"""
@@ -103,12 +161,8 @@ class FileManager:
     # ===== モデル保存・読み込み =====
     
     def save_model(self, prediction_system):
-        """予測システムのモデルを保存（バックアップ機能付き）"""
+        """予測システムのモデルを新バージョンとしてレジストリに公開"""
         try:
-            # 既存モデルのバックアップ
-            if self.model_exists():
-                self._backup_file(self.model_path, 'model_backup')
-            
             model_data = {
                 'trained_models': prediction_system.trained_models,
                 'scalers': prediction_system.scalers,
@@ -131,15 +185,20 @@ class FileManager:
                hasattr(prediction_system.auto_learner, 'improvement_metrics'):
                 model_data['improvement_metrics'] = prediction_system.auto_learner.improvement_metrics
             
-            # 一時ファイルに保存してから移動（アトミック保存）
-            temp_path = self.model_path + '.tmp'
-            with open(temp_path, 'wb') as f:
-                pickle.dump(model_data, f)
+            manifest = {
+                'game_type': 'miniloto',
+                'data_count': int(prediction_system.data_count or 0),
+                'models': list(prediction_system.trained_models.keys()),
+                'model_scores': {name: float(score) for name, score in prediction_system.model_scores.items()}
+            }
+            if hasattr(prediction_system, 'get_model_manifest'):
+                manifest.update(prediction_system.get_model_manifest())
             
-            # 保存成功時のみ正式ファイルに移動
-            shutil.move(temp_path, self.model_path)
+            # バージョンディレクトリを完成させてからcurrentポインタを切り替え（上書きなし）
+            version_id = self.model_registry.publish(model_data, manifest)
+            prediction_system.model_version = version_id
             
-            logger.info(f"✅ ミニロトモデルを保存: {self.model_path}")
+            logger.info(f"✅ ミニロトモデルを公開: {version_id}")
             logger.info(f"📊 学習データ数: {prediction_system.data_count}")
             logger.info(f"🤖 モデル数: {len(prediction_system.trained_models)}")
             
@@ -147,22 +206,25 @@ class FileManager:
             
         except Exception as e:
             logger.error(f"❌ モデル保存エラー: {e}")
-            # 一時ファイルのクリーンアップ
-            temp_path = self.model_path + '.tmp'
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
             return False
     
-    def load_model(self, prediction_system):
-        """保存されたモデルを予測システムに読み込み"""
+    def load_model(self, prediction_system, version_id=None):
+        """保存されたモデル（省略時はcurrent）を予測システムに読み込み"""
         try:
-            if not self.model_exists():
+            version_id = version_id or self.current_model_version()
+            
+            if version_id:
+                model_data, _ = self.model_registry.load(version_id)
+                source = f"version {version_id}"
+            elif os.path.exists(self.model_path):
+                # レジストリ導入前の単一ファイル形式
+                with open(self.model_path, 'rb') as f:
+                    model_data = pickle.load(f)
+                source = self.model_path
+            else:
                 logger.warning("⚠️ モデルファイルが存在しません")
                 return False
             
-            with open(self.model_path, 'rb') as f:
-                model_data = pickle.load(f)
-            
             # バージョン・互換性チェック
             game_type = model_data.get('game_type', 'unknown')
             if game_type == 'loto7':
@@ -179,6 +241,7 @@ class FileManager:
             prediction_system.pair_freq = model_data['pair_freq']
             prediction_system.pattern_stats = model_data['pattern_stats']
             prediction_system.data_count = model_data['data_count']
+            prediction_system.model_version = version_id
             
             # 改善メトリクスの復元
             if 'improvement_metrics' in model_data:
@@ -186,7 +249,7 @@ class FileManager:
                     prediction_system.auto_learner.improvement_metrics = model_data['improvement_metrics']
             
             saved_at = model_data.get('saved_at', '不明')
-            logger.info(f"✅ ミニロトモデルを読み込み: {self.model_path}")
+            logger.info(f"✅ ミニロトモデルを読み込み: {source}")
             logger.info(f"📊 学習データ数: {prediction_system.data_count}")
             logger.info(f"🤖 モデル数: {len(prediction_system.trained_models)}")
             logger.info(f"🕒 保存日時: {saved_at}")
@@ -197,6 +260,109 @@ class FileManager:
             logger.error(f"❌ モデル読み込みエラー: {e}")
             return False
     
+    # ===== 学習チェックポイント =====
+    
+    def _checkpoint_path(self, name):
+        """モデル別チェックポイントのパス"""
+        return os.path.join(self.checkpoints_dir, f'{name}.pkl')
+    
+    def save_training_checkpoint(self, name, checkpoint_data, signature):
+        """学習済みモデル1件をチェックポイントとして保存（ワーカー再起動時の再開用）"""
+        checkpoint_path = self._checkpoint_path(name)
+        temp_path = checkpoint_path + '.tmp'
+        try:
+            payload = {
+                'signature': signature,
+                'name': name,
+                'saved_at': datetime.now().isoformat(),
+                'data': checkpoint_data
+            }
+            
+            with open(temp_path, 'wb') as f:
+                pickle.dump(payload, f)
+            shutil.move(temp_path, checkpoint_path)
+            
+            logger.info(f"💾 学習チェックポイント保存: {name}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ チェックポイント保存エラー ({name}): {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+    
+    def load_training_checkpoints(self, signature):
+        """同じ学習条件（signature）のチェックポイントを読み込み、古いものは削除"""
+        checkpoints = {}
+        
+        try:
+            for filename in os.listdir(self.checkpoints_dir):
+                if not filename.endswith('.pkl'):
+                    continue
+                
+                checkpoint_path = os.path.join(self.checkpoints_dir, filename)
+                try:
+                    with open(checkpoint_path, 'rb') as f:
+                        payload = pickle.load(f)
+                except Exception as e:
+                    logger.warning(f"⚠️ 壊れたチェックポイントを削除: {filename} ({e})")
+                    os.remove(checkpoint_path)
+                    continue
+                
+                if payload.get('signature') != signature:
+                    logger.info(f"🧹 学習条件が異なるチェックポイントを削除: {filename}")
+                    os.remove(checkpoint_path)
+                    continue
+                
+                checkpoints[payload['name']] = payload['data']
+            
+            if checkpoints:
+                logger.info(f"♻️ 学習チェックポイント読み込み: {list(checkpoints.keys())}")
+            
+        except Exception as e:
+            logger.error(f"❌ チェックポイント読み込みエラー: {e}")
+        
+        return checkpoints
+    
+    def clear_training_checkpoints(self):
+        """学習チェックポイントを全て削除（モデル保存完了後）"""
+        try:
+            removed = 0
+            for filename in os.listdir(self.checkpoints_dir):
+                # 検証チェックポイント（.jsonl）は実行中の検証が使っているので残す
+                if not filename.endswith('.pkl'):
+                    continue
+                os.remove(os.path.join(self.checkpoints_dir, filename))
+                removed += 1
+            
+            if removed:
+                logger.info(f"🧹 学習チェックポイントを{removed}件削除しました")
+            return True
+            
+        except Exception as e:
+            logger.warning(f"チェックポイント削除エラー: {e}")
+            return False
+    
+    def get_validation_checkpoint(self, signature):
+        """時系列検証のチェックポイント（署名ごとのファイル: 別データ・設定の検証が同時に走っても互いに消さない）"""
+        self._prune_validation_checkpoints()
+        key = hashlib.sha1(signature.encode('utf-8')).hexdigest()[:16]
+        path = os.path.join(self.checkpoints_dir, f'validation_run_{key}.jsonl')
+        return ValidationCheckpoint(path, signature)
+    
+    def _prune_validation_checkpoints(self):
+        """更新が止まって保持期間を過ぎた検証チェックポイント（旧形式の共用ファイルを含む）を削除"""
+        try:
+            now = time.time()
+            for filename in os.listdir(self.checkpoints_dir):
+                if not (filename.startswith('validation_run') and filename.endswith('.jsonl')):
+                    continue
+                path = os.path.join(self.checkpoints_dir, filename)
+                if filename == 'validation_run.jsonl' or now - os.path.getmtime(path) > VALIDATION_CHECKPOINT_MAX_AGE:
+                    os.remove(path)
+        except OSError as e:
+            logger.warning(f"検証チェックポイント整理エラー: {e}")
+    
     # ===== 履歴保存・読み込み =====
     
     def save_history(self, prediction_history):
@@ -336,44 +502,142 @@ class FileManager:
     
     # ===== データキャッシュ =====
     
-    def save_data_cache(self, data):
-        """データをキャッシュに保存"""
+    def save_draw_cache(self, columns, meta=None):
+        """
+        抽選履歴の列配列を .npy＋JSONヘッダーで保存
+        版ごとのディレクトリに書き込んでからヘッダーを差し替えるため、読み込み中のプロセスは一貫した版を見る
+        """
+        version_dir = None
         try:
-            if data is None or len(data) == 0:
+            import json
+            
+            if not columns or len(next(iter(columns.values()))) == 0:
                 logger.warning("保存するデータがありません")
                 return False
             
-            # 既存キャッシュのバックアップ
-            if self.data_cached():
-                self._backup_file(self.data_cache_path, 'cache_backup')
+            version = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+            version_dir = os.path.join(self.draw_cache_dir, version)
+            os.makedirs(version_dir)
             
-            # 一時ファイルに保存してから移動
-            temp_path = self.data_cache_path + '.tmp'
-            data.to_csv(temp_path, index=False, encoding='utf-8')
-            shutil.move(temp_path, self.data_cache_path)
+            files = {}
+            for name, array in columns.items():
+                array = np.ascontiguousarray(array)
+                np.save(os.path.join(version_dir, f'{name}.npy'), array, allow_pickle=False)
+                files[name] = {'file': f'{name}.npy', 'dtype': str(array.dtype), 'shape': list(array.shape)}
+            
+            header = {
+                **(meta or {}),
+                'format': 1,
+                'version': version,
+                'rows': len(next(iter(columns.values()))),
+                'columns': files,
+                'saved_at': datetime.now().isoformat()
+            }
+            temp_path = f"{self.draw_cache_header_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(header, f, indent=2, ensure_ascii=False)
+            os.replace(temp_path, self.draw_cache_header_path)
             
-            logger.info(f"✅ ミニロトデータをキャッシュに保存: {self.data_cache_path}")
-            logger.info(f"📊 保存件数: {len(data)}件")
+            self._prune_draw_cache()
+            
+            logger.info(f"✅ ミニロトデータをキャッシュに保存: {version_dir}")
+            logger.info(f"📊 保存件数: {header['rows']}件")
             
             return True
             
         except Exception as e:
             logger.error(f"❌ データキャッシュ保存エラー: {e}")
-            # 一時ファイルのクリーンアップ
-            temp_path = self.data_cache_path + '.tmp'
+            if version_dir and os.path.isdir(version_dir):
+                shutil.rmtree(version_dir, ignore_errors=True)
+            return False
+    
+    def load_draw_cache(self, mmap_mode='r'):
+        """
+        抽選履歴キャッシュを読み込み（既定はメモリマップ: パースなし・ページキャッシュをプロセス間で共有）
+        戻り値: (ヘッダー, 列配列の辞書)、キャッシュがなければNone
+        """
+        import json
+        
+        for _ in range(2):
+            try:
+                with open(self.draw_cache_header_path, 'r', encoding='utf-8') as f:
+                    header = json.load(f)
+                version_dir = os.path.join(self.draw_cache_dir, header['version'])
+                columns = {
+                    name: np.load(os.path.join(version_dir, info['file']), mmap_mode=mmap_mode, allow_pickle=False)
+                    for name, info in header['columns'].items()
+                }
+                return header, columns
+            except FileNotFoundError:
+                # ヘッダーを読んだ直後に版が入れ替わった場合は読み直す
+                continue
+            except Exception as e:
+                logger.error(f"❌ データキャッシュ読み込みエラー: {e}")
+                return None
+        return None
+    
+    def _prune_draw_cache(self):
+        """古い版のキャッシュを削除（新しい順に DRAW_CACHE_KEEP_VERSIONS 版を残す）"""
+        versions = sorted(
+            (d for d in os.listdir(self.draw_cache_dir) if os.path.isdir(os.path.join(self.draw_cache_dir, d))),
+            reverse=True
+        )
+        for old_version in versions[DRAW_CACHE_KEEP_VERSIONS:]:
+            shutil.rmtree(os.path.join(self.draw_cache_dir, old_version), ignore_errors=True)
+    
+    def export_draw_cache_csv(self):
+        """
+        現在の抽選履歴キャッシュ（メモリマップ）を取得元と同じ列構成のCSVに書き出し、そのパスを返す
+        同じ版のCSVがあれば再利用し、古い版のCSVは削除（キャッシュがなければNone）
+        """
+        from models.draw_dataset import DrawDataset
+        
+        cached = self.load_draw_cache()
+        if cached is None:
+            return None
+        header, columns = cached
+        
+        export_path = os.path.join(self.draw_export_dir, f"miniloto_data_{header['version']}.csv")
+        if os.path.exists(export_path):
+            return export_path
+        
+        names = header.get('column_names') or {}
+        main_cols = names.get('main') or [f'第{i}数字' for i in range(1, 6)]
+        bonus_cols = names.get('bonus') or ['BONUS数字']
+        df = DrawDataset.from_columns(columns).to_dataframe(
+            main_cols, names.get('round') or '開催回', names.get('date') or '日付', bonus_cols[0]
+        )
+        # 欠損のあるボーナス数字も整数で書き出す（5.0 ではなく 5、欠損は空欄）
+        for col in df.select_dtypes('float').columns:
+            df[col] = df[col].astype('Int64')
+        
+        os.makedirs(self.draw_export_dir, exist_ok=True)
+        temp_path = f"{export_path}.{os.getpid()}.tmp"
+        try:
+            df.to_csv(temp_path, index=False, encoding='utf-8')
+            os.replace(temp_path, export_path)
+        except Exception as e:
+            logger.error(f"❌ データCSV書き出しエラー: {e}")
             if os.path.exists(temp_path):
                 os.remove(temp_path)
-            return False
+            return None
+        
+        for name in os.listdir(self.draw_export_dir):
+            if name != os.path.basename(export_path) and name.endswith('.csv'):
+                os.remove(os.path.join(self.draw_export_dir, name))
+        
+        logger.info(f"✅ データCSVを書き出し: {export_path}（{len(df)}件）")
+        return export_path
     
     def load_data_cache(self):
-        """キャッシュからデータを読み込み"""
+        """旧形式（CSV）のデータキャッシュを読み込み（新形式への移行用）"""
         try:
-            if not self.data_cached():
+            if not os.path.exists(self.data_cache_path):
                 logger.info("データキャッシュファイルが存在しません")
                 return None
             
             df = pd.read_csv(self.data_cache_path, encoding='utf-8')
-            logger.info(f"✅ キャッシュからミニロトデータを読み込み: {len(df)}件")
+            logger.info(f"✅ 旧形式キャッシュからミニロトデータを読み込み: {len(df)}件")
             
             return df
             
@@ -381,6 +645,67 @@ class FileManager:
             logger.error(f"❌ データキャッシュ読み込みエラー: {e}")
             return None
     
+    def save_fetch_state(self, source_url, state):
+        """データ取得元ごとの取得状態（ETag・Last-Modified など）を保存"""
+        try:
+            import json
+            
+            states = self.load_fetch_states()
+            states[source_url] = state
+            
+            temp_path = f"{self.fetch_state_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(states, f, indent=2, ensure_ascii=False)
+            os.replace(temp_path, self.fetch_state_path)
+            return True
+            
+        except Exception as e:
+            logger.warning(f"取得状態の保存に失敗: {e}")
+            return False
+    
+    def load_fetch_states(self):
+        """データ取得元ごとの取得状態を読み込み（なければ空）"""
+        try:
+            import json
+            
+            with open(self.fetch_state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def load_fetch_state(self, source_url):
+        """指定した取得元の取得状態"""
+        return self.load_fetch_states().get(source_url, {})
+    
+    @contextmanager
+    def fetch_lock(self, timeout=60):
+        """
+        データ取得のプロセス間ロック（同時に1プロセスだけが取得元へアクセス）
+        timeout 秒待っても取得できない場合はロックなしで続行（戻り値 False）
+        """
+        if fcntl is None:
+            yield False
+            return
+        
+        with open(self.fetch_lock_path, 'a') as lock_file:
+            deadline = time.monotonic() + timeout
+            acquired = False
+            while True:
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    acquired = True
+                    break
+                except OSError:
+                    if time.monotonic() >= deadline:
+                        logger.warning(f"データ取得ロックの待機がタイムアウトしました（{timeout}秒）")
+                        break
+                    time.sleep(0.1)
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+    
     # ===== 設定管理 =====
     
     def save_config(self, config_data):
@@ -432,6 +757,53 @@ class FileManager:
             logger.error(f"❌ 設定読み込みエラー: {e}")
             return {}
     
+    # ===== ハイパーパラメータ（探索結果の公開） =====
+    
+    def save_model_params(self, model_params, metadata=None):
+        """採用ハイパーパラメータを公開（本番・検証の両方が読み込む）"""
+        try:
+            import json
+            
+            payload = {
+                'model_params': model_params,
+                'metadata': metadata or {},
+                'published_at': datetime.now().isoformat(),
+                'game_type': 'miniloto'
+            }
+            
+            # 一時ファイルに保存してから移動
+            temp_path = self.model_params_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, indent=2, ensure_ascii=False, default=list)
+            shutil.move(temp_path, self.model_params_path)
+            
+            logger.info(f"✅ ハイパーパラメータを公開: {self.model_params_path}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ ハイパーパラメータ保存エラー: {e}")
+            temp_path = self.model_params_path + '.tmp'
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+    
+    def load_model_params(self):
+        """公開済みハイパーパラメータを読み込み（未公開なら空）"""
+        try:
+            import json
+            
+            if not os.path.exists(self.model_params_path):
+                return {}
+            
+            with open(self.model_params_path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+            
+            return payload.get('model_params', {})
+            
+        except Exception as e:
+            logger.error(f"❌ ハイパーパラメータ読み込みエラー: {e}")
+            return {}
+    
     # ===== ファイル操作・管理 =====
     
     def get_file_info(self, filename):
@@ -481,8 +853,11 @@ class FileManager:
                     'models': self.models_dir,
                     'cache': self.cache_dir,
                     'uploads': self.uploads_dir,
-                    'backups': self.backups_dir
-                }
+                    'backups': self.backups_dir,
+                    'checkpoints': self.checkpoints_dir,
+                    'registry': self.registry_dir
+                },
+                'model_version': self.current_model_version()
             }
         except Exception as e:
             return {
@@ -499,7 +874,8 @@ class FileManager:
             'models': self.models_dir,
             'cache': self.cache_dir,
             'uploads': self.uploads_dir,
-            'backups': self.backups_dir
+            'backups': self.backups_dir,
+            'checkpoints': self.checkpoints_dir
         }
         
         for name, directory in directories.items():
@@ -611,7 +987,7 @@ class FileManager:
     def get_download_info(self, file_type):
         """ダウンロード用ファイル情報を取得"""
         file_paths = {
-            'model': self.model_path,
+            'model': self.current_model_path(),
             'history': self.history_path,
             'data': self.data_cache_path,
             'config': self.config_path
@@ -621,13 +997,19 @@ class FileManager:
             return None
         
         file_path = file_paths[file_type]
+        if file_type == 'data' and os.path.exists(self.draw_cache_header_path):
+            # 抽選履歴は現行キャッシュから書き出したCSV（旧形式CSVは未移行の場合のみ）
+            file_path = self.export_draw_cache_csv()
+            if file_path is None:
+                return None
+        
         if not os.path.exists(file_path):
             return None
         
         return {
             'path': file_path,
             'filename': os.path.basename(file_path),
-            'info': self.get_file_info(os.path.basename(file_path))
+            'info': self.get_file_info(os.path.relpath(file_path, self.data_dir))
         }
     
     def export_all_data(self):
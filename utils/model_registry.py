@@ -0,0 +1,181 @@
+"""
+モデルレジストリ - ミニロト対応版
+不変のバージョンディレクトリ + マニフェスト + アトミックな current ポインタ
+"""
+
+import os
+import json
+import pickle
+import shutil
+import hashlib
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILENAME = 'model.pkl'
+MANIFEST_FILENAME = 'manifest.json'
+CURRENT_FILENAME = 'CURRENT'
+
+
+class ModelRegistry:
+    """学習済みモデルをバージョン単位で管理し、ポインタ切り替えで公開・ロールバックするクラス"""
+
+    def __init__(self, registry_dir, keep_versions=10):
+        self.registry_dir = registry_dir
+        self.versions_dir = os.path.join(registry_dir, 'versions')
+        self.current_path = os.path.join(registry_dir, CURRENT_FILENAME)
+        self.keep_versions = keep_versions
+
+        os.makedirs(self.versions_dir, exist_ok=True)
+
+    # ===== パス =====
+
+    def version_dir(self, version_id):
+        """バージョンディレクトリのパス"""
+        return os.path.join(self.versions_dir, version_id)
+
+    def model_file(self, version_id):
+        """バージョンのモデルファイルパス"""
+        return os.path.join(self.version_dir(version_id), MODEL_FILENAME)
+
+    # ===== current ポインタ =====
+
+    def current_version(self):
+        """現在公開中のバージョンID（ポインタファイルを読むだけの軽量処理）"""
+        try:
+            with open(self.current_path, 'r', encoding='utf-8') as f:
+                version_id = json.load(f).get('version_id')
+        except (OSError, ValueError):
+            return None
+
+        if version_id and os.path.exists(self.model_file(version_id)):
+            return version_id
+        return None
+
+    def set_current(self, version_id, reason='publish'):
+        """current ポインタをアトミックに切り替え（os.replace、登録済みのバージョンのみ）"""
+        # 外部から渡されたIDでレジストリ外のパス（../ など）を指さないよう、一覧にあるIDだけを受け付ける
+        if not isinstance(version_id, str) or version_id not in self.version_ids():
+            raise ValueError(f"存在しないバージョン: {version_id}")
+        if not os.path.exists(self.model_file(version_id)):
+            raise ValueError(f"存在しないバージョン: {version_id}")
+
+        pointer = {
+            'version_id': version_id,
+            'previous_version_id': self.current_version(),
+            'reason': reason,
+            'updated_at': datetime.now().isoformat()
+        }
+
+        temp_path = f"{self.current_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(pointer, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.current_path)
+
+        logger.info(f"🔀 currentモデル切り替え: {pointer['previous_version_id']} → {version_id} ({reason})")
+        return pointer
+
+    # ===== 公開・読み込み =====
+
+    def publish(self, model_data, manifest):
+        """新バージョンを書き込み、完成後にポインタを切り替え"""
+        payload = pickle.dumps(model_data)
+        digest = hashlib.sha1(payload).hexdigest()[:8]
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        version_id = f"v{timestamp}_r{manifest.get('data_round', 0)}_{digest}"
+
+        final_dir = self.version_dir(version_id)
+        temp_dir = os.path.join(self.versions_dir, f".{version_id}.{os.getpid()}.tmp")
+
+        try:
+            os.makedirs(temp_dir, exist_ok=True)
+            with open(os.path.join(temp_dir, MODEL_FILENAME), 'wb') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+
+            manifest = dict(manifest)
+            manifest.update({
+                'version_id': version_id,
+                'created_at': datetime.now().isoformat(),
+                'sha1': digest,
+                'sizes': {MODEL_FILENAME: len(payload)}
+            })
+            with open(os.path.join(temp_dir, MANIFEST_FILENAME), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+            # ディレクトリ単位で完成させてから公開（読み手は途中状態を見ない）
+            os.rename(temp_dir, final_dir)
+
+        except Exception:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+
+        self.set_current(version_id)
+        self.prune()
+        return version_id
+
+    def load(self, version_id=None):
+        """指定バージョン（省略時はcurrent）のモデルデータとマニフェストを読み込み"""
+        version_id = version_id or self.current_version()
+        if not version_id:
+            return None, None
+
+        with open(self.model_file(version_id), 'rb') as f:
+            model_data = pickle.load(f)
+
+        return model_data, self.get_manifest(version_id)
+
+    def get_manifest(self, version_id):
+        """バージョンのマニフェストを取得"""
+        try:
+            with open(os.path.join(self.version_dir(version_id), MANIFEST_FILENAME), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def list_versions(self):
+        """バージョン一覧（新しい順）"""
+        versions = []
+        for name in os.listdir(self.versions_dir):
+            if name.startswith('.'):
+                continue
+            manifest = self.get_manifest(name)
+            if manifest:
+                versions.append(manifest)
+        return sorted(versions, key=lambda m: m.get('created_at', ''), reverse=True)
+
+    def version_ids(self):
+        """登録済みのバージョンID"""
+        return {m['version_id'] for m in self.list_versions() if m.get('version_id')}
+
+    # ===== ロールバック・整理 =====
+
+    def rollback(self, version_id=None):
+        """指定バージョン（省略時はcurrentの1つ前）へポインタを戻す（ファイルコピーなし）"""
+        if version_id is None:
+            current = self.current_version()
+            older = [m['version_id'] for m in self.list_versions() if m['version_id'] != current]
+            if current:
+                created = (self.get_manifest(current) or {}).get('created_at', '')
+                older = [v for v in older if (self.get_manifest(v) or {}).get('created_at', '') < created]
+            if not older:
+                raise ValueError("ロールバック先のバージョンがありません")
+            version_id = older[0]
+
+        return self.set_current(version_id, reason='rollback')
+
+    def prune(self):
+        """古いバージョンを削除（currentは必ず残す）"""
+        current = self.current_version()
+        versions = self.list_versions()
+
+        for manifest in versions[self.keep_versions:]:
+            version_id = manifest['version_id']
+            if version_id == current:
+                continue
+            shutil.rmtree(self.version_dir(version_id), ignore_errors=True)
+            logger.info(f"🧹 古いモデルバージョンを削除: {version_id}")
@@ -0,0 +1,194 @@
+"""
+検証結果ストア - ミニロト対応版
+(学習区間のデータハッシュ, テスト回, モデル設定ハッシュ, シード) をキーに検証1点の結果を永続化
+"""
+
+import os
+import json
+import hashlib
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _json_default(value):
+    """NumPy型をJSONへ変換"""
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"JSONに変換できない型: {type(value)}")
+
+
+def make_result_key(train_hash, test_round, config_hash, seed):
+    """キー要素から保存キーを作成"""
+    raw = f"{train_hash}:{test_round}:{config_hash}:{seed}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class ValidationResultStore:
+    """検証1点ごとの結果をキー単位のJSONファイルで保持するクラス"""
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(store_dir, exist_ok=True)
+
+    def make_key(self, train_hash, test_round, config_hash, seed):
+        """キー要素から保存キーを作成"""
+        return make_result_key(train_hash, test_round, config_hash, seed)
+
+    def _path(self, key):
+        """キーの保存先（先頭2文字でディレクトリを分割）"""
+        return os.path.join(self.store_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        """保存済みの結果を取得（なければNone）"""
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        """結果を保存（一時ファイルから os.replace で置き換え）"""
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, default=_json_default)
+            os.replace(temp_path, path)
+            return True
+        except Exception as e:
+            logger.warning(f"検証結果の保存に失敗: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+
+    def stats(self):
+        """ヒット・ミス件数"""
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def clear(self):
+        """保存済みの結果をすべて削除"""
+        removed = 0
+        for root, _, files in os.walk(self.store_dir):
+            for filename in files:
+                if filename.endswith('.json'):
+                    os.remove(os.path.join(root, filename))
+                    removed += 1
+        logger.info(f"検証結果ストアをクリア: {removed}件")
+        return removed
+
+
+class ValidationCheckpoint:
+    """
+    検証実行1回分のチェックポイント（JSON Lines）
+    完了した検証点を1行ずつ追記し、再実行時はその続きから再開する
+    """
+
+    def __init__(self, path, signature):
+        self.path = path
+        self.signature = signature
+        self.records = {}
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._load()
+
+    def _load(self):
+        """既存の追記内容を読み込み（署名違いは破棄・途中で切れた最終行は無視）"""
+        if not os.path.exists(self.path):
+            self._write_header()
+            return
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+            header = json.loads(lines[0]) if lines else {}
+        except (OSError, ValueError):
+            header = {}
+            lines = []
+
+        if header.get('signature') != self.signature:
+            logger.info("検証チェックポイントの署名が一致しないため破棄")
+            self._write_header()
+            return
+
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 強制終了で書き込み途中だった行
+                continue
+            self.records[record['key']] = record['result']
+
+        if self.records:
+            logger.info(f"🔁 検証チェックポイントから再開: 完了済み{len(self.records)}点")
+
+    def _write_header(self):
+        """署名行だけのファイルを作成"""
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'signature': self.signature}) + '\n')
+        os.replace(temp_path, self.path)
+
+    def get(self, key):
+        """完了済みの検証点の結果"""
+        return self.records.get(key)
+
+    def append(self, key, result):
+        """完了した検証点を1行追記（強制終了に備えて毎回fsync）"""
+        line = json.dumps({'key': key, 'result': result}, ensure_ascii=False, default=_json_default)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.records[key] = json.loads(line)['result']
+
+    def clear(self):
+        """実行完了後にチェックポイントを削除"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.records = {}
+
+
+class CheckpointedResultStore:
+    """チェックポイントと永続ストアを重ねた検証結果ストア（検証器からは同じインターフェースで利用）"""
+
+    def __init__(self, checkpoint, store=None):
+        self.checkpoint = checkpoint
+        self.store = store
+
+    def make_key(self, train_hash, test_round, config_hash, seed):
+        return make_result_key(train_hash, test_round, config_hash, seed)
+
+    def get(self, key):
+        result = self.checkpoint.get(key)
+        if result is None and self.store is not None:
+            result = self.store.get(key)
+            if result is not None:
+                self.checkpoint.append(key, result)
+        return result
+
+    def put(self, key, result):
+        self.checkpoint.append(key, result)
+        if self.store is not None:
+            self.store.put(key, result)
+        return True
+
+    def stats(self):
+        stats = {'checkpointed': len(self.checkpoint.records)}
+        if self.store is not None:
+            stats.update(self.store.stats())
+        return stats
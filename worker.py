@@ -2,6 +2,9 @@
 """
 Celeryワーカー起動スクリプト
 Render.com対応版（持続動作修正版）
+
+  python worker.py        ワーカーを起動（複数起動可）
+  python worker.py beat   定期実行スケジューラを起動（全体で1つだけ）
 """
 
 import os
@@ -54,6 +57,18 @@ def test_celery_connection():
         logger.error(f"❌ Celery接続テストエラー: {e}")
         return False
 
+def beat_schedule_path():
+    """beat の実行状態ファイル（FileManager と同じデータディレクトリに置き、再起動後も前回の実行時刻を引き継ぐ）"""
+    from utils.file_manager import FileManager
+    return FileManager().get_file_path('celerybeat-schedule')
+
+def start_beat():
+    """定期実行スケジューラ（beat）を起動（全体で1プロセスだけ動かす）"""
+    logger.info("⏰ Celery beat を開始します...")
+    beat_args = ['beat', '--loglevel=info', f'--schedule={beat_schedule_path()}']
+    logger.info(f"🔧 引数: {' '.join(beat_args)}")
+    celery_app.start(beat_args)
+
 def start_worker():
     """Celeryワーカーを起動"""
     try:
@@ -89,6 +104,11 @@ def start_worker():
             '--max-memory-per-child=400000',  # 400MB制限
         ]
         
+        # 抽選後の定期更新（beat）は通常 `python worker.py beat` の専用プロセス1つで動かす
+        # ワーカーが1つだけの構成に限り CELERY_EMBED_BEAT=true で同居できる（複数ワーカーで有効にすると定期タスクが重複起動する）
+        if os.environ.get('CELERY_EMBED_BEAT', 'false').lower() == 'true':
+            worker_args += ['--beat', f'--schedule={beat_schedule_path()}']
+        
         # 追加環境変数設定
         os.environ.setdefault('CELERY_WORKER_PREFETCH_MULTIPLIER', '1')
         os.environ.setdefault('CELERY_TASK_ACKS_LATE', 'true')
@@ -163,6 +183,10 @@ def health_check():
         return False
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'beat':
+        start_beat()
+        sys.exit(0)
+    
     try:
         logger.info("=" * 50)
         logger.info("🎯 MiniLoto Celeryワーカー起動中...")